@@ -23,11 +23,16 @@ setup(
     long_description_content_type='text/markdown',
     url='https://github.com/caracal-cloud/simple-arcgis-wrapper',
 
-    packages=['simple_arcgis_wrapper'],
+    packages=['simple_arcgis_wrapper', 'simple_arcgis_wrapper.utilities'],
     python_requires=">=3.5",
     install_requires=[
         'requests>=2.10.0'
     ],
+    extras_require={
+        'async': ['aiohttp>=3.6'],
+        'numpy': ['numpy>=1.16'],
+        'orjson': ['orjson>=3.0'],
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',
@@ -8,5 +8,8 @@ A simple wrapper for interacting with the ArcGIS Online REST API.
 
 
 from .arcgis_api import ArcgisAPI
+from .async_api import AsyncArcgisAPI
+from .mirror import LayerMirror
+from .writer import FeatureWriter
 from . import exceptions
 from . import fields
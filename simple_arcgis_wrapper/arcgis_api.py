@@ -1,12 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+import email.utils
 import inspect
-import json
 import os
+import random
+import re
 import requests
 import sys
+import threading
+import time
 
-from .exceptions import ArcGISException
-from .services_api import ServicesAPI
+from . import codec
+from .exceptions import ArcGISException, ArcGISUnavailableError
+from .services_api import DEFAULT_CACHE_TTL, POST_RETRY_STATUSES, ServicesAPI
 from .users_api import UsersAPI
+from .utilities.streaming import FeatureStream
+
+
+# connection pools kept per host and connections kept per pool
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (10, 120)
+
+# retries on connection errors and on these statuses, with exponential backoff
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_BACKOFF_MAX = 30
+RETRY_STATUSES = [429, 502, 503, 504]
+
+# POST edits are not idempotent, so they are only retried when the server
+# did not process them: connection errors and POST_RETRY_STATUSES
+
+# refresh the access token this many seconds before it expires
+DEFAULT_REFRESH_MARGIN = 120
+
+# bytes read from the socket at a time by streamed responses
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_HEADERS = {"Accept-Encoding": "gzip, deflate"}
+
+_ERROR_BODY = re.compile(rb'\s*\{\s*"error"')
 
 
 class ArcgisAPI(object):
@@ -21,6 +54,14 @@ class ArcgisAPI(object):
         client_id=None,
         username=None,
         base_url=ARCGIS_REST_BASE_URL,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+        timeout=DEFAULT_TIMEOUT,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        prewarm_connections=0,
+        prewarm_urls=None,
+        cache_ttl=DEFAULT_CACHE_TTL,
     ):
 
         # option 1. use constructor argument
@@ -59,23 +100,42 @@ class ArcgisAPI(object):
 
         self.base_url = base_url
         self.requester = Requester(
-            access_token, refresh_token, client_id, self.base_url
+            access_token,
+            refresh_token,
+            client_id,
+            self.base_url,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
         )
 
+        # open connections up front so the first requests skip the TLS handshake,
+        # edits and queries go to the feature service host given in prewarm_urls
+        if prewarm_connections:
+            self.requester.prewarm(prewarm_connections, prewarm_urls)
+
         # access_token cannot be empty or None when making a request so initialize it here
         if not access_token and refresh_token:
             self.requester._refresh_access_token()
 
         # register APIs
         self.services = ServicesAPI(
-            base_url=base_url, requester=self.requester, username=username
+            base_url=base_url,
+            requester=self.requester,
+            username=username,
+            cache_ttl=cache_ttl,
         )
 
     def close(self):
-        self.requester.session.close()
+        self.requester.close()
 
     @classmethod
-    def fromusernamepassword(cls, username, password, base_url=ARCGIS_BASE_URL):
+    def fromusernamepassword(
+        cls, username, password, base_url=ARCGIS_BASE_URL, **kwargs
+    ):
+        "kwargs are passed to the constructor, e.g. pool_maxsize or timeout"
 
         token_url = f"{base_url}/generateToken"
         payload = {
@@ -85,22 +145,140 @@ class ArcgisAPI(object):
             "f": "json",
         }
 
-        res = requests.post(token_url, data=payload).json()
+        res = codec.loads(requests.post(token_url, data=payload).content)
         if "error" in res:
             raise ArcGISException(res["error"]["message"])
 
-        return cls(access_token=res["token"], username=username)
+        api = cls(access_token=res["token"], username=username, **kwargs)
+
+        # expires is epoch milliseconds, there is no refresh token to renew it
+        if res.get("expires"):
+            api.requester.token_expires_at = res["expires"] / 1000
+        return api
 
     # TODO: add properties
 
 
 class Requester(object):
-    def __init__(self, access_token, refresh_token, client_id, base_url):
+    def __init__(
+        self,
+        access_token,
+        refresh_token,
+        client_id,
+        base_url,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+        timeout=DEFAULT_TIMEOUT,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        backoff_max=DEFAULT_BACKOFF_MAX,
+        refresh_margin=DEFAULT_REFRESH_MARGIN,
+    ):
         self.access_token = access_token
         self.refresh_token = refresh_token
         self.client_id = client_id
-        self.session = requests.Session()
         self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+
+        # epoch seconds, None until a token response reports an expiry
+        self.token_expires_at = None
+        self.refresh_margin = refresh_margin
+        self._refresh_lock = threading.Lock()
+        self._refresh_timer = None
+
+        # pool_maxsize bounds the connections kept open to each host,
+        # set it to at least the number of threads sharing this Requester
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+        self.session.close()
+
+    def prewarm(self, connections=1, urls=None):
+        "Open connections to each url (base_url by default) ahead of the first request."
+
+        urls = urls or [self.base_url]
+
+        def head(url):
+            try:
+                self.session.head(url, timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                pass  # best effort, the real request will surface any error
+
+        # concurrent requests so the pool keeps several distinct connections
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(head, [url for url in urls for _ in range(connections)]))
+
+    def _get_backoff(self, attempt, response=None):
+        """
+        Seconds to wait before retry attempt. Honors Retry-After up to backoff_max,
+        otherwise or when it can't be parsed uses full jitter.
+        """
+
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                try:
+                    retry_date = email.utils.parsedate_to_datetime(retry_after)
+                    wait = retry_date.timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = None
+            if wait is not None:
+                return min(self.backoff_max, max(0, wait))
+
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_factor * (2 ** attempt))
+        )
+
+    def _send(self, method, url, params=None, data=None, **kwargs):
+        """
+        Send a request, retrying connection errors and RETRY_STATUSES.
+        POST requests are not retried on read timeouts and only on POST_RETRY_STATUSES.
+        kwargs are passed to session.request, e.g. stream or headers.
+        """
+
+        is_post = method.upper() == "POST"
+        retry_statuses = POST_RETRY_STATUSES if is_post else RETRY_STATUSES
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(
+                    method, url, params=params, data=data, timeout=self.timeout, **kwargs
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                # a POST that timed out reading the response may have been applied,
+                # ConnectTimeout is a ConnectionError and still retried
+                unsent = isinstance(e, requests.exceptions.ConnectionError)
+                if (is_post and not unsent) or attempt >= self.max_retries:
+                    if unsent:
+                        raise ArcGISUnavailableError(str(e))
+                    raise ArcGISException(str(e))
+                time.sleep(self._get_backoff(attempt))
+            else:
+                if (
+                    response.status_code not in retry_statuses
+                    or attempt >= self.max_retries
+                ):
+                    return response
+                response.close()  # release the connection of a streamed response
+                time.sleep(self._get_backoff(attempt, response))
+
+            attempt += 1
 
     def is_refresh_token_active(self):
         previous_token = self.access_token
@@ -114,70 +292,177 @@ class Requester(object):
     def _process_response(self, response):
         "Return JSON"
         try:
-            return response.json()
-        except json.decoder.JSONDecodeException:
+            return codec.loads(response.content)
+        except ValueError:
             raise ArcGISException("ArcGIS response error. Try again later.")
 
-    def _refresh_access_token(self):
-        "docs"
+    def _is_token_expiring(self):
+        "True when the access token expires within refresh_margin seconds"
 
-        refresh_url = f"{self.base_url}/oauth2/token"
+        return (
+            self.token_expires_at is not None
+            and self.token_expires_at - self.refresh_margin <= time.time()
+        )
 
-        data = {
-            "client_id": self.client_id,
-            "refresh_token": self.refresh_token,
-            "grant_type": "refresh_token",
-        }
+    def _refresh_access_token(self, stale_token=None):
+        """
+        Refresh the access token.
+        With stale_token, skip the refresh if another thread already replaced it,
+        so concurrent callers that see the same expired token make a single call.
+        """
 
-        # don't use __post/__request to avoid loop
-        res = self.session.request("post", refresh_url, data=data)
-        processed_response = self._process_response(res)
+        with self._refresh_lock:
+            if stale_token is not None and self.access_token != stale_token:
+                return
 
-        if processed_response.get("error"):
-            raise ArcGISException(processed_response["error"]["message"])
+            refresh_url = f"{self.base_url}/oauth2/token"
 
-        self.access_token = processed_response["access_token"]
+            data = {
+                "client_id": self.client_id,
+                "refresh_token": self.refresh_token,
+                "grant_type": "refresh_token",
+            }
 
-    def _request(self, method, url, params=None, data=None):
-        "docs"
+            # don't use __post/__request to avoid loop
+            res = self._send("post", refresh_url, data=data)
+            processed_response = self._process_response(res)
+
+            if processed_response.get("error"):
+                raise ArcGISException(processed_response["error"]["message"])
+
+            self.access_token = processed_response["access_token"]
+
+            if processed_response.get("expires_in"):
+                self.token_expires_at = time.time() + processed_response["expires_in"]
+                self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        "Refresh in the background refresh_margin seconds before the token expires"
+
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+
+        delay = max(0, self.token_expires_at - self.refresh_margin - time.time())
+        self._refresh_timer = threading.Timer(
+            delay, self._refresh_in_background, args=(self.access_token,)
+        )
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_in_background(self, stale_token):
+        try:
+            self._refresh_access_token(stale_token)
+        except ArcGISException:
+            pass  # requests fall back to refreshing on 498/499
+
+    def _get_access_token(self):
+        "The access token, refreshed first when it is about to expire"
+
+        token = self.access_token
+        if self.refresh_token and self._is_token_expiring():
+            self._refresh_access_token(token)
+            token = self.access_token
+        return token
+
+    def _request(self, method, url, params=None, data=None, raw=False):
+        "With raw, non-JSON responses (e.g. f=pbf) are returned as bytes"
 
         if method not in ["get", "post"]:
             raise ValueError("unsupported HTTP method")
 
-        response = self.session.request(method, url, params=params, data=data)
+        token = self._get_access_token()
+
+        payload = params if method == "get" else data
+        payload["token"] = token
+
+        response = self._send(method, url, params=params, data=data)
 
         # all responses should return 200 with optional error
+        if response.status_code in POST_RETRY_STATUSES:
+            raise ArcGISUnavailableError(response.text)
         if response.status_code != 200:
             raise ArcGISException(response.text)
 
+        # errors are JSON whatever format was requested
+        if raw and not Requester._is_json(response):
+            return response.content
+
         processed_response = self._process_response(response)
 
-        # handle access token expired
-        if processed_response.get("error"):
+        # handle access token expired, successful responses may also be lists
+        if isinstance(processed_response, dict) and processed_response.get("error"):
             if processed_response["error"].get("code") in [498, 499]:
 
-                self._refresh_access_token()
-
-                if method == "get":
-                    params["token"] = self.access_token
-                elif method == "post":
-                    data["token"] = self.access_token
+                self._refresh_access_token(token)
+                payload["token"] = self.access_token
 
-                response = self.session.request(method, url, params=params, data=data)
+                response = self._send(method, url, params=params, data=data)
+                if raw and not Requester._is_json(response):
+                    return response.content
                 processed_response = self._process_response(response)
 
         return processed_response
 
-    def GET(self, url, params=dict()):
-        "docs"
-        params["f"] = "json"
-        params["token"] = self.access_token
-        return self._request("get", url, params=params)
+    @staticmethod
+    def _is_json(response):
+        return response.content.lstrip()[:1] == b"{"
+
+    def GET(self, url, params=dict(), f="json"):
+        "Returns the decoded JSON, or bytes when f is another format (e.g. pbf) and the request succeeded"
+        params["f"] = f
+        return self._request("get", url, params=params, raw=f != "json")
 
     def POST(self, url, data=dict()):
         "docs"
         data["f"] = "json"
-        data["token"] = self.access_token
         return self._request("post", url, data=data)
 
+    def GET_STREAM(self, url, params=dict()):
+        """
+        Like GET for query endpoints but returns a FeatureStream which parses the
+        response as it is read from the socket and yields one feature at a time,
+        so memory is bounded by the largest feature rather than the response.
+        Nothing is requested until iteration starts.
+        """
+        params["f"] = "json"
+        return FeatureStream(self._iter_response_chunks(url, params))
+
+    def _iter_response_chunks(self, url, params):
+        "Yield the decompressed body of a streamed GET, refreshing the token on 498/499"
+
+        token = self._get_access_token()
+        params["token"] = token
+
+        for attempt in range(2):
+            response = self._send(
+                "get", url, params=params, stream=True, headers=STREAM_HEADERS
+            )
+            try:
+                if response.status_code != 200:
+                    raise ArcGISException(response.text)
+
+                chunks = response.iter_content(STREAM_CHUNK_SIZE)
+                first = next(chunks, b"")
+
+                # errors are small so read them whole to check for an expired token
+                if attempt == 0 and _ERROR_BODY.match(first):
+                    body = first + b"".join(chunks)
+                    try:
+                        error = codec.loads(body).get("error")
+                    except ValueError:
+                        error = None
+
+                    if isinstance(error, dict) and error.get("code") in [498, 499]:
+                        self._refresh_access_token(token)
+                        params["token"] = self.access_token
+                        continue
+                    yield body
+                    return
+
+                yield first
+                yield from chunks
+                return
+            finally:
+                response.close()
+
     # __add_feature = _add_feature
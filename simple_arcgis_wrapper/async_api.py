@@ -0,0 +1,1147 @@
+"""
+asyncio versions of ArcgisAPI and ServicesAPI.
+Requires aiohttp: pip install simple-arcgis-wrapper[async]
+"""
+
+import asyncio
+import inspect
+import os
+import time
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency
+    aiohttp = None
+
+from . import codec
+from .arcgis_api import DEFAULT_REFRESH_MARGIN, ArcgisAPI
+from .exceptions import ArcGISException
+from .models import (
+    BatchResult,
+    EditResult,
+    FeatureLayer,
+    FeatureService,
+    PointFeature,
+    Table,
+)
+from .services_api import (
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_MAX_BATCH_BYTES,
+    DEFAULT_MAX_RECORD_COUNT,
+    ServicesAPI,
+)
+from .utilities.batching import chunk_encoded, join_encoded
+from .utilities.cache import TTLCache
+from .utilities.quantization import dequantize_features
+
+
+# maximum number of requests in flight per AsyncRequester
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+class AsyncArcgisAPI(object):
+    def __init__(
+        self,
+        access_token=None,
+        refresh_token=None,
+        client_id=None,
+        username=None,
+        base_url=ArcgisAPI.ARCGIS_REST_BASE_URL,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        cache_ttl=DEFAULT_CACHE_TTL,
+    ):
+
+        # same lookup order as ArcgisAPI
+
+        is_pwd_auth = inspect.stack()[1].function == "fromusernamepassword"
+
+        try:
+            access_token = access_token or os.environ["ARCGIS_ACCESS_TOKEN"]
+        except KeyError:
+            access_token = None
+
+        try:
+            refresh_token = (
+                refresh_token or os.environ["ARCGIS_REFRESH_TOKEN"]
+                if not is_pwd_auth
+                else None
+            )
+        except KeyError:
+            refresh_token = None
+
+        try:
+            client_id = (
+                client_id or os.environ["ARCGIS_CLIENT_ID"] if not is_pwd_auth else None
+            )
+        except KeyError:
+            client_id = None
+
+        try:
+            self.username = username or os.environ["ARCGIS_USERNAME"]
+        except KeyError:
+            raise KeyError(
+                "username not found. Pass username as a kwarg or set an env var ARCGIS_USERNAME"
+            )
+
+        self.base_url = base_url
+
+        # an empty access_token is refreshed before the first request
+        self.requester = AsyncRequester(
+            access_token, refresh_token, client_id, self.base_url, max_concurrency
+        )
+
+        # register APIs
+        self.services = AsyncServicesAPI(
+            base_url=base_url,
+            requester=self.requester,
+            username=self.username,
+            cache_ttl=cache_ttl,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self.requester.close()
+
+    @classmethod
+    async def fromusernamepassword(
+        cls, username, password, base_url=ArcgisAPI.ARCGIS_BASE_URL
+    ):
+
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncArcgisAPI requires aiohttp, install simple-arcgis-wrapper[async]"
+            )
+
+        token_url = f"{base_url}/generateToken"
+        payload = {
+            "username": username,
+            "password": password,
+            "referer": "www.arcgis.com",
+            "f": "json",
+        }
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(token_url, data=payload) as response:
+                res = codec.loads(await response.read())
+
+        if "error" in res:
+            raise ArcGISException(res["error"]["message"])
+
+        api = cls(access_token=res["token"], username=username)
+
+        # expires is epoch milliseconds, there is no refresh token to renew it
+        if res.get("expires"):
+            api.requester.token_expires_at = res["expires"] / 1000
+        return api
+
+
+class AsyncRequester(object):
+    def __init__(
+        self,
+        access_token,
+        refresh_token,
+        client_id,
+        base_url,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        refresh_margin=DEFAULT_REFRESH_MARGIN,
+    ):
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncArcgisAPI requires aiohttp, install simple-arcgis-wrapper[async]"
+            )
+
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.client_id = client_id
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+
+        # epoch seconds, None until a token response reports an expiry
+        self.token_expires_at = None
+        self.refresh_margin = refresh_margin
+
+        # created on first use so they belong to the running event loop
+        self.session = None
+        self._semaphore = None
+        self._refresh_lock = None
+
+    def _get_session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self.session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._refresh_lock = asyncio.Lock()
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _process_response(self, response):
+        "Return JSON"
+        try:
+            return codec.loads(await response.read())
+        except ValueError:
+            raise ArcGISException("ArcGIS response error. Try again later.")
+
+    async def _refresh_access_token(self, stale_token):
+        """
+        Refresh the access token unless another request already replaced stale_token.
+        Concurrent requests that hit an expired token share a single refresh.
+        """
+
+        session = self._get_session()
+
+        async with self._refresh_lock:
+            if self.access_token != stale_token:
+                return
+
+            refresh_url = f"{self.base_url}/oauth2/token"
+
+            data = {
+                "client_id": self.client_id,
+                "refresh_token": self.refresh_token,
+                "grant_type": "refresh_token",
+            }
+
+            # don't use _request to avoid loop
+            async with session.post(refresh_url, data=data) as response:
+                processed_response = await self._process_response(response)
+
+            if processed_response.get("error"):
+                raise ArcGISException(processed_response["error"]["message"])
+
+            self.access_token = processed_response["access_token"]
+
+            if processed_response.get("expires_in"):
+                self.token_expires_at = time.time() + processed_response["expires_in"]
+
+    async def _send(self, method, url, params, data):
+        "Send one request, bounded by max_concurrency"
+
+        session = self._get_session()
+
+        async with self._semaphore:
+            async with session.request(
+                method, url, params=params, data=data
+            ) as response:
+
+                # all responses should return 200 with optional error
+                if response.status != 200:
+                    raise ArcGISException(await response.text())
+
+                return await self._process_response(response)
+
+    async def _request(self, method, url, params=None, data=None):
+        "docs"
+
+        if method not in ["get", "post"]:
+            raise ValueError("unsupported HTTP method")
+
+        self._get_session()
+        expiring = (
+            self.token_expires_at is not None
+            and self.token_expires_at - self.refresh_margin <= time.time()
+        )
+        if self.refresh_token and (not self.access_token or expiring):
+            await self._refresh_access_token(self.access_token)
+
+        payload = params if method == "get" else data
+        payload["f"] = "json"
+        payload["token"] = token = self.access_token
+
+        # aiohttp rejects None values
+        for k in [k for k, v in payload.items() if v is None]:
+            del payload[k]
+
+        processed_response = await self._send(method, url, params, data)
+
+        # handle access token expired, successful responses may also be lists
+        if isinstance(processed_response, dict) and processed_response.get("error"):
+            if processed_response["error"].get("code") in [498, 499]:
+
+                await self._refresh_access_token(token)
+
+                payload["token"] = self.access_token
+                processed_response = await self._send(method, url, params, data)
+
+        return processed_response
+
+    async def GET(self, url, params=None):
+        "docs"
+        return await self._request("get", url, params=dict(params or {}))
+
+    async def POST(self, url, data=None):
+        "docs"
+        return await self._request("post", url, data=dict(data or {}))
+
+
+class AsyncServicesAPI(object):
+    "Same methods as ServicesAPI, as coroutines. Batches are sent concurrently."
+
+    def __init__(
+        self,
+        base_url,
+        requester,
+        username,
+        cache_ttl=DEFAULT_CACHE_TTL,
+        cache_size=DEFAULT_CACHE_SIZE,
+    ):
+        self.base_url = base_url
+        self.requester = requester
+        self.username = username
+
+        # feature service and layer definitions keyed by url
+        self._definitions = TTLCache(cache_size, cache_ttl)
+
+    async def _get_layer_definition(self, layer_id, feature_service_url):
+        "Return the layer or table definition, looked up once per layer."
+
+        layer_url = f"{feature_service_url}/{layer_id}"
+        definition = self._definitions.get(layer_url)
+        if definition is None:
+            definition = await self.requester.GET(layer_url)
+            if definition.get("error", False):
+                raise ArcGISException(
+                    definition["error"].get("message", "get_layer_definition error")
+                )
+
+            self._definitions.set(layer_url, definition)
+
+        return definition
+
+    async def _get_feature_service_definition(self, feature_service_url, error_message):
+        "See ServicesAPI._get_feature_service_definition"
+
+        index = self._definitions.get(feature_service_url)
+        if index is None:
+            res = await self.requester.GET(feature_service_url)
+            if res.get("error", False):
+                raise ArcGISException(res["error"].get("message", error_message))
+
+            index = ServicesAPI._index_feature_service_definition(res)
+            self._definitions.set(feature_service_url, index)
+
+        return index
+
+    def _invalidate_definitions(self, feature_service_url, layer_ids=[]):
+        "Drop cached definitions after the service's layers or tables change."
+
+        self._definitions.invalidate(feature_service_url)
+        for layer_id in layer_ids:
+            self._definitions.invalidate(f"{feature_service_url}/{layer_id}")
+
+    async def _get_max_record_count(self, layer_id, feature_service_url):
+        "Return the layer's maxRecordCount."
+
+        definition = await self._get_layer_definition(layer_id, feature_service_url)
+        return definition.get("maxRecordCount") or DEFAULT_MAX_RECORD_COUNT
+
+    async def _post_batches(self, url, payloads, results_key, error_message):
+        "POST all payloads concurrently and merge the results in payload order."
+
+        batch_results = await self._post_batch_results(
+            url, payloads, results_key, error_message
+        )
+        return ServicesAPI._merge_results(batch_results)
+
+    async def _post_batch_results(self, url, payloads, results_key, error_message):
+        "POST all payloads concurrently and return the results of each, in payload order"
+
+        async def post(data):
+            res = await self.requester.POST(url, data)
+
+            if res.get("error", False):
+                raise ArcGISException(res["error"].get("message", error_message))
+
+            return res.get(results_key, [])
+
+        return await asyncio.gather(*[post(data) for data in payloads])
+
+    async def _post_features(
+        self, url, features, results_key, batch_size, max_batch_bytes, error_message
+    ):
+        """
+        POST features in batches and return a BatchResult in input order.
+        None features are inputs that could not be converted, they fail unsent.
+        """
+
+        results, pending = dict(), list()
+        encoded = ServicesAPI._encode_features(features, results, pending)
+        batches = list(chunk_encoded(encoded, batch_size, max_batch_bytes))
+
+        batch_results = await self._post_batch_results(
+            url,
+            [{"features": join_encoded(batch)} for batch in batches],
+            results_key,
+            error_message,
+        )
+        ServicesAPI._set_batch_results(batches, batch_results, pending, results)
+
+        return BatchResult([results[i] for i in range(len(results))])
+
+    async def add_point(self, lon, lat, attributes, layer_id, feature_service_url):
+        "See ServicesAPI.add_point"
+
+        if abs(lon) > 180:
+            raise ValueError("invalid x value")
+
+        if abs(lat) > 90:
+            raise ValueError("invalid y value")
+
+        x, y = round(lon, 8), round(lat, 8)
+
+        features = [{"attributes": attributes, "geometry": {"x": x, "y": y}}]
+
+        data = {"features": codec.dumps(features)}
+
+        add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
+        res = await self.requester.POST(add_features_url, data)
+
+        if res.get("error", False):
+            raise ArcGISException(res["error"].get("message", "add_point error"))
+
+        result = EditResult.fromresult(0, (res.get("addResults") or [{}])[0])
+        if not result.success:
+            raise ArcGISException(result.error_description or "add_point error")
+
+        return PointFeature(result.object_id, x, y, attributes)
+
+    async def add_points(
+        self,
+        points,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+    ):
+        "See ServicesAPI.add_points"
+
+        features = ServicesAPI._get_point_features(points, keep_skipped=True)
+
+        if batch_size is None:
+            batch_size = await self._get_max_record_count(layer_id, feature_service_url)
+
+        add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
+        return await self._post_features(
+            add_features_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            "add_points error",
+        )
+
+    async def add_polylines(
+        self,
+        polylines,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+    ):
+        "See ServicesAPI.add_polylines"
+
+        features = ServicesAPI._get_multipart_features(polylines, "paths")
+
+        if batch_size is None:
+            batch_size = await self._get_max_record_count(layer_id, feature_service_url)
+
+        add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
+        return await self._post_features(
+            add_features_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            "add_polylines error",
+        )
+
+    async def add_polygons(
+        self,
+        polygons,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+    ):
+        "See ServicesAPI.add_polygons"
+
+        features = ServicesAPI._get_multipart_features(polygons, "rings")
+
+        if batch_size is None:
+            batch_size = await self._get_max_record_count(layer_id, feature_service_url)
+
+        add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
+        return await self._post_features(
+            add_features_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            "add_polygons error",
+        )
+
+    async def add_table_rows(
+        self,
+        rows,
+        table_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+    ):
+        "See ServicesAPI.add_table_rows"
+
+        features = [{"attributes": row} for row in rows]
+
+        if batch_size is None:
+            batch_size = await self._get_max_record_count(table_id, feature_service_url)
+
+        add_rows_url = f"{feature_service_url}/{table_id}/addFeatures"
+        return await self._post_features(
+            add_rows_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            "add_table_rows error",
+        )
+
+    async def apply_edits(
+        self,
+        layer_id,
+        feature_service_url,
+        adds=None,
+        updates=None,
+        deletes=None,
+        rollback_on_failure=True,
+    ):
+        "See ServicesAPI.apply_edits"
+
+        payload = ServicesAPI._get_edits_payload(adds, updates, deletes)
+        if not payload:
+            return ServicesAPI._merge_edit_results(dict())
+
+        data = {**payload, "rollbackOnFailure": codec.dumps(rollback_on_failure)}
+
+        apply_edits_url = f"{feature_service_url}/{layer_id}/applyEdits"
+        res = await self.requester.POST(apply_edits_url, data)
+
+        if res.get("error", False):
+            raise ArcGISException(res["error"].get("message", "apply_edits error"))
+
+        return ServicesAPI._merge_edit_results(res)
+
+    async def apply_service_edits(
+        self, edits, feature_service_url, rollback_on_failure=True
+    ):
+        "See ServicesAPI.apply_service_edits"
+
+        data = {
+            "edits": ServicesAPI._get_service_edits_payload(edits),
+            "rollbackOnFailure": codec.dumps(rollback_on_failure),
+        }
+
+        apply_edits_url = f"{feature_service_url}/applyEdits"
+        res = await self.requester.POST(apply_edits_url, data)
+
+        return ServicesAPI._merge_service_edit_results(
+            edits, res, "apply_service_edits error"
+        )
+
+    async def create_feature_service(self, name, description):
+        "docs"
+
+        create_service_url = (
+            f"{self.base_url}/content/users/{self.username}/createService"
+        )
+
+        create_params = {
+            "name": name,
+            "serviceDescription": description,
+            "hasStaticData": False,
+        }
+
+        data = {
+            "createParameters": codec.dumps(create_params),
+            "outputType": "featureService",
+        }
+
+        res = await self.requester.POST(create_service_url, data)
+
+        if not res.get("success", False):
+            raise ArcGISException(res["error"]["message"])
+
+        return FeatureService(
+            res["itemId"], res["name"], res["name"], res["encodedServiceURL"]
+        )
+
+    async def create_feature_layer(
+        self,
+        layer_type,
+        name,
+        description,
+        feature_service_url,
+        fields,
+        x_min=0,
+        y_min=0,
+        x_max=10,
+        y_max=10,
+        wkid=4326,
+    ):
+        "docs"
+
+        esri_type = ServicesAPI.get_esri_type(layer_type)
+
+        create_layer_url = (
+            feature_service_url.replace("/services/", "/admin/services/")
+            + "/addToDefinition"
+        )
+
+        add_to_definition = {
+            "layers": [
+                ServicesAPI._get_layer_definition_payload(
+                    esri_type, name, description, fields, x_min, y_min, x_max, y_max, wkid
+                )
+            ]
+        }
+
+        data = {
+            "addToDefinition": codec.dumps(add_to_definition),
+            "outputType": "featureService",
+        }
+
+        res = await self.requester.POST(create_layer_url, data)
+
+        if not res.get("success", False):
+            raise ArcGISException(res["error"]["message"])
+
+        self._invalidate_definitions(feature_service_url)
+
+        layer_data = res["layers"][0]
+        return FeatureLayer(
+            layer_data["id"],
+            layer_data["name"],
+            f'{feature_service_url}/{layer_data["id"]}',
+        )
+
+    async def create_table(self, name, description, feature_service_url, fields):
+        "docs"
+
+        create_layer_url = (
+            feature_service_url.replace("/services/", "/admin/services/")
+            + "/addToDefinition"
+        )
+
+        add_to_definition = {
+            "tables": [
+                ServicesAPI._get_table_definition_payload(name, description, fields)
+            ]
+        }
+
+        data = {
+            "addToDefinition": codec.dumps(add_to_definition),
+            "outputType": "featureService",
+        }
+
+        res = await self.requester.POST(create_layer_url, data)
+
+        if not res.get("success", False):
+            raise ArcGISException(res["error"]["message"])
+
+        self._invalidate_definitions(feature_service_url)
+
+        layer_data = res["layers"][0]
+        return FeatureLayer(
+            layer_data["id"],
+            layer_data["name"],
+            f'{feature_service_url}/{layer_data["id"]}',
+        )
+
+    async def delete_features(
+        self,
+        layer_id,
+        feature_service_url,
+        object_ids=None,
+        where=None,
+        batch_size=None,
+    ):
+        "See ServicesAPI.delete_features"
+
+        if object_ids is None and where is None:
+            raise ValueError("object_ids or where required")
+
+        if object_ids is not None and batch_size is None:
+            batch_size = await self._get_max_record_count(layer_id, feature_service_url)
+
+        payloads = ServicesAPI._get_delete_payloads(object_ids, where, batch_size)
+
+        delete_features_url = f"{feature_service_url}/{layer_id}/deleteFeatures"
+        return await self._post_batches(
+            delete_features_url, payloads, "deleteResults", "delete_features error"
+        )
+
+    async def _delete_from_definition(self, key, ids, feature_service_url):
+        "Delete layers or tables from a feature service"
+
+        delete_url = (
+            feature_service_url.replace("/services/", "/admin/services/")
+            + "/deleteFromDefinition"
+        )
+
+        data = {
+            "deleteFromDefinition": codec.dumps({key: [{"id": str(_id)} for _id in ids]}),
+        }
+
+        res = await self.requester.POST(delete_url, data)
+
+        if not res.get("success", False):
+            raise ArcGISException(res["error"]["message"])
+
+        self._invalidate_definitions(feature_service_url, ids)
+
+        return True
+
+    async def delete_feature_layers(self, layer_ids, feature_service_url):
+        "docs"
+        return await self._delete_from_definition(
+            "layers", layer_ids, feature_service_url
+        )
+
+    async def delete_tables(self, table_ids, feature_service_url):
+        "docs"
+        return await self._delete_from_definition(
+            "tables", table_ids, feature_service_url
+        )
+
+    async def delete_feature_service(self, service_id):
+        "docs"
+
+        delete_service_url = (
+            f"{self.base_url}/content/users/{self.username}/items/{service_id}/delete"
+        )
+
+        res = await self.requester.POST(delete_service_url)
+
+        if not res.get("success", False):
+            raise ArcGISException(res["error"]["message"])
+
+        return True
+
+    async def _query(self, query_url, params, error_message):
+        res = await self.requester.GET(query_url, params)
+
+        if res.get("error", False):
+            raise ArcGISException(res["error"].get("message", error_message))
+
+        return dequantize_features(res)
+
+    async def get_features(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields=[],
+        return_geometry=True,
+        out_sr=None,
+        max_allowable_offset=None,
+        geometry_precision=None,
+        quantization_parameters=None,
+    ):
+        "See ServicesAPI.get_features"
+
+        out_fields = list(out_fields)
+        if "OBJECTID" not in out_fields:
+            out_fields.append("OBJECTID")
+
+        params = {
+            "where": where,
+            "outFields": ",".join(out_fields),
+            **ServicesAPI._get_geometry_params(
+                return_geometry,
+                out_sr,
+                max_allowable_offset,
+                geometry_precision,
+                quantization_parameters,
+            ),
+        }
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = await self._query(query_url, params, "get_features error")
+
+        schema = ServicesAPI._get_schema(res)
+        return [
+            ServicesAPI._get_feature(f, res["geometryType"], schema)
+            for f in res.get("features", [])
+        ]
+
+    async def _extract_pages(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields,
+        error_message,
+        geometry_params=None,
+    ):
+        "Query every OBJECTID range concurrently, see ServicesAPI._iter_extracted_pages"
+
+        definition = await self._get_layer_definition(layer_id, feature_service_url)
+        query_url = f"{feature_service_url}/{layer_id}/query"
+
+        res = await self._query(
+            query_url, {"where": where, "returnIdsOnly": "true"}, error_message
+        )
+        range_params = ServicesAPI._get_id_range_params(
+            definition, res.get("objectIds") or [], where, out_fields
+        )
+
+        return await asyncio.gather(
+            *[
+                self._query(query_url, {**params, **(geometry_params or {})}, error_message)
+                for params in range_params
+            ]
+        )
+
+    async def extract_features(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields=[],
+        return_geometry=True,
+        out_sr=None,
+        max_allowable_offset=None,
+        geometry_precision=None,
+        quantization_parameters=None,
+    ):
+        "See ServicesAPI.extract_features, concurrency is bounded by max_concurrency"
+
+        geometry_params = ServicesAPI._get_geometry_params(
+            return_geometry,
+            out_sr,
+            max_allowable_offset,
+            geometry_precision,
+            quantization_parameters,
+        )
+
+        pages = await self._extract_pages(
+            where,
+            layer_id,
+            feature_service_url,
+            out_fields,
+            "extract_features error",
+            geometry_params,
+        )
+
+        features = list()
+        for res in pages:
+            schema = ServicesAPI._get_schema(res)
+            features.extend(
+                ServicesAPI._get_feature(f, res.get("geometryType"), schema)
+                for f in res.get("features", [])
+            )
+        return features
+
+    async def extract_table_rows(
+        self, where, table_id, feature_service_url, out_fields=[]
+    ):
+        "See ServicesAPI.extract_table_rows"
+
+        pages = await self._extract_pages(
+            where, table_id, feature_service_url, out_fields, "extract_table_rows error"
+        )
+
+        rows = list()
+        for res in pages:
+            schema = ServicesAPI._get_schema(res)
+            rows.extend(
+                ServicesAPI._get_table_row(f, schema) for f in res.get("features", [])
+            )
+        return rows
+
+    async def get_count(self, where, layer_id, feature_service_url):
+        "See ServicesAPI.get_count"
+
+        params = {"where": where, "returnCountOnly": "true"}
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = await self._query(query_url, params, "get_count error")
+        return res["count"]
+
+    async def get_object_ids(self, where, layer_id, feature_service_url):
+        "See ServicesAPI.get_object_ids"
+
+        params = {"where": where, "returnIdsOnly": "true"}
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = await self._query(query_url, params, "get_object_ids error")
+        return res.get("objectIds") or []
+
+    async def get_statistics(
+        self, where, statistics, layer_id, feature_service_url, group_by=[]
+    ):
+        "See ServicesAPI.get_statistics"
+
+        params = ServicesAPI._get_statistics_params(where, statistics, group_by)
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = await self._query(query_url, params, "get_statistics error")
+        return [f["attributes"] for f in res.get("features", [])]
+
+    async def get_distinct_values(self, where, field, layer_id, feature_service_url):
+        "See ServicesAPI.get_distinct_values"
+
+        definition = await self._get_layer_definition(layer_id, feature_service_url)
+        supports_pagination = ServicesAPI._supports_pagination(definition)
+        query_url = f"{feature_service_url}/{layer_id}/query"
+
+        values, seen, offset = list(), set(), 0
+        while True:
+            params = ServicesAPI._get_distinct_values_params(where, field, offset)
+            res = await self._query(query_url, params, "get_distinct_values error")
+
+            if not ServicesAPI._add_distinct_values(
+                res, field, values, seen, supports_pagination
+            ):
+                return values
+            offset += len(res["features"])
+
+    async def get_table_rows(self, where, table_id, feature_service_url, out_fields=[]):
+        "See ServicesAPI.get_table_rows"
+
+        out_fields = list(out_fields)
+        if "OBJECTID" not in out_fields:
+            out_fields.append("OBJECTID")
+
+        params = {"where": where, "outFields": ",".join(out_fields)}
+
+        query_url = f"{feature_service_url}/{table_id}/query"
+        res = await self._query(query_url, params, "get_table_rows error")
+
+        schema = ServicesAPI._get_schema(res)
+        return [ServicesAPI._get_table_row(f, schema) for f in res.get("features", [])]
+
+    async def _iter_query_pages(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields,
+        page_size,
+        error_message,
+        geometry_params=None,
+    ):
+        "Async version of ServicesAPI._iter_query_pages"
+
+        definition = await self._get_layer_definition(layer_id, feature_service_url)
+        get_base_params = ServicesAPI._get_page_params_factory(
+            definition, where, out_fields, page_size
+        )
+
+        def get_page_params(offset, last_oid):
+            return {**get_base_params(offset, last_oid), **(geometry_params or {})}
+        oid_field = definition.get("objectIdField") or "OBJECTID"
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+
+        offset, last_oid = 0, -1
+        task = asyncio.ensure_future(
+            self._query(query_url, get_page_params(offset, last_oid), error_message)
+        )
+
+        try:
+            while task is not None:
+                res = await task
+                features = res.get("features", [])
+
+                task = None
+                if features and res.get("exceededTransferLimit", False):
+                    offset += len(features)
+                    last_oid = max(f["attributes"][oid_field] for f in features)
+                    task = asyncio.ensure_future(
+                        self._query(
+                            query_url, get_page_params(offset, last_oid), error_message
+                        )
+                    )
+
+                yield res
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def iter_features(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields=[],
+        page_size=None,
+        return_geometry=True,
+        out_sr=None,
+        max_allowable_offset=None,
+        geometry_precision=None,
+        quantization_parameters=None,
+    ):
+        "See ServicesAPI.iter_features"
+
+        geometry_params = ServicesAPI._get_geometry_params(
+            return_geometry,
+            out_sr,
+            max_allowable_offset,
+            geometry_precision,
+            quantization_parameters,
+        )
+
+        pages = self._iter_query_pages(
+            where,
+            layer_id,
+            feature_service_url,
+            out_fields,
+            page_size,
+            "iter_features error",
+            geometry_params,
+        )
+        async for res in pages:
+            schema = ServicesAPI._get_schema(res)
+            for f in res.get("features", []):
+                yield ServicesAPI._get_feature(f, res.get("geometryType"), schema)
+
+    async def iter_table_rows(
+        self, where, table_id, feature_service_url, out_fields=[], page_size=None
+    ):
+        "See ServicesAPI.iter_table_rows"
+
+        pages = self._iter_query_pages(
+            where,
+            table_id,
+            feature_service_url,
+            out_fields,
+            page_size,
+            "iter_table_rows error",
+        )
+        async for res in pages:
+            schema = ServicesAPI._get_schema(res)
+            for f in res.get("features", []):
+                yield ServicesAPI._get_table_row(f, schema)
+
+    async def get_feature_layer(self, feature_service_url, layer_id=None, layer_name=None):
+        "See ServicesAPI.get_feature_layer"
+
+        index = await self._get_feature_service_definition(
+            feature_service_url, "get_feature_layer error"
+        )
+        layer = ServicesAPI._lookup(index, "layers", layer_id, layer_name)
+
+        if layer is not None:
+            return FeatureLayer(
+                layer["id"], layer["name"], f'{feature_service_url}/{layer["id"]}'
+            )
+
+    async def get_table(self, feature_service_url, table_id=None, table_name=None):
+        "See ServicesAPI.get_table"
+
+        index = await self._get_feature_service_definition(
+            feature_service_url, "get_table error"
+        )
+        table = ServicesAPI._lookup(index, "tables", table_id, table_name)
+
+        if table is not None:
+            return Table(
+                table["id"], table["name"], f'{feature_service_url}/{table["id"]}'
+            )
+
+    async def get_feature_service(self, name, owner_username=None):
+        "docs"
+
+        service_owner = owner_username or self.username
+        search_url = f"{self.base_url}/search"
+        params = {
+            "q": f'title: {name} AND owner: {service_owner} AND type: "Feature Service"',
+        }
+
+        res = await self.requester.GET(search_url, params)
+        if res.get("error", False):
+            raise ArcGISException(
+                res["error"].get("message", "get_feature_service error")
+            )
+
+        for result in res.get("results", []):
+            if name == result["name"]:
+                return FeatureService(
+                    result["id"], result["name"], result["title"], result["url"]
+                )
+
+    async def update_features(
+        self,
+        updates,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+    ):
+        "See ServicesAPI.update_features"
+
+        feature_updates = ServicesAPI._get_feature_updates(updates, keep_skipped=True)
+
+        if batch_size is None:
+            batch_size = await self._get_max_record_count(layer_id, feature_service_url)
+
+        update_features_url = f"{feature_service_url}/{layer_id}/updateFeatures"
+        return await self._post_features(
+            update_features_url,
+            feature_updates,
+            "updateResults",
+            batch_size,
+            max_batch_bytes,
+            "update_features error",
+        )
+
+    async def update_table_rows(
+        self,
+        updates,
+        table_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+    ):
+        "See ServicesAPI.update_table_rows"
+
+        table_row_updates = ServicesAPI._get_table_row_updates(
+            updates, keep_skipped=True
+        )
+
+        if batch_size is None:
+            batch_size = await self._get_max_record_count(table_id, feature_service_url)
+
+        update_features_url = f"{feature_service_url}/{table_id}/updateFeatures"
+        return await self._post_features(
+            update_features_url,
+            table_row_updates,
+            "updateResults",
+            batch_size,
+            max_batch_bytes,
+            "update_table_rows error",
+        )
+
+    async def update_feature_service(self, feature_service_id, title=None):
+        "See ServicesAPI.update_feature_service"
+
+        update_service_url = f"{self.base_url}/content/users/{self.username}/items/{feature_service_id}/update"
+
+        data = {"title": title}
+
+        data = {k: v for k, v in data.items() if v is not None}
+        res = await self.requester.POST(update_service_url, data)
+
+        if not res.get("success", False):
+            raise ArcGISException(res["error"]["message"])
+
+        return True
@@ -0,0 +1,108 @@
+"""
+JSON encoding of request payloads and decoding of responses.
+Uses orjson or ujson when installed and the standard library otherwise.
+datetime and date values are encoded as epoch milliseconds (naive values
+are treated as UTC), Decimal as float and NumPy scalars and arrays as
+their Python equivalents.
+"""
+
+import datetime
+import decimal
+import json
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # optional dependency
+    ujson = None
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _default(obj):
+    "Encode the types the JSON backends don't handle natively"
+
+    if isinstance(obj, datetime.datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=datetime.timezone.utc)
+        return int((obj - _EPOCH).total_seconds() * 1000)
+
+    if isinstance(obj, datetime.date):
+        return _default(datetime.datetime(obj.year, obj.month, obj.day))
+
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, default=_default, separators=(",", ":"))
+
+
+def _stdlib_loads(data):
+    return json.loads(data)
+
+
+def _orjson_dumps(obj):
+    # datetimes go through _default so every backend encodes them the same way
+    option = (
+        orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_SERIALIZE_NUMPY
+        | orjson.OPT_NON_STR_KEYS
+    )
+    return orjson.dumps(obj, default=_default, option=option).decode("utf-8")
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, default=_default, ensure_ascii=False)
+
+
+_BACKENDS = {"json": (_stdlib_dumps, _stdlib_loads)}
+if orjson is not None:
+    _BACKENDS["orjson"] = (_orjson_dumps, orjson.loads)
+if ujson is not None:
+    _BACKENDS["ujson"] = (_ujson_dumps, ujson.loads)
+
+_backend = "orjson" if orjson is not None else "ujson" if ujson is not None else "json"
+
+
+def get_backend():
+    "Name of the backend in use: orjson, ujson or json"
+    return _backend
+
+
+def set_backend(name):
+    "Switch backend, e.g. set_backend('json') to force the standard library"
+
+    global _backend
+
+    if name not in _BACKENDS:
+        raise ValueError(f"JSON backend {name} is not installed")
+    _backend = name
+
+
+def dumps(obj):
+    "Encode obj as a JSON str"
+    return _BACKENDS[_backend][0](obj)
+
+
+def loads(data):
+    "Decode JSON from str or bytes. Raises ValueError on invalid JSON."
+    return _BACKENDS[_backend][1](data)
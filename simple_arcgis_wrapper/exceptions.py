@@ -1,2 +1,6 @@
 class ArcGISException(Exception):
     pass
+
+
+class ArcGISUnavailableError(ArcGISException):
+    "The request failed before ArcGIS processed it, so sending it again is safe"
@@ -0,0 +1,262 @@
+"""
+Local SQLite copy of a feature layer or table.
+"""
+
+from array import array
+import json
+import sqlite3
+import threading
+
+from .models import (
+    AttributeSchema,
+    ChangeSet,
+    PointFeature,
+    PolygonFeature,
+    PolylineFeature,
+    TableRow,
+)
+
+
+_SQLITE_TYPES = {
+    "esriFieldTypeSmallInteger": "INTEGER",
+    "esriFieldTypeInteger": "INTEGER",
+    "esriFieldTypeBigInteger": "INTEGER",
+    "esriFieldTypeDate": "INTEGER",  # epoch milliseconds
+    "esriFieldTypeSingle": "REAL",
+    "esriFieldTypeDouble": "REAL",
+}
+
+# fields the server maintains that are not stored as attribute columns
+_SKIPPED_FIELD_TYPES = ["esriFieldTypeOID", "esriFieldTypeGeometry"]
+
+
+class LayerMirror(object):
+    """
+    Keeps the features of a feature layer or table (OBJECTID, x, y and
+    attributes) in a SQLite file so reads never leave the machine.
+    Polylines and polygons keep their flat coords and offsets arrays as blobs.
+    refresh() applies the changes since the last refresh with
+    ServicesAPI.get_changes and get_features answers where queries locally.
+    Layers without change tracking are refreshed by edit date, which does not
+    report deletes, so each refresh also fetches every object id of the layer
+    and deletes the local features the server no longer has.
+    indexes is a list of attribute names to index, OBJECTID is the primary key.
+
+    with LayerMirror(api.services, layer.id, service.url, 'layer.db', indexes=['DeviceId']) as mirror:
+        mirror.refresh()
+        points = mirror.get_features("DeviceId = ?", ['Name'], params=['abc123'])
+    """
+
+    def __init__(
+        self, services, layer_id, feature_service_url, path, indexes=[], out_fields=["*"]
+    ):
+        self.services = services
+        self.layer_id = layer_id
+        self.feature_service_url = feature_service_url
+        self.path = path
+        self.out_fields = out_fields
+
+        definition = services._get_layer_definition(layer_id, feature_service_url)
+        self.geometry_type = definition.get("geometryType")
+        self.is_table = not self.geometry_type
+        self.fields = [
+            field
+            for field in definition.get("fields", [])
+            if field["type"] not in _SKIPPED_FIELD_TYPES
+            and field["name"] != "OBJECTID"
+        ]
+        self._field_names = [field["name"] for field in self.fields]
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._create_tables(indexes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    @property
+    def checkpoint(self):
+        "get_changes checkpoint of the last refresh, None before the first"
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'checkpoint'"
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def refresh(self):
+        """
+        Apply the changes since the last refresh, the first refresh copies every feature.
+        Returns the ChangeSet that was applied.
+        """
+
+        checkpoint = self.checkpoint
+        changes = self.services.get_changes(
+            self.layer_id, self.feature_service_url, checkpoint, self.out_fields
+        )
+
+        # edit date changes have no deletes, compare ids with the server instead
+        server_ids = None
+        if checkpoint is not None and "editDate" in changes.checkpoint:
+            server_ids = set(
+                self.services.get_object_ids(
+                    "1=1", self.layer_id, self.feature_service_url
+                )
+            )
+
+        columns = ["OBJECTID", "x", "y", "coords", "offsets"] + self._field_names
+        upsert = "INSERT OR REPLACE INTO features ({}) VALUES ({})".format(
+            ", ".join(_quote(column) for column in columns),
+            ", ".join("?" for _ in columns),
+        )
+
+        with self._lock, self._connection:
+            if checkpoint is None:
+                self._connection.execute("DELETE FROM features")
+
+            self._connection.executemany(
+                upsert,
+                (
+                    self._get_row(feature)
+                    for features in [changes.inserts, changes.updates]
+                    for feature in features
+                ),
+            )
+
+            if server_ids is not None:
+                local_ids = self._connection.execute("SELECT OBJECTID FROM features")
+                changes = ChangeSet(
+                    changes.inserts,
+                    changes.updates,
+                    [row[0] for row in local_ids if row[0] not in server_ids],
+                    changes.checkpoint,
+                )
+
+            self._connection.executemany(
+                "DELETE FROM features WHERE OBJECTID = ?",
+                ((_id,) for _id in changes.deletes),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('checkpoint', ?)",
+                (json.dumps(changes.checkpoint),),
+            )
+
+        return changes
+
+    def get_features(self, where="1=1", out_fields=[], params=()):
+        """
+        Query the local copy like ServicesAPI.get_features.
+        where is a SQLite expression over the attribute columns, params fills its ? placeholders.
+        Returns PointFeatures, or TableRows for tables, in OBJECTID order.
+        """
+
+        if "*" in out_fields:
+            names = list(self._field_names)
+        else:
+            names = [name for name in out_fields if name != "OBJECTID"]
+
+        unknown = [name for name in names if name not in self._field_names]
+        if unknown:
+            raise ValueError(f"unknown fields {unknown}")
+
+        schema = AttributeSchema(["OBJECTID"] + names)
+        columns = ", ".join(
+            ["OBJECTID", "x", "y", "coords", "offsets"] + [_quote(name) for name in names]
+        )
+        query = f"SELECT {columns} FROM features WHERE {where} ORDER BY OBJECTID"
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+
+        if self.is_table:
+            return [TableRow.fromschema(row[0], schema, (row[0],) + row[5:]) for row in rows]
+
+        if self.geometry_type in _MULTIPART_MODELS:
+            cls = _MULTIPART_MODELS[self.geometry_type]
+            return [
+                cls.fromschema(
+                    row[0],
+                    _get_array("d", row[3]),
+                    _get_array("q", row[4]),
+                    schema,
+                    (row[0],) + row[5:],
+                )
+                for row in rows
+            ]
+
+        return [
+            PointFeature.fromschema(row[0], row[1], row[2], schema, (row[0],) + row[5:])
+            for row in rows
+        ]
+
+    def count(self, where="1=1", params=()):
+        "Number of local features matching where"
+
+        with self._lock:
+            query = f"SELECT COUNT(*) FROM features WHERE {where}"
+            return self._connection.execute(query, params).fetchone()[0]
+
+    def _create_tables(self, indexes):
+
+        columns = [
+            "OBJECTID INTEGER PRIMARY KEY",
+            "x REAL",
+            "y REAL",
+            "coords BLOB",
+            "offsets BLOB",
+        ] + [
+            f'{_quote(field["name"])} {_SQLITE_TYPES.get(field["type"], "")}'.rstrip()
+            for field in self.fields
+        ]
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS features ({', '.join(columns)})"
+            )
+            for name in indexes:
+                self._connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote('features_' + name)} "
+                    f"ON features ({_quote(name)})"
+                )
+
+    def _get_row(self, feature):
+        "Column values of a PointFeature, PolylineFeature, PolygonFeature or TableRow"
+
+        x = getattr(feature, "x", None)
+        y = getattr(feature, "y", None)
+
+        coords = offsets = None
+        if hasattr(feature, "coords"):
+            coords = feature.coords.tobytes()
+            offsets = feature.offsets.tobytes()
+
+        return (feature.id, x, y, coords, offsets) + tuple(
+            feature.get(name) for name in self._field_names
+        )
+
+
+_MULTIPART_MODELS = {
+    "esriGeometryPolyline": PolylineFeature,
+    "esriGeometryPolygon": PolygonFeature,
+}
+
+
+def _get_array(typecode, blob):
+    values = array(typecode)
+    if blob:
+        values.frombytes(blob)
+    return values
+
+
+def _quote(name):
+    "Quote an identifier for SQLite"
+    return '"' + name.replace('"', '""') + '"'
@@ -1,8 +1,33 @@
 
+from array import array
 import urllib.parse
 
+from .utilities.geometry import flatten_parts, get_extent, nest_parts
+from .utilities.spatial_index import GridIndex
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed for FeatureBatch
+    np = None
+
+
+_FLOAT_FIELD_TYPES = ["esriFieldTypeDouble", "esriFieldTypeSingle"]
+_INTEGER_FIELD_TYPES = [
+    "esriFieldTypeSmallInteger",
+    "esriFieldTypeInteger",
+    "esriFieldTypeBigInteger",
+    "esriFieldTypeOID",
+    "esriFieldTypeDate",  # epoch milliseconds
+]
+
+# JSON geometry key holding the parts of each multipart geometry type
+MULTIPART_KEYS = {"esriGeometryPolyline": "paths", "esriGeometryPolygon": "rings"}
+
 
 class FeatureService(object):
+
+    __slots__ = ("_id", "_name", "_title", "_url")
+
     def __init__(self, id, name, title, url):
         self._id = id
         self._name = name
@@ -38,6 +63,9 @@ class FeatureService(object):
 
 
 class FeatureLayer(object):
+
+    __slots__ = ("_id", "_name", "_url")
+
     def __init__(self, id, name, url):
         self._id = id
         self._name = name
@@ -59,11 +87,75 @@ class FeatureLayer(object):
         return f'{self.id}, {self.name}'
 
 
-class PointFeature(object):
-    def __init__(self, id, x, y):
+class AttributeSchema(object):
+    """
+    Attribute names shared by every feature of a query result.
+    Features only store a tuple of values in the same order.
+    """
+
+    __slots__ = ("_names", "_index")
+
+    def __init__(self, names):
+        self._names = tuple(names)
+        self._index = {name: i for i, name in enumerate(self._names)}
+
+    @property
+    def names(self):
+        return self._names
+
+    def index(self, name):
+        return self._index[name]
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self._names)
+
+
+_EMPTY_SCHEMA = AttributeSchema([])
+
+
+class _AttributesMixin(object):
+    "Attribute access for models storing a schema and a tuple of values"
+
+    __slots__ = ()
+
+    @property
+    def attributes(self):
+        return dict(zip(self._schema.names, self._values))
+
+    def __getitem__(self, name):
+        return self._values[self._schema.index(name)]
+
+    def get(self, name, default=None):
+        if name in self._schema:
+            return self._values[self._schema.index(name)]
+        return default
+
+
+class PointFeature(_AttributesMixin):
+
+    __slots__ = ("_id", "_x", "_y", "_schema", "_values")
+
+    def __init__(self, id, x, y, attributes=None):
         self._id = id
         self._x = x
         self._y = y
+        self._schema = AttributeSchema(attributes) if attributes else _EMPTY_SCHEMA
+        self._values = tuple(attributes.values()) if attributes else ()
+
+    @classmethod
+    def fromschema(cls, id, x, y, schema, values):
+        "Create a feature sharing schema with the other features of a result"
+
+        feature = cls.__new__(cls)
+        feature._id = id
+        feature._x = x
+        feature._y = y
+        feature._schema = schema
+        feature._values = tuple(values)
+        return feature
 
     @property
     def id(self):
@@ -78,7 +170,87 @@ class PointFeature(object):
         return self._y
 
 
+class _MultipartFeature(_AttributesMixin):
+    """
+    Feature whose geometry has parts, stored as flat arrays instead of nested lists.
+    coords holds x, y pairs and offsets the vertex index where each part starts
+    followed by the vertex count, see utilities.geometry.flatten_parts.
+    """
+
+    __slots__ = ("_id", "_coords", "_offsets", "_schema", "_values")
+
+    def __init__(self, id, coords, offsets, attributes=None):
+        self._id = id
+        self._coords = coords
+        self._offsets = offsets
+        self._schema = AttributeSchema(attributes) if attributes else _EMPTY_SCHEMA
+        self._values = tuple(attributes.values()) if attributes else ()
+
+    @classmethod
+    def fromschema(cls, id, coords, offsets, schema, values):
+        "Create a feature sharing schema with the other features of a result"
+
+        feature = cls.__new__(cls)
+        feature._id = id
+        feature._coords = coords
+        feature._offsets = offsets
+        feature._schema = schema
+        feature._values = tuple(values)
+        return feature
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def coords(self):
+        return self._coords
+
+    @property
+    def offsets(self):
+        return self._offsets
+
+    @property
+    def num_parts(self):
+        return max(0, len(self._offsets) - 1)
+
+    @property
+    def extent(self):
+        "(x_min, y_min, x_max, y_max), None without vertices"
+        return get_extent(self._coords)
+
+    def get_part(self, index):
+        "Vertices of a part as a list of (x, y)"
+
+        start, end = self._offsets[index], self._offsets[index + 1]
+        coords = self._coords
+        return [(coords[2 * i], coords[2 * i + 1]) for i in range(start, end)]
+
+
+class PolylineFeature(_MultipartFeature):
+
+    __slots__ = ()
+
+    @property
+    def paths(self):
+        "Nested ArcGIS JSON paths, built on demand"
+        return nest_parts(self._coords, self._offsets)
+
+
+class PolygonFeature(_MultipartFeature):
+
+    __slots__ = ()
+
+    @property
+    def rings(self):
+        "Nested ArcGIS JSON rings, built on demand"
+        return nest_parts(self._coords, self._offsets)
+
+
 class Table(object):
+
+    __slots__ = ("_id", "_name", "_url")
+
     def __init__(self, id, name, url):
         self._id = id
         self._name = name
@@ -100,10 +272,452 @@ class Table(object):
         return f'{self.id}, {self.name}'
 
 
-class TableRow(object):
-    def __init__(self, id):
+class TableRow(_AttributesMixin):
+
+    __slots__ = ("_id", "_schema", "_values")
+
+    def __init__(self, id, attributes=None):
         self._id = id
+        self._schema = AttributeSchema(attributes) if attributes else _EMPTY_SCHEMA
+        self._values = tuple(attributes.values()) if attributes else ()
+
+    @classmethod
+    def fromschema(cls, id, schema, values):
+        "Create a row sharing schema with the other rows of a result"
+
+        row = cls.__new__(cls)
+        row._id = id
+        row._schema = schema
+        row._values = tuple(values)
+        return row
 
     @property
     def id(self):
         return self._id
+
+
+class ChangeSet(object):
+    """
+    Features inserted, updated and deleted since a checkpoint, see ServicesAPI.get_changes.
+    inserts and updates are PointFeatures (TableRows for tables), deletes are object ids.
+    checkpoint is a JSON serializable dict to pass to the next get_changes call.
+    """
+
+    __slots__ = ("_inserts", "_updates", "_deletes", "_checkpoint")
+
+    def __init__(self, inserts, updates, deletes, checkpoint):
+        self._inserts = inserts
+        self._updates = updates
+        self._deletes = deletes
+        self._checkpoint = checkpoint
+
+    @property
+    def inserts(self):
+        return self._inserts
+
+    @property
+    def updates(self):
+        return self._updates
+
+    @property
+    def deletes(self):
+        return self._deletes
+
+    @property
+    def checkpoint(self):
+        return self._checkpoint
+
+    def __len__(self):
+        return len(self._inserts) + len(self._updates) + len(self._deletes)
+
+
+class EditResult(object):
+    """
+    Outcome of one input of a batched edit, see BatchResult.
+    index is the input's position, object_id is None when the server returned none.
+    """
+
+    __slots__ = ("_index", "_object_id", "_success", "_error_code", "_error_description")
+
+    def __init__(
+        self, index, object_id, success, error_code=None, error_description=None
+    ):
+        self._index = index
+        self._object_id = object_id
+        self._success = success
+        self._error_code = error_code
+        self._error_description = error_description
+
+    @classmethod
+    def fromresult(cls, index, result):
+        "Build an EditResult from an addResults, updateResults or deleteResults entry"
+
+        error = result.get("error") or {}
+        return cls(
+            index,
+            result.get("objectId"),
+            bool(result.get("success", False)),
+            error.get("code"),
+            error.get("description"),
+        )
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def object_id(self):
+        return self._object_id
+
+    @property
+    def success(self):
+        return self._success
+
+    @property
+    def error_code(self):
+        return self._error_code
+
+    @property
+    def error_description(self):
+        return self._error_description
+
+    def __repr__(self):
+        if self._success:
+            return f"EditResult({self._index}, {self._object_id}, success)"
+        error = f"{self._error_code}: {self._error_description}"
+        return f"EditResult({self._index}, {self._object_id}, {error})"
+
+
+class BatchResult(dict):
+    """
+    {objectId: success} of a batched edit, which also keeps one EditResult per
+    input in input order. Failed inputs the server returned no object id for
+    are only in results and failed.
+    """
+
+    def __init__(self, results=()):
+        self._results = list(results)
+        super().__init__(
+            (result.object_id, result.success)
+            for result in self._results
+            if result.object_id is not None
+        )
+
+    @classmethod
+    def fromresults(cls, results):
+        "Build a BatchResult from a list of edit result dicts in input order"
+        return cls(EditResult.fromresult(i, result) for i, result in enumerate(results))
+
+    @property
+    def results(self):
+        return self._results
+
+    @property
+    def failed(self):
+        return [result for result in self._results if not result.success]
+
+    @property
+    def succeeded(self):
+        return [result for result in self._results if result.success]
+
+
+class FeatureBatch(object):
+    """
+    Columnar query result.
+    ids, x and y are NumPy arrays and each out field is its own array in columns.
+    Numeric fields get numeric arrays (float64 when an integer field has nulls),
+    other fields get object arrays. x and y are None for tables.
+    Polylines and polygons have no x and y but the vertices of every feature in
+    coords, an (n, 2) array, with part_offsets the vertex index where each part
+    starts (plus the vertex count) and feature_offsets the index in part_offsets
+    where each feature starts (plus the part count), see get_parts.
+    Indexing or iterating returns lightweight FeatureRow views. Requires NumPy.
+    """
+
+    def __init__(
+        self,
+        ids,
+        x=None,
+        y=None,
+        columns=None,
+        coords=None,
+        part_offsets=None,
+        feature_offsets=None,
+    ):
+        self._ids = ids
+        self._x = x
+        self._y = y
+        self._columns = columns or dict()
+        self._coords = coords
+        self._part_offsets = part_offsets
+        self._feature_offsets = feature_offsets
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def coords(self):
+        return self._coords
+
+    @property
+    def part_offsets(self):
+        return self._part_offsets
+
+    @property
+    def feature_offsets(self):
+        return self._feature_offsets
+
+    def column(self, name):
+        return self._columns[name]
+
+    def build_index(self, cell_size=None):
+        """
+        utilities.spatial_index.GridIndex over the points of the batch, whose
+        lookups return positions in the batch.
+        """
+
+        if self._x is None:
+            raise ValueError("build_index requires point features")
+
+        return GridIndex(self._x, self._y, cell_size)
+
+    def get_parts(self, index):
+        "Paths or rings of a polyline or polygon as a list of (n, 2) views of coords"
+
+        if self._coords is None:
+            return None
+
+        part_offsets = self._part_offsets
+        return [
+            self._coords[part_offsets[part] : part_offsets[part + 1]]
+            for part in range(
+                self._feature_offsets[index], self._feature_offsets[index + 1]
+            )
+        ]
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("FeatureBatch index out of range")
+        return FeatureRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield FeatureRow(self, index)
+
+    @classmethod
+    def fromqueryresult(cls, res):
+        "Build a FeatureBatch from a /query JSON response."
+
+        if np is None:
+            raise ImportError("FeatureBatch requires numpy, pip install numpy")
+
+        features = res.get("features", [])
+        oid_field = res.get("objectIdFieldName") or "OBJECTID"
+        geometry_type = res.get("geometryType")
+
+        if geometry_type not in [None, "esriGeometryPoint"] + list(MULTIPART_KEYS):
+            raise NotImplementedError(f"{geometry_type} features not implemented")
+
+        n = len(features)
+        ids = np.fromiter(
+            (f["attributes"][oid_field] for f in features), dtype=np.int64, count=n
+        )
+
+        x = y = None
+        multipart = dict()
+        if geometry_type in MULTIPART_KEYS:
+            multipart = _get_multipart_arrays(features, MULTIPART_KEYS[geometry_type])
+        elif geometry_type is not None:
+            x = np.fromiter(
+                (_get_coordinate(f, "x") for f in features), dtype=np.float64, count=n
+            )
+            y = np.fromiter(
+                (_get_coordinate(f, "y") for f in features), dtype=np.float64, count=n
+            )
+
+        columns = dict()
+        for field in res.get("fields", []):
+            name = field["name"]
+            if name == oid_field:
+                continue
+
+            values = [f["attributes"].get(name) for f in features]
+            columns[name] = _get_column(values, field.get("type"))
+
+        return cls(ids, x, y, columns, **multipart)
+
+    @classmethod
+    def frompbfresult(cls, result):
+        "Build a FeatureBatch from pbf.decode_feature_collection output without copying coordinates."
+
+        if np is None:
+            raise ImportError("FeatureBatch requires numpy, pip install numpy")
+
+        ids = np.array(result["objectIds"], dtype=np.int64)
+
+        x = y = None
+        if result["x"] is not None:
+            x, y = _get_float_array(result["x"]), _get_float_array(result["y"])
+
+        multipart = dict()
+        if result.get("coords") is not None:
+            multipart = {
+                "coords": _get_float_array(result["coords"]).reshape(-1, 2),
+                "part_offsets": np.array(result["part_offsets"], dtype=np.int64),
+                "feature_offsets": np.array(result["feature_offsets"], dtype=np.int64),
+            }
+
+        columns = dict()
+        for field in result["fields"]:
+            name = field["name"]
+            if name == result["objectIdFieldName"]:
+                continue
+            columns[name] = _get_column(result["attributes"][name], field["type"])
+
+        return cls(ids, x, y, columns, **multipart)
+
+    @classmethod
+    def concat(cls, batches):
+        "Join batches with the same columns, e.g. the pages of iter_features."
+
+        if np is None:
+            raise ImportError("FeatureBatch requires numpy, pip install numpy")
+
+        batches = list(batches)
+        if not batches:
+            return cls(np.empty(0, dtype=np.int64))
+
+        multipart = dict()
+        if batches[0].coords is not None:
+            # shift each batch's offsets past the vertices and parts of the previous ones
+            part_offsets = [np.zeros(1, dtype=np.int64)]
+            feature_offsets = [np.zeros(1, dtype=np.int64)]
+            n_vertices = n_parts = 0
+            for b in batches:
+                part_offsets.append(b.part_offsets[1:] + n_vertices)
+                feature_offsets.append(b.feature_offsets[1:] + n_parts)
+                n_vertices += len(b.coords)
+                n_parts += len(b.part_offsets) - 1
+
+            multipart = {
+                "coords": np.concatenate([b.coords for b in batches]),
+                "part_offsets": np.concatenate(part_offsets),
+                "feature_offsets": np.concatenate(feature_offsets),
+            }
+
+        has_geometry = batches[0].x is not None
+        return cls(
+            np.concatenate([b.ids for b in batches]),
+            np.concatenate([b.x for b in batches]) if has_geometry else None,
+            np.concatenate([b.y for b in batches]) if has_geometry else None,
+            {
+                name: np.concatenate([b.columns[name] for b in batches])
+                for name in batches[0].columns
+            },
+            **multipart,
+        )
+
+
+class FeatureRow(object):
+    "A view of one row of a FeatureBatch"
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    @property
+    def id(self):
+        return int(self._batch.ids[self._index])
+
+    @property
+    def x(self):
+        return None if self._batch.x is None else float(self._batch.x[self._index])
+
+    @property
+    def y(self):
+        return None if self._batch.y is None else float(self._batch.y[self._index])
+
+    @property
+    def parts(self):
+        "Paths or rings of a polyline or polygon, see FeatureBatch.get_parts"
+        return self._batch.get_parts(self._index)
+
+    @property
+    def attributes(self):
+        return {name: self[name] for name in self._batch.columns}
+
+    def __getitem__(self, name):
+        value = self._batch.columns[name][self._index]
+        return value.item() if hasattr(value, "item") else value
+
+
+def _get_float_array(values):
+    "float64 view of an array.array('d') without copying"
+
+    if not len(values):
+        return np.empty(0, dtype=np.float64)
+    return np.frombuffer(values, dtype=np.float64)
+
+
+def _get_multipart_arrays(features, key):
+    "FeatureBatch coords, part_offsets and feature_offsets of JSON polylines or polygons"
+
+    coords, part_offsets, feature_offsets = array("d"), [0], [0]
+    for f in features:
+        feature_coords, offsets = flatten_parts((f.get("geometry") or {}).get(key, []))
+
+        n_vertices = len(coords) // 2
+        coords.extend(feature_coords)
+        part_offsets.extend(offset + n_vertices for offset in offsets[1:])
+        feature_offsets.append(len(part_offsets) - 1)
+
+    return {
+        "coords": _get_float_array(coords).reshape(-1, 2),
+        "part_offsets": np.array(part_offsets, dtype=np.int64),
+        "feature_offsets": np.array(feature_offsets, dtype=np.int64),
+    }
+
+
+def _get_coordinate(feature, key):
+    value = (feature.get("geometry") or {}).get(key)
+    return float("nan") if value is None else value
+
+
+def _get_column(values, field_type):
+    "Convert a list of attribute values to the most compact array for field_type"
+
+    if field_type in _FLOAT_FIELD_TYPES:
+        return np.array(
+            [float("nan") if v is None else v for v in values], dtype=np.float64
+        )
+
+    if field_type in _INTEGER_FIELD_TYPES:
+        if any(v is None for v in values):
+            return np.array(
+                [float("nan") if v is None else v for v in values], dtype=np.float64
+            )
+        return np.array(values, dtype=np.int64)
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
@@ -0,0 +1,331 @@
+"""
+Decoder for ArcGIS query responses in Protocol Buffer format (f=pbf).
+Implements the subset of the protobuf wire format used by
+esriPBuffer.FeatureCollectionPBuffer, so no protobuf dependency is needed.
+"""
+
+from array import array
+import struct
+
+
+GEOMETRY_TYPES = {
+    0: "esriGeometryPoint",
+    1: "esriGeometryMultipoint",
+    2: "esriGeometryPolyline",
+    3: "esriGeometryPolygon",
+    4: "esriGeometryMultipatch",
+    127: None,
+}
+
+FIELD_TYPES = {
+    0: "esriFieldTypeSmallInteger",
+    1: "esriFieldTypeInteger",
+    2: "esriFieldTypeSingle",
+    3: "esriFieldTypeDouble",
+    4: "esriFieldTypeString",
+    5: "esriFieldTypeDate",
+    6: "esriFieldTypeOID",
+    7: "esriFieldTypeGeometry",
+    8: "esriFieldTypeBlob",
+    9: "esriFieldTypeRaster",
+    10: "esriFieldTypeGUID",
+    11: "esriFieldTypeGlobalID",
+    12: "esriFieldTypeXML",
+}
+
+QUANTIZE_ORIGIN_POSITIONS = {0: "upperLeft", 1: "lowerLeft"}
+
+_MULTIPART_GEOMETRY_TYPES = ["esriGeometryPolyline", "esriGeometryPolygon"]
+_SUPPORTED_GEOMETRY_TYPES = [None, "esriGeometryPoint"] + _MULTIPART_GEOMETRY_TYPES
+
+_WIRE_VARINT, _WIRE_FIXED64, _WIRE_LENGTH, _WIRE_FIXED32 = 0, 1, 2, 5
+
+
+def decode_feature_collection(data):
+    """
+    Decode a FeatureCollectionPBuffer.
+    Feature results are returned as a dict with the query JSON header keys
+    (objectIdFieldName, geometryType, spatialReference, exceededTransferLimit,
+    fields, transform) plus objectIds, attributes (a dict of one list per field)
+    and the geometries: x and y (array("d")) for points, coords (array("d") of
+    x, y pairs), part_offsets and feature_offsets for polylines and polygons,
+    laid out as in FeatureBatch.
+    Count and ids results are returned as {"count": n} and
+    {"objectIdFieldName": name, "objectIds": [...]}.
+    """
+
+    buf = memoryview(data)
+
+    for number, _, value in _iter_fields(buf, 0, len(buf)):
+        if number == 2:  # queryResult
+            for result_number, _, (start, end) in _iter_fields(buf, *value):
+                if result_number == 1:
+                    return _decode_feature_result(buf, start, end)
+                if result_number == 2:
+                    return {"count": _decode_count_result(buf, start, end)}
+                if result_number == 3:
+                    return _decode_ids_result(buf, start, end)
+
+    raise ValueError("no query result in feature collection")
+
+
+def _decode_feature_result(buf, start, end):
+
+    # proto3 leaves enum fields at their zero value off the wire
+    result = {
+        "objectIdFieldName": None,
+        "geometryType": GEOMETRY_TYPES[0],
+        "spatialReference": None,
+        "exceededTransferLimit": False,
+        "fields": list(),
+        "transform": None,
+    }
+    feature_ranges = list()
+
+    for number, _, value in _iter_fields(buf, start, end):
+        if number == 1:
+            result["objectIdFieldName"] = _decode_string(buf, value)
+        elif number == 7:
+            result["geometryType"] = GEOMETRY_TYPES.get(value)
+        elif number == 8:
+            result["spatialReference"] = _decode_spatial_reference(buf, *value)
+        elif number == 9:
+            result["exceededTransferLimit"] = bool(value)
+        elif number == 12:
+            result["transform"] = _decode_transform(buf, *value)
+        elif number == 13:
+            result["fields"].append(_decode_field(buf, *value))
+        elif number == 15:
+            feature_ranges.append(value)
+
+    geometry_type = result["geometryType"]
+    if geometry_type not in _SUPPORTED_GEOMETRY_TYPES:
+        raise NotImplementedError(f"{geometry_type} features not implemented")
+    is_point = geometry_type == "esriGeometryPoint"
+    is_multipart = geometry_type in _MULTIPART_GEOMETRY_TYPES
+
+    names = [field["name"] for field in result["fields"]]
+    attributes = {name: list() for name in names}
+    x, y = array("d"), array("d")
+    coords, part_offsets, feature_offsets = array("d"), [0], [0]
+
+    transform = result["transform"] or {
+        "originPosition": "upperLeft",
+        "scale": [1, 1],
+        "translate": [0, 0],
+    }
+    x_scale, y_scale = transform["scale"][:2]
+    x_translate, y_translate = transform["translate"][:2]
+
+    # upperLeft origin means y grows downwards from the translate point
+    if transform["originPosition"] == "upperLeft":
+        y_scale = -y_scale
+
+    nan = float("nan")
+    for feature_start, feature_end in feature_ranges:
+        values, lengths, quantized = _decode_feature(buf, feature_start, feature_end)
+
+        for i, name in enumerate(names):
+            attributes[name].append(values[i] if i < len(values) else None)
+
+        if is_point:
+            if len(quantized) >= 2:
+                x.append(x_translate + quantized[0] * x_scale)
+                y.append(y_translate + quantized[1] * y_scale)
+            else:
+                x.append(nan)
+                y.append(nan)
+
+        elif is_multipart:
+            # vertices are deltas from the previous vertex of the feature
+            qx = qy = 0
+            for i in range(0, len(quantized) - 1, 2):
+                qx += quantized[i]
+                qy += quantized[i + 1]
+                coords.append(x_translate + qx * x_scale)
+                coords.append(y_translate + qy * y_scale)
+
+            for length in lengths:
+                part_offsets.append(part_offsets[-1] + length)
+            feature_offsets.append(len(part_offsets) - 1)
+
+    oid_field = result["objectIdFieldName"]
+    result["objectIds"] = attributes.get(oid_field, [])
+    result["attributes"] = attributes
+    result["x"] = x if is_point else None
+    result["y"] = y if is_point else None
+    result["coords"] = coords if is_multipart else None
+    result["part_offsets"] = part_offsets if is_multipart else None
+    result["feature_offsets"] = feature_offsets if is_multipart else None
+
+    return result
+
+
+def _decode_feature(buf, start, end):
+    "Return (attribute values, part lengths, quantized geometry coords) of a Feature"
+
+    values, lengths, coords = list(), list(), list()
+
+    for number, _, value in _iter_fields(buf, start, end):
+        if number == 1:
+            values.append(_decode_value(buf, *value))
+        elif number == 2:
+            for geometry_number, wire_type, geometry_value in _iter_fields(buf, *value):
+                if geometry_number == 2:
+                    if wire_type == _WIRE_LENGTH:
+                        lengths.extend(_iter_packed_varints(buf, *geometry_value))
+                    else:
+                        lengths.append(geometry_value)
+                elif geometry_number == 3:
+                    coords = [_zigzag(v) for v in _iter_packed_varints(buf, *geometry_value)]
+
+    return values, lengths, coords
+
+
+def _decode_value(buf, start, end):
+    "Decode a Value, an empty Value is null"
+
+    for number, _, value in _iter_fields(buf, start, end):
+        if number == 1:
+            return _decode_string(buf, value)
+        if number == 2:
+            return struct.unpack("<f", value)[0]
+        if number == 3:
+            return struct.unpack("<d", value)[0]
+        if number in [4, 8]:
+            return _zigzag(value)
+        if number in [5, 7]:
+            return value
+        if number == 6:
+            return value - (1 << 64) if value >= 1 << 63 else value
+        if number == 9:
+            return bool(value)
+
+    return None
+
+
+def _decode_field(buf, start, end):
+
+    field = {"name": None, "type": FIELD_TYPES[0], "alias": None}
+    for number, _, value in _iter_fields(buf, start, end):
+        if number == 1:
+            field["name"] = _decode_string(buf, value)
+        elif number == 2:
+            field["type"] = FIELD_TYPES.get(value)
+        elif number == 3:
+            field["alias"] = _decode_string(buf, value)
+    return field
+
+
+def _decode_spatial_reference(buf, start, end):
+
+    spatial_reference = dict()
+    for number, _, value in _iter_fields(buf, start, end):
+        if number == 1:
+            spatial_reference["wkid"] = value
+        elif number == 2:
+            spatial_reference["latestWkid"] = value
+        elif number == 5:
+            spatial_reference["wkt"] = _decode_string(buf, value)
+    return spatial_reference
+
+
+def _decode_transform(buf, start, end):
+
+    transform = {"originPosition": "upperLeft", "scale": [1, 1], "translate": [0, 0]}
+    for number, _, value in _iter_fields(buf, start, end):
+        if number == 1:
+            transform["originPosition"] = QUANTIZE_ORIGIN_POSITIONS.get(value)
+        elif number == 2:
+            transform["scale"] = _decode_doubles(buf, *value)
+        elif number == 3:
+            transform["translate"] = _decode_doubles(buf, *value)
+    return transform
+
+
+def _decode_doubles(buf, start, end):
+    "Decode Scale or Translate as [x, y]"
+
+    doubles = [0.0, 0.0]
+    for number, _, value in _iter_fields(buf, start, end):
+        if number in [1, 2]:
+            doubles[number - 1] = struct.unpack("<d", value)[0]
+    return doubles
+
+
+def _decode_count_result(buf, start, end):
+    for number, _, value in _iter_fields(buf, start, end):
+        if number == 1:
+            return value
+    return 0
+
+
+def _decode_ids_result(buf, start, end):
+
+    result = {"objectIdFieldName": None, "objectIds": list()}
+    for number, wire_type, value in _iter_fields(buf, start, end):
+        if number == 1:
+            result["objectIdFieldName"] = _decode_string(buf, value)
+        elif number == 3:
+            if wire_type == _WIRE_LENGTH:
+                result["objectIds"].extend(_iter_packed_varints(buf, *value))
+            else:
+                result["objectIds"].append(value)
+    return result
+
+
+def _decode_string(buf, value):
+    start, end = value
+    return bytes(buf[start:end]).decode("utf-8")
+
+
+def _zigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_packed_varints(buf, start, end):
+    pos = start
+    while pos < end:
+        value, pos = _read_varint(buf, pos)
+        yield value
+
+
+def _iter_fields(buf, start, end):
+    """
+    Yield (field number, wire type, value) for each field of a message.
+    value is an int for varints, bytes for fixed width fields and a
+    (start, end) range into buf for length delimited fields.
+    """
+
+    pos = start
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        number, wire_type = key >> 3, key & 0x7
+
+        if wire_type == _WIRE_VARINT:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == _WIRE_FIXED64:
+            value = bytes(buf[pos : pos + 8])
+            pos += 8
+        elif wire_type == _WIRE_LENGTH:
+            length, pos = _read_varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire_type == _WIRE_FIXED32:
+            value = bytes(buf[pos : pos + 4])
+            pos += 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire_type}")
+
+        yield number, wire_type, value
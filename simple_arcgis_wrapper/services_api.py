@@ -2,24 +2,209 @@
 docs
 """
 
-import json
-
-from .exceptions import ArcGISException
-from .models import FeatureLayer, FeatureService, PointFeature, Table, TableRow
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+
+from . import codec, pbf
+from .exceptions import ArcGISException, ArcGISUnavailableError
+from .models import (
+    MULTIPART_KEYS,
+    AttributeSchema,
+    BatchResult,
+    ChangeSet,
+    EditResult,
+    FeatureBatch,
+    FeatureLayer,
+    FeatureService,
+    PointFeature,
+    PolygonFeature,
+    PolylineFeature,
+    Table,
+    TableRow,
+)
+from .utilities.batching import chunk_encoded, chunk_features, join_encoded
+from .utilities.cache import TTLCache
+from .utilities.geometry import flatten_parts, nest_parts
+from .utilities.quantization import dequantize_features, get_dequantizer
+
+
+# used when a layer does not report its maxRecordCount
+DEFAULT_MAX_RECORD_COUNT = 1000
+
+# budget for the serialized features of a single edit request
+DEFAULT_MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+# concurrent queries of extract_features
+DEFAULT_EXTRACT_WORKERS = 8
+
+# keys per IN clause when upserts look up existing features
+DEFAULT_KEY_CHUNK_SIZE = 500
+
+# service and layer definitions are cached for this many seconds
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_SIZE = 256
+
+# statuses of requests rejected before being processed, safe to send again
+POST_RETRY_STATUSES = [429, 503]
 
 
 class ServicesAPI(object):
-    def __init__(self, base_url, requester, username):
+    def __init__(
+        self,
+        base_url,
+        requester,
+        username,
+        cache_ttl=DEFAULT_CACHE_TTL,
+        cache_size=DEFAULT_CACHE_SIZE,
+    ):
         self.base_url = base_url
         self.requester = requester
         self.username = username
 
+        # feature service and layer definitions keyed by url
+        self._definitions = TTLCache(cache_size, cache_ttl)
+
     def _add_feature(self, features, layer_url):
         "docs"
         raise NotImplementedError()
 
+    def _get_layer_definition(self, layer_id, feature_service_url):
+        "Return the layer or table definition, looked up once per layer."
+
+        layer_url = f"{feature_service_url}/{layer_id}"
+        definition = self._definitions.get(layer_url)
+        if definition is None:
+            definition = self.requester.GET(layer_url, dict())
+            if definition.get("error", False):
+                raise ArcGISException(
+                    definition["error"].get("message", "get_layer_definition error")
+                )
+
+            self._definitions.set(layer_url, definition)
+
+        return definition
+
+    def _get_feature_service_definition(self, feature_service_url, error_message):
+        "Return the feature service definition indexed by layer and table id and name."
+
+        index = self._definitions.get(feature_service_url)
+        if index is None:
+            res = self.requester.GET(feature_service_url, dict())
+            if res.get("error", False):
+                raise ArcGISException(res["error"].get("message", error_message))
+
+            index = ServicesAPI._index_feature_service_definition(res)
+            self._definitions.set(feature_service_url, index)
+
+        return index
+
+    def _invalidate_definitions(self, feature_service_url, layer_ids=[]):
+        "Drop cached definitions after the service's layers or tables change."
+
+        self._definitions.invalidate(feature_service_url)
+        for layer_id in layer_ids:
+            self._definitions.invalidate(f"{feature_service_url}/{layer_id}")
+
+    def _get_max_record_count(self, layer_id, feature_service_url):
+        "Return the layer's maxRecordCount."
+
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+        return definition.get("maxRecordCount") or DEFAULT_MAX_RECORD_COUNT
+
+    def _post_batches(self, url, payloads, results_key, max_workers, error_message):
+        """
+        POST each payload and merge the results in payload order.
+        Payloads are sent concurrently when max_workers is greater than 1.
+        """
+
+        batch_results = self._post_batch_results(
+            url, payloads, results_key, max_workers, error_message
+        )
+        return ServicesAPI._merge_results(batch_results)
+
+    def _post_batch_results(
+        self, url, payloads, results_key, max_workers, error_message, return_errors=False
+    ):
+        """
+        POST each payload and return the list of results of each, in payload order.
+        With return_errors, a payload whose request fails gets the ArcGISException
+        instead of raising it, an ArcGISUnavailableError when it was not processed.
+        """
+
+        def post(data):
+            try:
+                res = self.requester.POST(url, data)
+
+                error = res.get("error", False)
+                if error:
+                    message = error.get("message", error_message)
+                    if error.get("code") in POST_RETRY_STATUSES:
+                        raise ArcGISUnavailableError(message)
+                    raise ArcGISException(message)
+            except ArcGISException as e:
+                if not return_errors:
+                    raise
+                return e
+
+            return res.get(results_key, [])
+
+        if max_workers is not None and max_workers > 1 and len(payloads) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(post, payloads))
+
+        return [post(data) for data in payloads]
+
+    def _post_features(
+        self,
+        url,
+        features,
+        results_key,
+        batch_size,
+        max_batch_bytes,
+        max_workers,
+        error_message,
+        retries=0,
+    ):
+        """
+        POST features in batches and return a BatchResult in input order.
+        None features are inputs that could not be converted, they are not sent
+        and fail. With retries, failed features are sent again up to retries
+        times and a failed request fails its features instead of raising.
+        Only features the server rejected and requests it did not process are
+        sent again, a request that may have been applied (e.g. after a read
+        timeout) fails its features without retry.
+        """
+
+        results = dict()
+        pending = list()  # input index of each encoded feature to send
+
+        # features are consumed once, failed ones are sent again from their encoding
+        encoded = ServicesAPI._encode_features(features, results, pending)
+        for _ in range(retries + 1):
+            batches = list(chunk_encoded(encoded, batch_size, max_batch_bytes))
+            if not batches:
+                break
+
+            batch_results = self._post_batch_results(
+                url,
+                [{"features": join_encoded(batch)} for batch in batches],
+                results_key,
+                max_workers,
+                error_message,
+                return_errors=retries > 0,
+            )
+
+            failed = ServicesAPI._set_batch_results(
+                batches, batch_results, pending, results
+            )
+            pending[:] = [i for i, _ in failed]
+            encoded = [feature for _, feature in failed]
+
+        return BatchResult([results[i] for i in range(len(results))])
+
     def add_point(self, lon, lat, attributes, layer_id, feature_service_url):
-        "docs"
+        "Add one point and return it as a PointFeature with its new object id"
 
         if abs(lon) > 180:  # TODO: let ArcGIS reject this?
             raise ValueError("invalid x value")
@@ -33,7 +218,7 @@ class ServicesAPI(object):
             {"attributes": attributes, "geometry": {"x": x, "y": y},}  # decimal degrees
         ]
 
-        data = {"features": json.dumps(features)}
+        data = {"features": codec.dumps(features)}
 
         add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
         res = self.requester.POST(add_features_url, data)
@@ -41,51 +226,400 @@ class ServicesAPI(object):
         if res.get("error", False):
             raise ArcGISException(res["error"].get("message", "add_point error"))
 
-        if not res["addResults"][0]["success"]:
-            raise ArcGISException(res["addResults"][0]["error"]["description"])
+        result = EditResult.fromresult(0, (res.get("addResults") or [{}])[0])
+        if not result.success:
+            raise ArcGISException(result.error_description or "add_point error")
+
+        return PointFeature(result.object_id, x, y, attributes)
+
+    def add_points(
+        self,
+        points,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+        retries=0,
+    ):
+        """
+        points is a list of dicts. Each dict must contain lon, lat and any required attributes.
+        Points are sent in batches of at most batch_size features (the layer's
+        maxRecordCount by default) and max_batch_bytes of serialized JSON.
+        With max_workers greater than 1 the batches are sent concurrently.
+        Returns a BatchResult, {objectId: success} which also has the result of
+        each input point in results and failed. With retries, only the points
+        that failed (alone or because their request failed) are sent again, up
+        to retries more times.
+        """
 
-        # TODO: why not return PointFeature?
-        # return PointFeature(res["addResults"][0]["objectId"], x, y)
-        return res["addResults"][0]["success"]
+        features = ServicesAPI._get_point_features(points, keep_skipped=True)
 
-    def add_points(self, points, layer_id, feature_service_url):
-        "points is a list of dicts. Each dict must contain lon, lat and any required attributes."
+        if batch_size is None:
+            batch_size = self._get_max_record_count(layer_id, feature_service_url)
 
-        # TODO: convert Decimal to str %0.2f?
+        add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
+        return self._post_features(
+            add_features_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "add_points error",
+            retries,
+        )
 
-        features = list()
-        for point in points:
-            try:
-                lon = point.pop("lon")
-                lat = point.pop("lat")
-            except KeyError:
-                continue
+    def add_polylines(
+        self,
+        polylines,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+        retries=0,
+    ):
+        """
+        polylines is a list of dicts. Each dict must contain either paths (a list
+        of lists of [x, y]) or coords and offsets as in PolylineFeature, plus any
+        required attributes. Sent in batches and retried like add_points.
+        """
 
-            features.append({"geometry": {"x": lon, "y": lat}, "attributes": {**point}})
+        features = ServicesAPI._get_multipart_features(polylines, "paths")
 
-        data = {"features": json.dumps(features)}
+        if batch_size is None:
+            batch_size = self._get_max_record_count(layer_id, feature_service_url)
 
         add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
-        res = self.requester.POST(add_features_url, data)
+        return self._post_features(
+            add_features_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "add_polylines error",
+            retries,
+        )
 
-        if res.get("error", False):
-            raise ArcGISException(res["error"].get("message", "add_points error"))
+    def add_polygons(
+        self,
+        polygons,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+        retries=0,
+    ):
+        "Like add_polylines with rings instead of paths, see PolygonFeature."
+
+        features = ServicesAPI._get_multipart_features(polygons, "rings")
 
-        return {u["objectId"]: u["success"] for u in res.get("addResults", [])}
+        if batch_size is None:
+            batch_size = self._get_max_record_count(layer_id, feature_service_url)
+
+        add_features_url = f"{feature_service_url}/{layer_id}/addFeatures"
+        return self._post_features(
+            add_features_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "add_polygons error",
+            retries,
+        )
 
-    def add_table_rows(self, rows, table_id, feature_service_url):
-        "rows is a list of dicts. Each dict must contain the required attributes."
+    def add_table_rows(
+        self,
+        rows,
+        table_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+        retries=0,
+    ):
+        "rows is a list of dicts of the required attributes, sent like add_points."
 
         features = [{"attributes": row} for row in rows]
-        data = {"features": json.dumps(features)}
+
+        if batch_size is None:
+            batch_size = self._get_max_record_count(table_id, feature_service_url)
 
         add_rows_url = f"{feature_service_url}/{table_id}/addFeatures"
-        res = self.requester.POST(add_rows_url, data)
+        return self._post_features(
+            add_rows_url,
+            features,
+            "addResults",
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "add_table_rows error",
+            retries,
+        )
+
+    def _post_edits(
+        self, layer_id, feature_service_url, payload, rollback_on_failure, error_message
+    ):
+        "POST a layer applyEdits payload and return the raw response"
+
+        data = {**payload, "rollbackOnFailure": codec.dumps(rollback_on_failure)}
+
+        apply_edits_url = f"{feature_service_url}/{layer_id}/applyEdits"
+        res = self.requester.POST(apply_edits_url, data)
 
         if res.get("error", False):
-            raise ArcGISException(res["error"].get("message", "add_table_rows error"))
+            raise ArcGISException(res["error"].get("message", error_message))
+
+        return res
+
+    def apply_edits(
+        self,
+        layer_id,
+        feature_service_url,
+        adds=None,
+        updates=None,
+        deletes=None,
+        rollback_on_failure=True,
+    ):
+        """
+        Add, update and delete features of a feature layer or table in one request.
+        adds and updates are lists of features ({"attributes": {...}, "geometry": {...}},
+        updates must include OBJECTID), deletes is a list of object ids.
+        With rollback_on_failure nothing is applied unless every edit succeeds.
+        Returns {"adds": {objectId: success}, "updates": {...}, "deletes": {...}}.
+        """
+
+        payload = ServicesAPI._get_edits_payload(adds, updates, deletes)
+        if not payload:
+            return ServicesAPI._merge_edit_results(dict())
+
+        res = self._post_edits(
+            layer_id,
+            feature_service_url,
+            payload,
+            rollback_on_failure,
+            "apply_edits error",
+        )
+        return ServicesAPI._merge_edit_results(res)
+
+    def apply_service_edits(self, edits, feature_service_url, rollback_on_failure=True):
+        """
+        Edit several layers and tables of a feature service in one request.
+        edits is a dict of layer or table id to a dict with optional adds,
+        updates and deletes as in apply_edits. With rollback_on_failure nothing
+        is applied in any layer unless every edit succeeds.
+        Returns a dict of layer id to apply_edits results.
+        """
+
+        data = {
+            "edits": ServicesAPI._get_service_edits_payload(edits),
+            "rollbackOnFailure": codec.dumps(rollback_on_failure),
+        }
+
+        apply_edits_url = f"{feature_service_url}/applyEdits"
+        res = self.requester.POST(apply_edits_url, data)
+
+        return ServicesAPI._merge_service_edit_results(
+            edits, res, "apply_service_edits error"
+        )
+
+    def upsert_points(
+        self,
+        points,
+        key_field,
+        layer_id,
+        feature_service_url,
+        key_index=None,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+    ):
+        """
+        Add points whose key_field value (a unique attribute such as a device id)
+        is not in the layer yet and update the others.
+        points are as in add_points and must all contain key_field, when several
+        share a key only the last one is kept.
+        Existing object ids are looked up with one IN query per DEFAULT_KEY_CHUNK_SIZE
+        keys. key_index is an optional dict of key to object id: keys in it are not
+        looked up and it is filled with the looked up and added ids, so passing the
+        same dict to the next call only queries new keys.
+        Returns {"adds": {objectId: success}, "updates": {objectId: success}}.
+        """
+
+        features = ServicesAPI._get_point_features([dict(point) for point in points])
+        return self._upsert(
+            features,
+            key_field,
+            layer_id,
+            feature_service_url,
+            key_index,
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "upsert_points error",
+        )
+
+    def upsert_table_rows(
+        self,
+        rows,
+        key_field,
+        table_id,
+        feature_service_url,
+        key_index=None,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+    ):
+        "rows is a list of dicts of attributes, see upsert_points."
+
+        features = [{"attributes": row} for row in rows]
+        return self._upsert(
+            features,
+            key_field,
+            table_id,
+            feature_service_url,
+            key_index,
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "upsert_table_rows error",
+        )
+
+    def _upsert(
+        self,
+        features,
+        key_field,
+        layer_id,
+        feature_service_url,
+        key_index,
+        batch_size,
+        max_batch_bytes,
+        max_workers,
+        error_message,
+    ):
+        "Split features into adds and updates by key_field and applyEdits them in batches"
+
+        if key_index is None:
+            key_index = dict()
+
+        features_by_key = dict()
+        for feature in features:
+            key = feature["attributes"].get(key_field)
+            if key is None:
+                raise ValueError(f"every feature must have a {key_field} value")
+            features_by_key[key] = feature
+
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+        oid_field = definition.get("objectIdField") or "OBJECTID"
+
+        key_index.update(
+            self._get_object_ids_by_key(
+                [key for key in features_by_key if key not in key_index],
+                key_field,
+                layer_id,
+                feature_service_url,
+                max_workers,
+                error_message,
+            )
+        )
+
+        adds, add_keys, updates = list(), list(), list()
+        for key, feature in features_by_key.items():
+            object_id = key_index.get(key)
+            if object_id is None:
+                adds.append(feature)
+                add_keys.append(key)
+            else:
+                attributes = {**feature["attributes"], oid_field: object_id}
+                updates.append({**feature, "attributes": attributes})
+
+        if batch_size is None:
+            batch_size = definition.get("maxRecordCount") or DEFAULT_MAX_RECORD_COUNT
+
+        apply_edits_url = f"{feature_service_url}/{layer_id}/applyEdits"
+
+        add_results = self._post_batch_results(
+            apply_edits_url,
+            [
+                {"adds": join_encoded(batch)}
+                for batch in chunk_features(adds, batch_size, max_batch_bytes)
+            ],
+            "addResults",
+            max_workers,
+            error_message,
+        )
+        update_results = self._post_batch_results(
+            apply_edits_url,
+            [
+                {"updates": join_encoded(batch)}
+                for batch in chunk_features(updates, batch_size, max_batch_bytes)
+            ],
+            "updateResults",
+            max_workers,
+            error_message,
+        )
+
+        # add results are in request order, remember the new ids for the next call
+        results = [result for batch_result in add_results for result in batch_result]
+        for key, result in zip(add_keys, results):
+            if result.get("success", False):
+                key_index[key] = result["objectId"]
+
+        return {
+            "adds": ServicesAPI._merge_results(add_results),
+            "updates": ServicesAPI._merge_results(update_results),
+        }
+
+    def _get_object_ids_by_key(
+        self, keys, key_field, layer_id, feature_service_url, max_workers, error_message
+    ):
+        "{key: object id} of the features whose key_field is one of keys"
+
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+        oid_field = definition.get("objectIdField") or "OBJECTID"
+        chunk_size = min(
+            DEFAULT_KEY_CHUNK_SIZE,
+            definition.get("maxRecordCount") or DEFAULT_MAX_RECORD_COUNT,
+        )
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+
+        def query(chunk):
+            # POST since IN clauses quickly outgrow URL length limits
+            data = {
+                "where": ServicesAPI._get_in_clause(key_field, chunk),
+                "outFields": f"{key_field},{oid_field}",
+                "returnGeometry": "false",
+            }
+            res = self.requester.POST(query_url, data)
+
+            if res.get("error", False):
+                raise ArcGISException(res["error"].get("message", error_message))
+            if res.get("exceededTransferLimit", False):
+                raise ArcGISException(f"{key_field} values are not unique")
+
+            return res.get("features", [])
+
+        chunks = [keys[i : i + chunk_size] for i in range(0, len(keys), chunk_size)]
+        if max_workers is not None and max_workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pages = list(executor.map(query, chunks))
+        else:
+            pages = [query(chunk) for chunk in chunks]
+
+        object_ids = dict()
+        for features in pages:
+            for f in features:
+                key = f["attributes"][key_field]
+                if key in object_ids:
+                    raise ArcGISException(f"{key_field} {key!r} matches several features")
+                object_ids[key] = f["attributes"][oid_field]
 
-        return {u["objectId"]: u["success"] for u in res.get("addResults", [])}
+        return object_ids
 
     def create_feature_service(self, name, description):
         "docs"
@@ -101,7 +635,7 @@ class ServicesAPI(object):
         }
 
         data = {
-            "createParameters": json.dumps(create_params),
+            "createParameters": codec.dumps(create_params),
             "outputType": "featureService",
         }
 
@@ -139,27 +673,14 @@ class ServicesAPI(object):
 
         add_to_definition = {
             "layers": [
-                {
-                    "name": name,
-                    "description": description,
-                    "type": "Feature Layer",
-                    "geometryType": esri_type,
-                    "extent": {
-                        "type": "extent",
-                        "xmin": x_min,
-                        "ymin": y_min,
-                        "xmax": x_max,
-                        "ymax": y_max,
-                        "spatialReference": {"wkid": wkid},
-                    },
-                    "objectIdField": "OBJECTID",
-                    "fields": fields.get_fields(),
-                }
+                ServicesAPI._get_layer_definition_payload(
+                    esri_type, name, description, fields, x_min, y_min, x_max, y_max, wkid
+                )
             ]
         }
 
         data = {
-            "addToDefinition": json.dumps(add_to_definition),
+            "addToDefinition": codec.dumps(add_to_definition),
             "outputType": "featureService",
         }
 
@@ -168,6 +689,8 @@ class ServicesAPI(object):
         if not res.get("success", False):
             raise ArcGISException(res["error"]["message"])
 
+        self._invalidate_definitions(feature_service_url)
+
         layer_data = res["layers"][0]
         _id, _name, _url = (
             layer_data["id"],
@@ -188,18 +711,12 @@ class ServicesAPI(object):
 
         add_to_definition = {
             "tables": [
-                {
-                    "name": name,
-                    "description": description,
-                    "type": "table",
-                    "objectIdField": "OBJECTID",
-                    "fields": fields.get_fields(),
-                }
+                ServicesAPI._get_table_definition_payload(name, description, fields)
             ]
         }
 
         data = {
-            "addToDefinition": json.dumps(add_to_definition),
+            "addToDefinition": codec.dumps(add_to_definition),
             "outputType": "featureService",
         }
 
@@ -208,6 +725,8 @@ class ServicesAPI(object):
         if not res.get("success", False):
             raise ArcGISException(res["error"]["message"])
 
+        self._invalidate_definitions(feature_service_url)
+
         layer_data = res["layers"][0]
         _id, _name, _url = (
             layer_data["id"],
@@ -219,30 +738,75 @@ class ServicesAPI(object):
         return layer
 
     def delete_features(
-        self, layer_id, feature_service_url, object_ids=None, where=None
+        self,
+        layer_id,
+        feature_service_url,
+        object_ids=None,
+        where=None,
+        batch_size=None,
+        max_workers=None,
     ):
-        "delete features from a feature layer or table"
+        """
+        delete features from a feature layer or table
+        object_ids are deleted in batches of batch_size ids (the layer's
+        maxRecordCount by default), sent concurrently when max_workers is greater than 1.
+        """
 
         if object_ids is None and where is None:
             raise ValueError("object_ids or where required")
 
-        data = dict()
-
-        if object_ids is not None:
-            data["objectIds"] = ", ".join(
-                [str(_id) for _id in object_ids]
-            )  # convert each id to str first
+        if object_ids is not None and batch_size is None:
+            batch_size = self._get_max_record_count(layer_id, feature_service_url)
 
-        if where is not None:
-            data["where"] = where
+        payloads = ServicesAPI._get_delete_payloads(object_ids, where, batch_size)
 
         delete_features_url = f"{feature_service_url}/{layer_id}/deleteFeatures"
-        res = self.requester.POST(delete_features_url, data)
+        return self._post_batches(
+            delete_features_url,
+            payloads,
+            "deleteResults",
+            max_workers,
+            "delete_features error",
+        )
 
-        if res.get("error", False):
-            raise ArcGISException(res["error"].get("message", "delete_features error"))
+    def truncate_layer(self, layer_id, feature_service_url, max_workers=None):
+        """
+        Delete every feature of a feature layer or table.
+        Uses the admin truncate operation, which empties the layer at once but
+        needs the layer owner and is refused e.g. for layers with sync enabled.
+        Otherwise the object ids are fetched and deleted in batches like
+        delete_features, concurrently when max_workers is greater than 1.
+        """
 
-        return {u["objectId"]: u["success"] for u in res.get("deleteResults", [])}
+        truncate_url = (
+            feature_service_url.replace("/services/", "/admin/services/")
+            + f"/{layer_id}/truncate"
+        )
+        res = self.requester.POST(
+            truncate_url, {"attachmentOnly": "false", "async": "false"}
+        )
+        if res.get("success", False):
+            return True
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = self._query(
+            query_url,
+            {"where": "1=1", "returnIdsOnly": "true"},
+            "json",
+            "truncate_layer error",
+        )
+        object_ids = res.get("objectIds") or []
+        if not object_ids:
+            return True
+
+        deletes = self.delete_features(
+            layer_id, feature_service_url, object_ids=object_ids, max_workers=max_workers
+        )
+        failed = [_id for _id, success in deletes.items() if not success]
+        if failed:
+            raise ArcGISException(f"truncate_layer could not delete {len(failed)} features")
+
+        return True
 
     def delete_feature_layers(self, layer_ids, feature_service_url):
         "docs"
@@ -257,7 +821,7 @@ class ServicesAPI(object):
         }
 
         data = {
-            "deleteFromDefinition": json.dumps(deleteFromDefinition),
+            "deleteFromDefinition": codec.dumps(deleteFromDefinition),
         }
 
         res = self.requester.POST(delete_layers_url, data)
@@ -265,6 +829,8 @@ class ServicesAPI(object):
         if not res.get("success", False):
             raise ArcGISException(res["error"]["message"])
 
+        self._invalidate_definitions(feature_service_url, layer_ids)
+
         return True
 
     def delete_feature_service(self, service_id):
@@ -294,7 +860,7 @@ class ServicesAPI(object):
         }
 
         data = {
-            "deleteFromDefinition": json.dumps(deleteFromDefinition),
+            "deleteFromDefinition": codec.dumps(deleteFromDefinition),
         }
 
         res = self.requester.POST(delete_tables_url, data)
@@ -302,131 +868,1105 @@ class ServicesAPI(object):
         if not res.get("success", False):
             raise ArcGISException(res["error"]["message"])
 
-        return True
+        self._invalidate_definitions(feature_service_url, table_ids)
 
-    def get_features(self, where, layer_id, feature_service_url, out_fields=[]):
-        "where is an ArcGIS formatted string. out_fields is a list of fields."
+        return True
 
-        if "OBJECTID" not in out_fields:
-            out_fields.append("OBJECTID")
+    def _query(self, query_url, params, response_format, error_message):
+        """
+        GET a query, decoding pbf responses with pbf.decode_feature_collection
+        and quantized JSON geometries with utilities.quantization.
+        """
 
-        params = {"where": where, "outFields": ",".join(out_fields)}
+        res = self.requester.GET(query_url, params, f=response_format)
 
-        query_url = f"{feature_service_url}/{layer_id}/query"
-        res = self.requester.GET(query_url, params)
+        if isinstance(res, bytes):
+            return pbf.decode_feature_collection(res)
 
         if res.get("error", False):
-            raise ArcGISException(res["error"].get("message", "get_features error"))
+            raise ArcGISException(res["error"].get("message", error_message))
 
-        features = list()
-        for f in res.get("features", []):
-            if res["geometryType"] == "esriGeometryPoint":
-                features.append(
-                    PointFeature(
-                        f["attributes"]["OBJECTID"],
-                        f.get("geometry", {}).get("x"),
-                        f.get("geometry", {}).get("y"),
-                    )
-                )
-            else:
-                raise NotImplementedError("non-point features not yet implemented")
+        return dequantize_features(res)
 
-        return features
+    def _iter_query_pages(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields,
+        page_size,
+        error_message,
+        response_format="json",
+        geometry_params=None,
+    ):
+        """
+        Yield query responses one page at a time.
+        Pages with resultOffset when the layer supports pagination and with
+        OBJECTID keyset paging otherwise. The next page is requested in the
+        background while the caller processes the current one.
+        """
 
-    def get_table_rows(self, where, table_id, feature_service_url, out_fields=[]):
-        "where is an ArcGIS formatted string. out_fields is a list of fields."
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+        get_page_params = ServicesAPI._get_page_params_factory(
+            definition, where, out_fields, page_size
+        )
+        oid_field = definition.get("objectIdField") or "OBJECTID"
 
-        if "OBJECTID" not in out_fields:
-            out_fields.append("OBJECTID")
+        query_url = f"{feature_service_url}/{layer_id}/query"
 
-        params = {"where": where, "outFields": ",".join(out_fields)}
+        def fetch_page(offset, last_oid):
+            params = {**get_page_params(offset, last_oid), **(geometry_params or {})}
+            return self._query(query_url, params, response_format, error_message)
 
-        query_url = f"{feature_service_url}/{table_id}/query"
-        res = self.requester.GET(query_url, params)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            offset, last_oid = 0, -1
+            future = executor.submit(fetch_page, offset, last_oid)
 
-        if res.get("error", False):
-            raise ArcGISException(res["error"].get("message", "get_table_rows error"))
+            while future is not None:
+                res = future.result()
+                object_ids = ServicesAPI._get_page_object_ids(res, oid_field)
 
-        rows = [TableRow(f["attributes"]["OBJECTID"]) for f in res.get("features", [])]
-        return rows
+                future = None
+                if object_ids and res.get("exceededTransferLimit", False):
+                    offset += len(object_ids)
+                    last_oid = max(object_ids)
+                    future = executor.submit(fetch_page, offset, last_oid)
 
-    def get_feature_layer(self, feature_service_url, layer_id=None, layer_name=None):
-        "docs"
+                yield res
 
-        res = self.requester.GET(feature_service_url)
-        if res.get("error", False):
-            raise ArcGISException(
-                res["error"].get("message", "get_feature_layer error")
-            )
+    def _iter_streamed_features(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields,
+        page_size,
+        error_message,
+        geometry_params=None,
+    ):
+        """
+        Yield (schema, geometry type, feature) for every feature of every page,
+        parsing each response incrementally with Requester.GET_STREAM.
+        Pages are requested one after the other since the next page's params
+        are only known once the current page has been read.
+        """
 
-        for layer in res.get("layers", []):
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+        get_page_params = ServicesAPI._get_page_params_factory(
+            definition, where, out_fields, page_size
+        )
+        oid_field = definition.get("objectIdField") or "OBJECTID"
 
-            # explicitly use is not None because layer_id may be 0
-            if (layer_id is not None and layer_id == layer["id"]) or (
-                layer_name is not None and layer_name == layer["name"]
-            ):
-                _id, _name, _url = (
-                    layer["id"],
-                    layer["name"],
-                    f'{feature_service_url}/{layer["id"]}',
-                )
-                return FeatureLayer(_id, _name, _url)
+        query_url = f"{feature_service_url}/{layer_id}/query"
 
-    def get_table(self, feature_service_url, table_id=None, table_name=None):
+        offset, last_oid = 0, -1
+        while True:
+            stream = self.requester.GET_STREAM(
+                query_url,
+                {**get_page_params(offset, last_oid), **(geometry_params or {})},
+            )
 
-        res = self.requester.GET(feature_service_url)
-        if res.get("error", False):
-            raise ArcGISException(res["error"].get("message", "get_table error"))
+            count, schema, dequantize = 0, None, None
+            for f in stream:
+                if schema is None:
+                    schema = ServicesAPI._get_schema({**stream.envelope, "features": [f]})
+                    if stream.envelope.get("transform"):
+                        dequantize = get_dequantizer(stream.envelope["transform"])
 
-        for table in res.get("tables", []):
+                if dequantize is not None:
+                    dequantize(f)
 
-            # explicitly use is not None because layer_id may be 0
-            if (table_id is not None and table_id == table["id"]) or (
-                table_name is not None and table_name == table["name"]
-            ):
-                _id, _name, _url = (
-                    table["id"],
-                    table["name"],
-                    f'{feature_service_url}/{table["id"]}',
+                count += 1
+                last_oid = max(last_oid, f["attributes"][oid_field])
+                yield schema, stream.envelope.get("geometryType"), f
+
+            if stream.envelope.get("error", False):
+                raise ArcGISException(
+                    stream.envelope["error"].get("message", error_message)
                 )
-                return Table(_id, _name, _url)
 
-    def get_feature_service(self, name, owner_username=None):
-        "docs"
+            if not count or not stream.envelope.get("exceededTransferLimit", False):
+                return
+            offset += count
 
-        service_owner = owner_username or self.username
-        search_url = f"{self.base_url}/search"
-        params = {
-            "q": f'title: {name} AND owner: {service_owner} AND type: "Feature Service"',
-        }
+    def iter_features(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields=[],
+        page_size=None,
+        as_batch=False,
+        response_format="json",
+        stream=False,
+        return_geometry=True,
+        out_sr=None,
+        max_allowable_offset=None,
+        geometry_precision=None,
+        quantization_parameters=None,
+    ):
+        """
+        Generator version of get_features which pages through every matching feature.
+        page_size defaults to the layer's maxRecordCount. Only one page is held
+        in memory (plus the one being prefetched) regardless of layer size.
+        With as_batch, yields one FeatureBatch per page instead of PointFeatures.
+        response_format="pbf" is as in get_features and implies as_batch.
+        With stream, each page is parsed as it is downloaded and features are
+        yielded as they arrive, so not even a whole page is held in memory.
+        The geometry options are as in get_features.
+        """
 
-        res = self.requester.GET(search_url, params)
-        if res.get("error", False):
-            raise ArcGISException(
-                res["error"].get("message", "get_feature_service error")
+        geometry_params = ServicesAPI._get_geometry_params(
+            return_geometry,
+            out_sr,
+            max_allowable_offset,
+            geometry_precision,
+            quantization_parameters,
+        )
+
+        if stream:
+            features = self._iter_streamed_features(
+                where,
+                layer_id,
+                feature_service_url,
+                out_fields,
+                page_size,
+                "iter_features error",
+                geometry_params,
             )
+            for schema, geometry_type, f in features:
+                yield ServicesAPI._get_feature(f, geometry_type, schema)
+            return
+
+        pages = self._iter_query_pages(
+            where,
+            layer_id,
+            feature_service_url,
+            out_fields,
+            page_size,
+            "iter_features error",
+            response_format,
+            geometry_params,
+        )
+        for res in pages:
+            if response_format == "pbf":
+                yield FeatureBatch.frompbfresult(res)
+                continue
 
-        for result in res.get("results", []):
-            if name == result["name"]:
-                return FeatureService(
-                    result["id"], result["name"], result["title"], result["url"]
-                )
+            if as_batch:
+                yield FeatureBatch.fromqueryresult(res)
+                continue
 
-    def update_features(self, updates, layer_id, feature_service_url):
-        """
-        Batch updates features. 
-        updates is a list of tuples.
-        Each tuple has 3 elements: (id, attribute_dict, geometry_dict)
-        If not updating attributes or geometry, pass None.
-        Incorrect geometries are not validated and will clear the feature's geometry.
-        """
+            schema = ServicesAPI._get_schema(res)
+            for f in res.get("features", []):
+                yield ServicesAPI._get_feature(f, res.get("geometryType"), schema)
 
-        # create updates list by adding additional attributes or geometry key
+    def iter_table_rows(
+        self,
+        where,
+        table_id,
+        feature_service_url,
+        out_fields=[],
+        page_size=None,
+        stream=False,
+    ):
+        "Generator version of get_table_rows, see iter_features."
+
+        if stream:
+            rows = self._iter_streamed_features(
+                where,
+                table_id,
+                feature_service_url,
+                out_fields,
+                page_size,
+                "iter_table_rows error",
+            )
+            for schema, _, f in rows:
+                yield ServicesAPI._get_table_row(f, schema)
+            return
+
+        pages = self._iter_query_pages(
+            where,
+            table_id,
+            feature_service_url,
+            out_fields,
+            page_size,
+            "iter_table_rows error",
+        )
+        for res in pages:
+            schema = ServicesAPI._get_schema(res)
+            for f in res.get("features", []):
+                yield ServicesAPI._get_table_row(f, schema)
+
+    def _iter_extracted_pages(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields,
+        max_workers,
+        response_format,
+        error_message,
+        geometry_params=None,
+    ):
+        """
+        Yield query responses covering every matching feature in OBJECTID order.
+        The matching ids are fetched first and split into ranges of at most
+        maxRecordCount ids, which are queried concurrently by max_workers threads.
+        At most 2 * max_workers pages are held at once.
+        """
+
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+        query_url = f"{feature_service_url}/{layer_id}/query"
+
+        res = self._query(
+            query_url, {"where": where, "returnIdsOnly": "true"}, "json", error_message
+        )
+        range_params = ServicesAPI._get_id_range_params(
+            definition, res.get("objectIds") or [], where, out_fields
+        )
+
+        def fetch_range(params):
+            params = {**params, **(geometry_params or {})}
+            return self._query(query_url, params, response_format, error_message)
+
+        range_params = iter(range_params)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = deque()
+            for params in range_params:
+                futures.append(executor.submit(fetch_range, params))
+                if len(futures) >= 2 * max_workers:
+                    break
+
+            while futures:
+                res = futures.popleft().result()
+                params = next(range_params, None)
+                if params is not None:
+                    futures.append(executor.submit(fetch_range, params))
+                yield res
+
+    def extract_features(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields=[],
+        max_workers=DEFAULT_EXTRACT_WORKERS,
+        as_batch=False,
+        response_format="json",
+        return_geometry=True,
+        out_sr=None,
+        max_allowable_offset=None,
+        geometry_precision=None,
+        quantization_parameters=None,
+    ):
+        """
+        Fetch every matching feature with concurrent queries, for bulk exports
+        of whole layers. Features are returned in OBJECTID order as a list of
+        PointFeatures or, with as_batch or response_format="pbf", a single
+        FeatureBatch. The other options are as in get_features.
+        """
+
+        geometry_params = ServicesAPI._get_geometry_params(
+            return_geometry,
+            out_sr,
+            max_allowable_offset,
+            geometry_precision,
+            quantization_parameters,
+        )
+
+        pages = self._iter_extracted_pages(
+            where,
+            layer_id,
+            feature_service_url,
+            out_fields,
+            max_workers,
+            response_format,
+            "extract_features error",
+            geometry_params,
+        )
+
+        if response_format == "pbf":
+            return FeatureBatch.concat([FeatureBatch.frompbfresult(res) for res in pages])
+
+        if as_batch:
+            return FeatureBatch.concat([FeatureBatch.fromqueryresult(res) for res in pages])
+
+        features = list()
+        for res in pages:
+            schema = ServicesAPI._get_schema(res)
+            features.extend(
+                ServicesAPI._get_feature(f, res.get("geometryType"), schema)
+                for f in res.get("features", [])
+            )
+        return features
+
+    def extract_table_rows(
+        self,
+        where,
+        table_id,
+        feature_service_url,
+        out_fields=[],
+        max_workers=DEFAULT_EXTRACT_WORKERS,
+    ):
+        "Fetch every matching table row with concurrent queries, see extract_features."
+
+        pages = self._iter_extracted_pages(
+            where,
+            table_id,
+            feature_service_url,
+            out_fields,
+            max_workers,
+            "json",
+            "extract_table_rows error",
+        )
+
+        rows = list()
+        for res in pages:
+            schema = ServicesAPI._get_schema(res)
+            rows.extend(
+                ServicesAPI._get_table_row(f, schema) for f in res.get("features", [])
+            )
+        return rows
+
+    def get_changes(
+        self, layer_id, feature_service_url, checkpoint=None, out_fields=["*"]
+    ):
+        """
+        Features inserted, updated and deleted since checkpoint, as a ChangeSet.
+        Uses extractChanges when the service has change tracking enabled and the
+        layer's edit date field otherwise, which cannot detect deletes.
+        Without a checkpoint every feature is returned as an insert.
+        out_fields only applies to queries, extractChanges returns every field.
+        Pass changes.checkpoint to the next call once the changes are processed,
+        see utilities.checkpoints.CheckpointStore to persist it.
+        """
+
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+
+        if checkpoint is None:
+            server_gen = self._get_server_gen(layer_id, feature_service_url)
+            if server_gen is not None:
+                checkpoint = {"serverGen": server_gen}
+            else:
+                checkpoint = {"editDate": None}
+
+            inserts = self._get_all_changes(
+                layer_id, feature_service_url, definition, checkpoint, out_fields
+            )
+            return ChangeSet(inserts, [], [], checkpoint)
+
+        if "serverGen" in checkpoint:
+            return self._extract_changes(
+                layer_id, feature_service_url, definition, checkpoint["serverGen"]
+            )
+
+        return self._get_edit_date_changes(
+            layer_id, feature_service_url, definition, checkpoint["editDate"], out_fields
+        )
+
+    def _get_server_gen(self, layer_id, feature_service_url):
+        "The layer's current change tracking generation, None when the service has no change tracking"
+
+        res = self.requester.GET(feature_service_url, dict())
+        if res.get("error", False):
+            raise ArcGISException(res["error"].get("message", "get_changes error"))
+
+        if "ChangeTracking" not in res.get("capabilities", ""):
+            return None
+
+        layer_server_gens = res.get("changeTrackingInfo", {}).get("layerServerGens", [])
+        for layer_server_gen in layer_server_gens:
+            if layer_server_gen["id"] == layer_id:
+                return layer_server_gen["serverGen"]
+
+        return None
+
+    def _get_all_changes(
+        self, layer_id, feature_service_url, definition, checkpoint, out_fields
+    ):
+        "Every feature for a first get_changes, updating the editDate checkpoint"
+
+        edit_field = definition.get("editFieldsInfo", {}).get("editDateField")
+        if "editDate" in checkpoint:
+            if not edit_field:
+                raise ArcGISException(
+                    "get_changes requires change tracking or an edit date field"
+                )
+            out_fields = ServicesAPI._with_field(out_fields, edit_field)
+
+        pages = self._iter_extracted_pages(
+            "1=1",
+            layer_id,
+            feature_service_url,
+            out_fields,
+            DEFAULT_EXTRACT_WORKERS,
+            "json",
+            "get_changes error",
+        )
+
+        features = list()
+        for res in pages:
+            features.extend(res.get("features", []))
+
+        if "editDate" in checkpoint:
+            checkpoint["editDate"] = ServicesAPI._get_max_edit_date(
+                features, edit_field, None
+            )
+
+        return ServicesAPI._get_change_models(features, definition)
+
+    def _extract_changes(self, layer_id, feature_service_url, definition, server_gen):
+        "get_changes with the extractChanges endpoint"
+
+        data = {
+            "layers": codec.dumps([layer_id]),
+            "layerServerGens": codec.dumps([{"id": layer_id, "serverGen": server_gen}]),
+            "returnInserts": "true",
+            "returnUpdates": "true",
+            "returnDeletes": "true",
+            "dataFormat": "json",
+        }
+
+        extract_changes_url = f"{feature_service_url}/extractChanges"
+        res = self.requester.POST(extract_changes_url, data)
+
+        if res.get("error", False):
+            raise ArcGISException(res["error"].get("message", "get_changes error"))
+
+        for layer_server_gen in res.get("layerServerGens", []):
+            if layer_server_gen["id"] == layer_id:
+                server_gen = layer_server_gen["serverGen"]
+
+        changes = dict()
+        for edit in res.get("edits", []):
+            if edit["id"] == layer_id:
+                changes = edit.get("features", {})
+
+        return ChangeSet(
+            ServicesAPI._get_change_models(changes.get("adds", []), definition),
+            ServicesAPI._get_change_models(changes.get("updates", []), definition),
+            changes.get("deleteIds", []),
+            {"serverGen": server_gen},
+        )
+
+    def _get_edit_date_changes(
+        self, layer_id, feature_service_url, definition, edit_date, out_fields
+    ):
+        "get_changes by querying the edit date field"
+
+        edit_fields_info = definition.get("editFieldsInfo", {})
+        edit_field = edit_fields_info.get("editDateField")
+        creation_field = edit_fields_info.get("creationDateField")
+        if not edit_field:
+            raise ArcGISException("layer has no edit date field")
+
+        out_fields = ServicesAPI._with_field(out_fields, edit_field)
+        if creation_field:
+            out_fields = ServicesAPI._with_field(out_fields, creation_field)
+
+        where = "1=1"
+        if edit_date is not None:
+            # TIMESTAMP has second precision so filter the milliseconds here
+            timestamp = datetime.datetime.fromtimestamp(
+                edit_date // 1000, tz=datetime.timezone.utc
+            ).strftime("%Y-%m-%d %H:%M:%S")
+            where = f"{edit_field} >= TIMESTAMP '{timestamp}'"
+
+        pages = self._iter_query_pages(
+            where, layer_id, feature_service_url, out_fields, None, "get_changes error"
+        )
+
+        inserts, updates = list(), list()
+        for res in pages:
+            for f in res.get("features", []):
+                attributes = f["attributes"]
+                if edit_date is not None and (attributes.get(edit_field) or 0) <= edit_date:
+                    continue
+
+                created = attributes.get(creation_field) if creation_field else None
+                if edit_date is None or (created is not None and created > edit_date):
+                    inserts.append(f)
+                else:
+                    updates.append(f)
+
+        checkpoint = {
+            "editDate": ServicesAPI._get_max_edit_date(
+                inserts + updates, edit_field, edit_date
+            )
+        }
+        return ChangeSet(
+            ServicesAPI._get_change_models(inserts, definition),
+            ServicesAPI._get_change_models(updates, definition),
+            [],
+            checkpoint,
+        )
+
+    def get_features(
+        self,
+        where,
+        layer_id,
+        feature_service_url,
+        out_fields=[],
+        as_batch=False,
+        response_format="json",
+        return_geometry=True,
+        out_sr=None,
+        max_allowable_offset=None,
+        geometry_precision=None,
+        quantization_parameters=None,
+    ):
+        """
+        where is an ArcGIS formatted string. out_fields is a list of fields.
+        With as_batch, returns a columnar FeatureBatch (requires NumPy) which
+        keeps the out_fields values instead of a list of PointFeatures.
+        response_format="pbf" requests the smaller Protocol Buffer format and
+        decodes it straight into a FeatureBatch.
+        The geometry options shrink responses by having the server reduce the
+        geometries: return_geometry=False drops them, out_sr is the wkid to
+        project to, max_allowable_offset generalizes lines and polygons (in
+        out_sr units), geometry_precision is the number of decimal places and
+        quantization_parameters (see utilities.quantization) snaps coordinates
+        to integer steps, which are converted back to map coordinates here.
+        """
+
+        if "OBJECTID" not in out_fields:
+            out_fields.append("OBJECTID")
+
+        params = {
+            "where": where,
+            "outFields": ",".join(out_fields),
+            **ServicesAPI._get_geometry_params(
+                return_geometry,
+                out_sr,
+                max_allowable_offset,
+                geometry_precision,
+                quantization_parameters,
+            ),
+        }
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = self._query(query_url, params, response_format, "get_features error")
+
+        if response_format == "pbf":
+            return FeatureBatch.frompbfresult(res)
+
+        if as_batch:
+            return FeatureBatch.fromqueryresult(res)
+
+        schema = ServicesAPI._get_schema(res)
+        features = [
+            ServicesAPI._get_feature(f, res["geometryType"], schema)
+            for f in res.get("features", [])
+        ]
+        return features
+
+    def get_count(self, where, layer_id, feature_service_url):
+        "Number of features or table rows matching where, counted by the server"
+
+        params = {"where": where, "returnCountOnly": "true"}
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = self._query(query_url, params, "json", "get_count error")
+        return res["count"]
+
+    def get_object_ids(self, where, layer_id, feature_service_url):
+        "Object ids of the features or table rows matching where"
+
+        params = {"where": where, "returnIdsOnly": "true"}
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = self._query(query_url, params, "json", "get_object_ids error")
+        return res.get("objectIds") or []
+
+    def get_statistics(
+        self, where, statistics, layer_id, feature_service_url, group_by=[]
+    ):
+        """
+        Aggregate on the server instead of downloading features.
+        statistics is a list of (statistic type, field, out name) tuples, where
+        statistic type is count, sum, min, max, avg, stddev or var and out name
+        defaults to {type}_{field}. group_by is a list of fields.
+        Returns a list with one dict of out names (and group_by fields) to values
+        per group, without group_by a list of one dict for all matching features.
+        """
+
+        params = ServicesAPI._get_statistics_params(where, statistics, group_by)
+
+        query_url = f"{feature_service_url}/{layer_id}/query"
+        res = self._query(query_url, params, "json", "get_statistics error")
+        return [f["attributes"] for f in res.get("features", [])]
+
+    def get_distinct_values(self, where, field, layer_id, feature_service_url):
+        """
+        Sorted distinct values of field among the features matching where.
+        Raises ArcGISException when there are more values than maxRecordCount
+        and the layer does not support pagination.
+        """
+
+        definition = self._get_layer_definition(layer_id, feature_service_url)
+        supports_pagination = ServicesAPI._supports_pagination(definition)
+        query_url = f"{feature_service_url}/{layer_id}/query"
+
+        values, seen, offset = list(), set(), 0
+        while True:
+            params = ServicesAPI._get_distinct_values_params(where, field, offset)
+            res = self._query(query_url, params, "json", "get_distinct_values error")
+
+            if not ServicesAPI._add_distinct_values(
+                res, field, values, seen, supports_pagination
+            ):
+                return values
+            offset += len(res["features"])
+
+    def get_table_rows(self, where, table_id, feature_service_url, out_fields=[]):
+        "where is an ArcGIS formatted string. out_fields is a list of fields."
+
+        if "OBJECTID" not in out_fields:
+            out_fields.append("OBJECTID")
+
+        params = {"where": where, "outFields": ",".join(out_fields)}
+
+        query_url = f"{feature_service_url}/{table_id}/query"
+        res = self.requester.GET(query_url, params)
+
+        if res.get("error", False):
+            raise ArcGISException(res["error"].get("message", "get_table_rows error"))
+
+        schema = ServicesAPI._get_schema(res)
+        rows = [ServicesAPI._get_table_row(f, schema) for f in res.get("features", [])]
+        return rows
+
+    def get_feature_layer(self, feature_service_url, layer_id=None, layer_name=None):
+        "Service definitions are cached, see cache_ttl."
+
+        index = self._get_feature_service_definition(
+            feature_service_url, "get_feature_layer error"
+        )
+        layer = ServicesAPI._lookup(index, "layers", layer_id, layer_name)
+
+        if layer is not None:
+            _id, _name, _url = (
+                layer["id"],
+                layer["name"],
+                f'{feature_service_url}/{layer["id"]}',
+            )
+            return FeatureLayer(_id, _name, _url)
+
+    def get_table(self, feature_service_url, table_id=None, table_name=None):
+        "Service definitions are cached, see cache_ttl."
+
+        index = self._get_feature_service_definition(
+            feature_service_url, "get_table error"
+        )
+        table = ServicesAPI._lookup(index, "tables", table_id, table_name)
+
+        if table is not None:
+            _id, _name, _url = (
+                table["id"],
+                table["name"],
+                f'{feature_service_url}/{table["id"]}',
+            )
+            return Table(_id, _name, _url)
+
+    def get_feature_service(self, name, owner_username=None):
+        "docs"
+
+        service_owner = owner_username or self.username
+        search_url = f"{self.base_url}/search"
+        params = {
+            "q": f'title: {name} AND owner: {service_owner} AND type: "Feature Service"',
+        }
+
+        res = self.requester.GET(search_url, params)
+        if res.get("error", False):
+            raise ArcGISException(
+                res["error"].get("message", "get_feature_service error")
+            )
+
+        for result in res.get("results", []):
+            if name == result["name"]:
+                return FeatureService(
+                    result["id"], result["name"], result["title"], result["url"]
+                )
+
+    def update_features(
+        self,
+        updates,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+        retries=0,
+    ):
+        """
+        Batch updates features. 
+        updates is a list of tuples.
+        Each tuple has 3 elements: (id, attribute_dict, geometry_dict)
+        If not updating attributes or geometry, pass None.
+        Incorrect geometries are not validated and will clear the feature's geometry.
+        Large update lists are split and retried like add_points.
+        """
+
+        feature_updates = ServicesAPI._get_feature_updates(updates, keep_skipped=True)
+
+        if batch_size is None:
+            batch_size = self._get_max_record_count(layer_id, feature_service_url)
+
+        update_features_url = f"{feature_service_url}/{layer_id}/updateFeatures"
+        return self._post_features(
+            update_features_url,
+            feature_updates,
+            "updateResults",
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "update_features error",
+            retries,
+        )
+
+
+    def update_table_rows(
+        self,
+        updates,
+        table_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_workers=None,
+        retries=0,
+    ):
+        """
+        Batch updates table rows. 
+        updates is a list of tuples.
+        Each tuple has 2 elements: (id, attribute_dict)
+        Large update lists are split and retried like add_table_rows.
+        """
+
+        table_row_updates = ServicesAPI._get_table_row_updates(updates, keep_skipped=True)
+
+        if batch_size is None:
+            batch_size = self._get_max_record_count(table_id, feature_service_url)
+
+        update_features_url = f"{feature_service_url}/{table_id}/updateFeatures"
+        return self._post_features(
+            update_features_url,
+            table_row_updates,
+            "updateResults",
+            batch_size,
+            max_batch_bytes,
+            max_workers,
+            "update_table_rows error",
+            retries,
+        )
+
+
+    def update_feature_service(self, feature_service_id, title=None):
+        "There is a difference between name and title. More docs..."
+
+        update_service_url = f"{self.base_url}/content/users/{self.username}/items/{feature_service_id}/update"
+
+        data = {
+            "title": title,
+            # todo: add other attributes...
+        }
+
+        data = {k: v for k, v in data.items() if v is not None}
+        res = self.requester.POST(update_service_url, data)
+
+        if not res.get("success", False):
+            raise ArcGISException(res["error"]["message"])
+
+        return True
+
+    @staticmethod
+    def _index_feature_service_definition(definition):
+        "Index a feature service's layers and tables by id and by name"
+
+        index = {"definition": definition}
+        for key in ["layers", "tables"]:
+            items = definition.get(key, [])
+            index[key] = {
+                "id": {item["id"]: item for item in items},
+                "name": {item["name"]: item for item in reversed(items)},
+            }
+
+        return index
+
+    @staticmethod
+    def _lookup(index, key, _id=None, name=None):
+        "Find a layer or table by id, then by name"
+
+        # explicitly use is not None because the id may be 0
+        item = None
+        if _id is not None:
+            item = index[key]["id"].get(_id)
+        if item is None and name is not None:
+            item = index[key]["name"].get(name)
+        return item
+
+    @staticmethod
+    def _get_page_params_factory(definition, where, out_fields, page_size):
+        """
+        Return a function of (offset, last_oid) building the query params of a page.
+        Uses resultOffset when the layer supports pagination and OBJECTID keyset paging otherwise.
+        """
+
+        page_size = (
+            page_size or definition.get("maxRecordCount") or DEFAULT_MAX_RECORD_COUNT
+        )
+        supports_pagination = ServicesAPI._supports_pagination(definition)
+        oid_field = definition.get("objectIdField") or "OBJECTID"
+
+        out_fields = list(out_fields)
+        if oid_field not in out_fields and "*" not in out_fields:
+            out_fields.append(oid_field)
+
+        def get_page_params(offset, last_oid):
+            params = {"outFields": ",".join(out_fields), "orderByFields": oid_field}
+
+            if supports_pagination:
+                params["where"] = where
+                params["resultOffset"] = offset
+                params["resultRecordCount"] = page_size
+            else:
+                params["where"] = f"({where}) AND {oid_field} > {last_oid}"
+
+            return params
+
+        return get_page_params
+
+    @staticmethod
+    def _get_geometry_params(
+        return_geometry,
+        out_sr,
+        max_allowable_offset,
+        geometry_precision,
+        quantization_parameters,
+    ):
+        "Query params of the geometry options, only those differing from the server defaults"
+
+        params = dict()
+        if not return_geometry:
+            params["returnGeometry"] = "false"
+        if out_sr is not None:
+            params["outSR"] = out_sr
+        if max_allowable_offset is not None:
+            params["maxAllowableOffset"] = max_allowable_offset
+        if geometry_precision is not None:
+            params["geometryPrecision"] = geometry_precision
+        if quantization_parameters is not None:
+            params["quantizationParameters"] = codec.dumps(quantization_parameters)
+
+        return params
+
+    @staticmethod
+    def _get_id_range_params(definition, object_ids, where, out_fields):
+        """
+        Query params for consecutive OBJECTID ranges covering object_ids.
+        Each range holds at most maxRecordCount matching ids so is never truncated.
+        """
+
+        page_size = definition.get("maxRecordCount") or DEFAULT_MAX_RECORD_COUNT
+        oid_field = definition.get("objectIdField") or "OBJECTID"
+
+        out_fields = list(out_fields)
+        if oid_field not in out_fields and "*" not in out_fields:
+            out_fields.append(oid_field)
+
+        object_ids = sorted(object_ids)
+
+        range_params = list()
+        for start in range(0, len(object_ids), page_size):
+            first = object_ids[start]
+            last = object_ids[min(start + page_size, len(object_ids)) - 1]
+            range_params.append(
+                {
+                    "where": f"({where}) AND {oid_field} >= {first} AND {oid_field} <= {last}",
+                    "outFields": ",".join(out_fields),
+                    "orderByFields": oid_field,
+                }
+            )
+
+        return range_params
+
+    @staticmethod
+    def _get_in_clause(field, values):
+        "field IN (...) where clause, quoting strings as SQL literals"
+
+        literals = list()
+        for value in values:
+            if isinstance(value, str):
+                literals.append("'" + value.replace("'", "''") + "'")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                literals.append(repr(value))
+            else:
+                raise ValueError(f"unsupported key value {value!r}")
+
+        return f"{field} IN ({','.join(literals)})"
+
+    @staticmethod
+    def _get_statistics_params(where, statistics, group_by):
+        "Query params for outStatistics"
+
+        out_statistics = list()
+        for statistic in statistics:
+            statistic_type, field = statistic[:2]
+            out_name = statistic[2] if len(statistic) > 2 else None
+            out_statistics.append(
+                {
+                    "statisticType": statistic_type,
+                    "onStatisticField": field,
+                    "outStatisticFieldName": out_name or f"{statistic_type}_{field}",
+                }
+            )
+
+        params = {"where": where, "outStatistics": codec.dumps(out_statistics)}
+        if group_by:
+            params["groupByFieldsForStatistics"] = ",".join(group_by)
+            params["orderByFields"] = ",".join(group_by)
+
+        return params
+
+    @staticmethod
+    def _supports_pagination(definition):
+        "Whether the layer's queries honor resultOffset"
+        return definition.get("advancedQueryCapabilities", {}).get(
+            "supportsPagination", False
+        )
+
+    @staticmethod
+    def _add_distinct_values(res, field, values, seen, supports_pagination):
+        """
+        Append the values of a returnDistinctValues page not in seen to values.
+        Returns whether to query the next page, which stops when a page adds
+        nothing (the server ignored resultOffset).
+        """
+
+        added = False
+        for f in res.get("features", []):
+            value = f["attributes"][field]
+            if value not in seen:
+                seen.add(value)
+                values.append(value)
+                added = True
+
+        if not res.get("exceededTransferLimit", False):
+            return False
+
+        if not supports_pagination:
+            raise ArcGISException(
+                "get_distinct_values error: layer does not support pagination"
+            )
+
+        return added
+
+    @staticmethod
+    def _get_distinct_values_params(where, field, offset):
+        "Query params for a page of returnDistinctValues"
+
+        params = {
+            "where": where,
+            "outFields": field,
+            "returnDistinctValues": "true",
+            "returnGeometry": "false",
+            "orderByFields": field,
+        }
+        if offset:
+            params["resultOffset"] = offset
+
+        return params
+
+    @staticmethod
+    def _with_field(out_fields, field):
+        "out_fields plus field unless already included"
+
+        if field in out_fields or "*" in out_fields:
+            return list(out_fields)
+        return list(out_fields) + [field]
+
+    @staticmethod
+    def _get_max_edit_date(features, edit_field, edit_date):
+        "Latest edit date of features, edit_date when there are none"
+
+        for f in features:
+            value = f["attributes"].get(edit_field)
+            if value is not None and (edit_date is None or value > edit_date):
+                edit_date = value
+        return edit_date
+
+    @staticmethod
+    def _get_change_models(features, definition):
+        "PointFeatures for feature layers, TableRows for tables"
+
+        if not features:
+            return []
+
+        schema = ServicesAPI._get_schema({"features": features})
+        geometry_type = definition.get("geometryType")
+        if geometry_type:
+            return [ServicesAPI._get_feature(f, geometry_type, schema) for f in features]
+        return [ServicesAPI._get_table_row(f, schema) for f in features]
+
+    @staticmethod
+    def _get_point_features(points, keep_skipped=False):
+        """
+        Convert add_points dicts to features.
+        Points without lon and lat are skipped, or None with keep_skipped.
+        """
+
+        # TODO: convert Decimal to str %0.2f?
+
+        features = list()
+        for point in points:
+            attributes = dict(point)
+            try:
+                lon = attributes.pop("lon")
+                lat = attributes.pop("lat")
+            except KeyError:
+                if keep_skipped:
+                    features.append(None)
+                continue
+
+            features.append({"geometry": {"x": lon, "y": lat}, "attributes": attributes})
+
+        return features
+
+    @staticmethod
+    def _get_multipart_features(items, key):
+        """
+        Convert add_polylines or add_polygons dicts to features, key is paths or rings.
+        A generator so the nested geometry lists only exist while a feature is encoded.
+        """
+
+        for item in items:
+            if key in item:
+                parts = item[key]
+            elif "coords" in item and "offsets" in item:
+                parts = nest_parts(item["coords"], item["offsets"])
+            else:
+                raise ValueError(f"{key} or coords and offsets required")
+
+            attributes = {
+                name: value
+                for name, value in item.items()
+                if name not in [key, "coords", "offsets"]
+            }
+            yield {"geometry": {key: parts}, "attributes": attributes}
+
+    @staticmethod
+    def _get_feature_updates(updates, keep_skipped=False):
+        "Convert update_features tuples to features, see _get_point_features"
+
+        # create updates list by adding additional attributes or geometry key
         feature_updates = []
         for u in updates:
             _id, attributes, geometry = u
 
             if attributes is None and geometry is None:
+                if keep_skipped:
+                    feature_updates.append(None)
                 continue
 
             fu = {"attributes": {"OBJECTID": _id}}
@@ -439,21 +1979,11 @@ class ServicesAPI(object):
 
             feature_updates.append(fu)
 
-        data = {
-            "features": json.dumps(feature_updates),
-        }
-
-        update_features_url = f"{feature_service_url}/{layer_id}/updateFeatures"
-        res = self.requester.POST(update_features_url, data)
-        return {u["objectId"]: u["success"] for u in res.get("updateResults", [])}
-
+        return feature_updates
 
-    def update_table_rows(self, updates, table_id, feature_service_url):
-        """
-        Batch updates table rows. 
-        updates is a list of tuples.
-        Each tuple has 2 elements: (id, attribute_dict)
-        """
+    @staticmethod
+    def _get_table_row_updates(updates, keep_skipped=False):
+        "Convert update_table_rows tuples to features, see _get_point_features"
 
         # create updates list by adding additional attributes
         table_row_updates = []
@@ -461,6 +1991,8 @@ class ServicesAPI(object):
             _id, attributes = u
 
             if attributes is None:
+                if keep_skipped:
+                    table_row_updates.append(None)
                 continue
 
             tru = {"attributes": {"OBJECTID": _id}}
@@ -474,32 +2006,230 @@ class ServicesAPI(object):
 
             table_row_updates.append(tru)
 
-        data = {
-            "features": json.dumps(table_row_updates),
+        return table_row_updates
+
+    @staticmethod
+    def _get_delete_payloads(object_ids, where, batch_size):
+        "Build one deleteFeatures payload per batch of object_ids"
+
+        payloads = list()
+
+        if object_ids is not None:
+            object_ids = list(object_ids)
+            for i in range(0, len(object_ids), batch_size):
+                payloads.append(
+                    {
+                        "objectIds": ", ".join(
+                            [str(_id) for _id in object_ids[i : i + batch_size]]
+                        )  # convert each id to str first
+                    }
+                )
+        else:
+            payloads.append(dict())
+
+        if where is not None:
+            for data in payloads:
+                data["where"] = where
+
+        return payloads
+
+    @staticmethod
+    def _get_layer_definition_payload(
+        esri_type, name, description, fields, x_min, y_min, x_max, y_max, wkid
+    ):
+        "Layer entry for addToDefinition"
+
+        return {
+            "name": name,
+            "description": description,
+            "type": "Feature Layer",
+            "geometryType": esri_type,
+            "extent": {
+                "type": "extent",
+                "xmin": x_min,
+                "ymin": y_min,
+                "xmax": x_max,
+                "ymax": y_max,
+                "spatialReference": {"wkid": wkid},
+            },
+            "objectIdField": "OBJECTID",
+            "fields": fields.get_fields(),
         }
 
-        update_features_url = f"{feature_service_url}/{table_id}/updateFeatures"
-        res = self.requester.POST(update_features_url, data)
-        return {u["objectId"]: u["success"] for u in res.get("updateResults", [])}
+    @staticmethod
+    def _get_table_definition_payload(name, description, fields):
+        "Table entry for addToDefinition"
+
+        return {
+            "name": name,
+            "description": description,
+            "type": "table",
+            "objectIdField": "OBJECTID",
+            "fields": fields.get_fields(),
+        }
 
+    @staticmethod
+    def _encode_features(features, results, pending):
+        """
+        Yield the encoded features to send and append their input index to
+        pending. None features are not sent, they fail in results.
+        """
 
-    def update_feature_service(self, feature_service_id, title=None):
-        "There is a difference between name and title. More docs..."
+        for i, feature in enumerate(features):
+            if feature is None:
+                results[i] = EditResult(i, None, False, None, "invalid input, not sent")
+            else:
+                pending.append(i)
+                yield codec.dumps(feature)
 
-        update_service_url = f"{self.base_url}/content/users/{self.username}/items/{feature_service_id}/update"
+    @staticmethod
+    def _set_batch_results(batches, batch_results, pending, results):
+        """
+        Set the EditResult of each feature of batches, consecutive runs of the
+        input indices in pending. A batch result may be the exception its
+        request failed with. Returns (index, encoded feature) of the failed ones
+        that are safe to send again.
+        """
 
-        data = {
-            "title": title,
-            # todo: add other attributes...
+        start, failed = 0, list()
+        for batch, batch_result in zip(batches, batch_results):
+            for j, feature in enumerate(batch):
+                i = pending[start + j]
+                retry = True
+                if isinstance(batch_result, ArcGISUnavailableError):
+                    results[i] = EditResult(i, None, False, None, str(batch_result))
+                elif isinstance(batch_result, Exception):
+                    # e.g. a read timeout, the server may have applied the edits
+                    description = f"{batch_result}, not retried as it may have been applied"
+                    results[i] = EditResult(i, None, False, None, description)
+                    retry = False
+                elif j < len(batch_result):
+                    results[i] = EditResult.fromresult(i, batch_result[j])
+                else:
+                    results[i] = EditResult(i, None, False, None, "no result")
+                    retry = False
+
+                if retry and not results[i].success:
+                    failed.append((i, feature))
+            start += len(batch)
+
+        return failed
+
+    @staticmethod
+    def _merge_results(batch_results):
+        "Merge lists of edit results into a BatchResult, {objectId: success}"
+
+        return BatchResult.fromresults(
+            [result for batch_result in batch_results for result in batch_result]
+        )
+
+    @staticmethod
+    def _get_edits_payload(adds, updates, deletes):
+        "applyEdits adds, updates and deletes parameters, leaving out empty ones"
+
+        payload = dict()
+        if adds:
+            payload["adds"] = codec.dumps(adds)
+        if updates:
+            payload["updates"] = codec.dumps(updates)
+        if deletes:
+            payload["deletes"] = ",".join([str(_id) for _id in deletes])
+
+        return payload
+
+    @staticmethod
+    def _get_service_edits_payload(edits):
+        "Service applyEdits edits parameter, one entry per layer id"
+
+        layer_edits = list()
+        for layer_id, edit in edits.items():
+            layer_edit = {"id": layer_id}
+            if edit.get("adds"):
+                layer_edit["adds"] = edit["adds"]
+            if edit.get("updates"):
+                layer_edit["updates"] = edit["updates"]
+            if edit.get("deletes"):
+                layer_edit["deletes"] = list(edit["deletes"])
+            layer_edits.append(layer_edit)
+
+        return codec.dumps(layer_edits)
+
+    @staticmethod
+    def _merge_service_edit_results(edits, res, error_message):
+        "Merge a service applyEdits response into apply_edits results per layer id"
+
+        # success is a list of per layer results, errors are a dict
+        if isinstance(res, dict):
+            raise ArcGISException(res.get("error", {}).get("message", error_message))
+
+        results = {_id: ServicesAPI._merge_edit_results(dict()) for _id in edits}
+        for layer_res in res:
+            results[layer_res["id"]] = ServicesAPI._merge_edit_results(layer_res)
+
+        return results
+
+    @staticmethod
+    def _merge_edit_results(res):
+        "Merge an applyEdits response into {objectId: success} per operation"
+
+        return {
+            "adds": ServicesAPI._merge_results([res.get("addResults", [])]),
+            "updates": ServicesAPI._merge_results([res.get("updateResults", [])]),
+            "deletes": ServicesAPI._merge_results([res.get("deleteResults", [])]),
         }
 
-        data = {k: v for k, v in data.items() if v is not None}
-        res = self.requester.POST(update_service_url, data)
+    @staticmethod
+    def _get_page_object_ids(res, oid_field):
+        "Object ids of a query page, JSON or decoded pbf"
 
-        if not res.get("success", False):
-            raise ArcGISException(res["error"]["message"])
+        if "objectIds" in res:
+            return res["objectIds"]
+        return [f["attributes"][oid_field] for f in res.get("features", [])]
 
-        return True
+    @staticmethod
+    def _get_schema(res):
+        "Attribute names shared by the features of a query result"
+
+        if res.get("fields"):
+            names = [field["name"] for field in res["fields"]]
+        elif res.get("features"):
+            names = list(res["features"][0]["attributes"])
+        else:
+            names = []
+
+        return AttributeSchema(names)
+
+    @staticmethod
+    def _get_feature(feature, geometry_type, schema):
+        "Convert a query result feature to a model"
+
+        attributes = feature["attributes"]
+        values = [attributes.get(name) for name in schema.names]
+
+        if geometry_type == "esriGeometryPoint":
+            return PointFeature.fromschema(
+                attributes["OBJECTID"],
+                feature.get("geometry", {}).get("x"),
+                feature.get("geometry", {}).get("y"),
+                schema,
+                values,
+            )
+        elif geometry_type in MULTIPART_KEYS:
+            parts = (feature.get("geometry") or {}).get(MULTIPART_KEYS[geometry_type], [])
+            coords, offsets = flatten_parts(parts)
+
+            cls = PolylineFeature if geometry_type == "esriGeometryPolyline" else PolygonFeature
+            return cls.fromschema(attributes["OBJECTID"], coords, offsets, schema, values)
+        else:
+            raise NotImplementedError(f"{geometry_type} features not implemented")
+
+    @staticmethod
+    def _get_table_row(feature, schema):
+        "Convert a query result row to a model"
+
+        attributes = feature["attributes"]
+        values = [attributes.get(name) for name in schema.names]
+        return TableRow.fromschema(attributes["OBJECTID"], schema, values)
 
     @staticmethod
     def get_esri_type(layer_type):
@@ -507,5 +2237,9 @@ class ServicesAPI(object):
 
         if layer_type == "point":
             return "esriGeometryPoint"
+        elif layer_type in ["line", "polyline"]:
+            return "esriGeometryPolyline"
+        elif layer_type == "polygon":
+            return "esriGeometryPolygon"
         else:
-            raise NotImplementedError("Non-point geometries not implemented yet")
+            raise NotImplementedError(f"{layer_type} geometries not implemented yet")
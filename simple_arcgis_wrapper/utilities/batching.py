@@ -0,0 +1,39 @@
+from .. import codec
+
+
+def chunk_features(features, max_count, max_bytes):
+    """
+    Encode features once and split them into batches.
+    Each batch holds at most max_count features and its JSON array is at most
+    max_bytes long. A single feature larger than max_bytes is sent on its own.
+    Yields lists of encoded features, see join_encoded.
+    """
+
+    return chunk_encoded(
+        (codec.dumps(feature) for feature in features), max_count, max_bytes
+    )
+
+
+def chunk_encoded(encoded_features, max_count, max_bytes):
+    "Like chunk_features for features already encoded with codec.dumps."
+
+    batch, batch_bytes = list(), 2  # account for the enclosing brackets
+    for encoded in encoded_features:
+        size = len(encoded) if encoded.isascii() else len(encoded.encode("utf-8"))
+
+        if batch and (
+            len(batch) >= max_count or batch_bytes + size + 1 > max_bytes
+        ):
+            yield batch
+            batch, batch_bytes = list(), 2
+
+        batch.append(encoded)
+        batch_bytes += size + 1  # separating comma
+
+    if batch:
+        yield batch
+
+
+def join_encoded(batch):
+    "Join a batch of encoded features into a JSON array string."
+    return "[" + ",".join(batch) + "]"
@@ -0,0 +1,40 @@
+import json
+import os
+import threading
+
+
+class CheckpointStore(object):
+    """
+    Thread-safe store of get_changes checkpoints in a JSON file, keyed by e.g. layer url.
+    The file is rewritten atomically on every set so a crash never loses earlier checkpoints.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        try:
+            with open(path) as f:
+                self._checkpoints = json.load(f)
+        except FileNotFoundError:
+            self._checkpoints = dict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._checkpoints.get(key, default)
+
+    def set(self, key, checkpoint):
+        with self._lock:
+            self._checkpoints[key] = checkpoint
+            self._save()
+
+    def delete(self, key):
+        with self._lock:
+            if self._checkpoints.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._checkpoints, f)
+        os.replace(tmp_path, self.path)
@@ -1,5 +1,14 @@
 import math
 
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed for the array functions
+    np = None
+
+
+SEMIMAJOR_AXIS = 6378137.0  # WGS84 spheriod semimajor axis
+WEBMERC_MAX = math.pi * SEMIMAJOR_AXIS  # easting at 180 degrees
+
 
 def get_decimal_degrees_to_webmerc(lon, lat):
 
@@ -8,7 +17,7 @@ def get_decimal_degrees_to_webmerc(lon, lat):
     if abs(lat) > 90:
         raise ValueError("invalid latitude value")
 
-    semimajorAxis = 6378137.0  # WGS84 spheriod semimajor axis
+    semimajorAxis = SEMIMAJOR_AXIS
     east = lon * 0.017453292519943295
     north = lat * 0.017453292519943295
 
@@ -16,3 +25,77 @@ def get_decimal_degrees_to_webmerc(lon, lat):
     easting = semimajorAxis * east
 
     return (easting, northing)
+
+
+def get_webmerc_to_decimal_degrees(easting, northing):
+
+    if abs(easting) > WEBMERC_MAX:
+        raise ValueError("invalid easting value")
+
+    lon = math.degrees(easting / SEMIMAJOR_AXIS)
+    lat = math.degrees(2.0 * math.atan(math.exp(northing / SEMIMAJOR_AXIS)) - math.pi / 2)
+
+    return (lon, lat)
+
+
+def get_decimal_degrees_to_webmerc_array(lons, lats):
+    """
+    Vectorized get_decimal_degrees_to_webmerc.
+    lons and lats are sequences, NumPy arrays or buffers of float64 (e.g. array.array("d")).
+    Returns (eastings, northings) as float64 arrays. Requires NumPy.
+    """
+
+    lons, lats = _as_float_array(lons), _as_float_array(lats)
+
+    if lons.shape != lats.shape:
+        raise ValueError("lons and lats must have the same shape")
+    if np.any(np.abs(lons) > 180):
+        raise ValueError("invalid longitude value")
+    if np.any(np.abs(lats) > 90):
+        raise ValueError("invalid latitude value")
+
+    eastings = np.radians(lons)
+    eastings *= SEMIMAJOR_AXIS
+
+    # R * atanh(sin(lat)) == R / 2 * log((1 + sin(lat)) / (1 - sin(lat)))
+    with np.errstate(divide="ignore"):
+        northings = np.arctanh(np.sin(np.radians(lats)))
+    northings *= SEMIMAJOR_AXIS
+
+    return eastings, northings
+
+
+def get_webmerc_to_decimal_degrees_array(eastings, northings):
+    """
+    Vectorized get_webmerc_to_decimal_degrees.
+    Accepts the same inputs as get_decimal_degrees_to_webmerc_array and
+    returns (lons, lats) as float64 arrays. Requires NumPy.
+    """
+
+    eastings, northings = _as_float_array(eastings), _as_float_array(northings)
+
+    if eastings.shape != northings.shape:
+        raise ValueError("eastings and northings must have the same shape")
+    if np.any(np.abs(eastings) > WEBMERC_MAX):
+        raise ValueError("invalid easting value")
+
+    lons = np.degrees(eastings / SEMIMAJOR_AXIS)
+
+    lats = np.exp(northings / SEMIMAJOR_AXIS)
+    np.arctan(lats, out=lats)
+    lats *= 2.0
+    lats -= math.pi / 2
+    np.degrees(lats, out=lats)
+
+    return lons, lats
+
+
+def _as_float_array(values):
+    "View or convert values as a float64 array without copying when possible"
+
+    if np is None:
+        raise ImportError("array conversions require numpy, pip install numpy")
+
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        return np.frombuffer(values, dtype=np.float64)
+    return np.asarray(values, dtype=np.float64)
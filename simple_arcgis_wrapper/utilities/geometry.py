@@ -0,0 +1,43 @@
+from array import array
+
+
+def flatten_parts(parts):
+    """
+    Flatten the paths of a polyline or rings of a polygon ([[[x, y], ...], ...])
+    into (coords, offsets). coords is an array("d") of x, y pairs and offsets an
+    array("q") holding the vertex index where each part starts followed by the
+    vertex count, so part i is vertices offsets[i] to offsets[i + 1].
+    Z and M values are dropped.
+    """
+
+    coords, offsets = array("d"), array("q", [0])
+    for part in parts:
+        for vertex in part:
+            coords.append(vertex[0])
+            coords.append(vertex[1])
+        offsets.append(len(coords) // 2)
+
+    return coords, offsets
+
+
+def nest_parts(coords, offsets):
+    "Inverse of flatten_parts, the nested lists used by ArcGIS JSON geometries"
+
+    parts = list()
+    for i in range(len(offsets) - 1):
+        start, end = offsets[i], offsets[i + 1]
+        parts.append(
+            [[coords[2 * j], coords[2 * j + 1]] for j in range(start, end)]
+        )
+
+    return parts
+
+
+def get_extent(coords):
+    "(x_min, y_min, x_max, y_max) of flat x, y pairs, None when empty"
+
+    if not len(coords):
+        return None
+
+    xs, ys = coords[0::2], coords[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
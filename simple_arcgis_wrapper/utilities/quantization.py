@@ -0,0 +1,89 @@
+"""
+Quantized geometries of JSON query responses.
+
+When a query is sent with quantizationParameters the response carries a
+transform and every coordinate is an integer number of tolerance steps from
+the transform's origin. Points are absolute, the first vertex of each path or
+ring is absolute and the following vertices are deltas from the previous one.
+"""
+
+
+def get_quantization_parameters(
+    extent, tolerance, mode="view", origin_position="upperLeft"
+):
+    """
+    quantizationParameters for a query.
+    extent is (x_min, y_min, x_max, y_max) in the query's outSR and tolerance the
+    size of one step in map units, e.g. the width of a pixel at the rendered scale.
+    """
+
+    x_min, y_min, x_max, y_max = extent
+    if tolerance <= 0:
+        raise ValueError("tolerance must be positive")
+
+    return {
+        "mode": mode,
+        "originPosition": origin_position,
+        "tolerance": tolerance,
+        "extent": {"xmin": x_min, "ymin": y_min, "xmax": x_max, "ymax": y_max},
+    }
+
+
+def dequantize_features(res):
+    """
+    Replace the quantized geometries of a JSON query response with map
+    coordinates, in place. Responses without a transform are left as is.
+    Returns res.
+    """
+
+    transform = res.pop("transform", None)
+    if not transform:
+        return res
+
+    dequantize = get_dequantizer(transform)
+    for f in res.get("features", []):
+        dequantize(f)
+
+    return res
+
+
+def get_dequantizer(transform):
+    "Return a function converting the geometry of a quantized feature in place"
+
+    x_scale, y_scale = transform["scale"][:2]
+    x_translate, y_translate = transform["translate"][:2]
+
+    # upperLeft origin means y grows downwards from the translate point
+    if transform.get("originPosition", "upperLeft") == "upperLeft":
+        y_scale = -y_scale
+
+    def dequantize_parts(parts):
+        dequantized = list()
+        for part in parts:
+            path, qx, qy = list(), 0, 0
+            for vertex in part:
+                qx += vertex[0]
+                qy += vertex[1]
+                path.append([x_translate + qx * x_scale, y_translate + qy * y_scale])
+            dequantized.append(path)
+        return dequantized
+
+    def dequantize(feature):
+        geometry = feature.get("geometry")
+        if not geometry:
+            return feature
+
+        if "x" in geometry and geometry["x"] is not None:
+            geometry["x"] = x_translate + geometry["x"] * x_scale
+            geometry["y"] = y_translate + geometry["y"] * y_scale
+
+        for key in ["paths", "rings"]:
+            if key in geometry:
+                geometry[key] = dequantize_parts(geometry[key])
+
+        if "points" in geometry:
+            geometry["points"] = dequantize_parts([geometry["points"]])[0]
+
+        return feature
+
+    return dequantize
@@ -0,0 +1,223 @@
+"""
+In-memory spatial index over point coordinates.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed for GridIndex
+    np = None
+
+
+# points per grid cell aimed for when no cell_size is given
+DEFAULT_POINTS_PER_CELL = 2
+
+
+class GridIndex(object):
+    """
+    Uniform grid over x, y points for bbox, radius and nearest neighbor lookups
+    that only look at the cells around the query instead of every point.
+    Points are sorted by cell once, so building is O(n log n) and each cell is
+    a contiguous slice of that order. Results are indices into x and y (e.g.
+    positions in a FeatureBatch) as int64 arrays. Distances are planar, in the
+    units of x and y. Points with a NaN coordinate are not indexed.
+    cell_size defaults to about DEFAULT_POINTS_PER_CELL points per cell, radius
+    queries are fastest with cells close to the typical radius. Requires NumPy.
+
+    index = GridIndex(batch.x, batch.y)
+    for i in index.query_radius(x, y, 50.0):
+        print(batch[i].id)
+    """
+
+    def __init__(self, x, y, cell_size=None):
+
+        if np is None:
+            raise ImportError("GridIndex requires numpy, pip install numpy")
+
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if x.shape != y.shape or x.ndim != 1:
+            raise ValueError("x and y must be one dimensional and the same length")
+
+        valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        self._x, self._y = x, y
+
+        if len(valid):
+            self.x_min, self.y_min = x[valid].min(), y[valid].min()
+            self.x_max, self.y_max = x[valid].max(), y[valid].max()
+        else:
+            self.x_min = self.y_min = self.x_max = self.y_max = 0.0
+
+        if cell_size is None:
+            cell_size = GridIndex._get_default_cell_size(
+                self.x_max - self.x_min, self.y_max - self.y_min, len(valid)
+            )
+        if not cell_size > 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = float(cell_size)
+
+        self._nx = int((self.x_max - self.x_min) // self.cell_size) + 1
+        self._ny = int((self.y_max - self.y_min) // self.cell_size) + 1
+
+        keys = self._get_keys(x[valid], y[valid])
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._order = valid[order]
+
+    def __len__(self):
+        "Number of indexed points"
+        return len(self._order)
+
+    @classmethod
+    def fromfeatures(cls, features, cell_size=None):
+        "Index a list of PointFeatures, results are positions in the list"
+
+        if np is None:
+            raise ImportError("GridIndex requires numpy, pip install numpy")
+
+        x = np.fromiter(
+            (np.nan if f.x is None else f.x for f in features), dtype=np.float64
+        )
+        y = np.fromiter(
+            (np.nan if f.y is None else f.y for f in features), dtype=np.float64
+        )
+        return cls(x, y, cell_size)
+
+    def query_bbox(self, x_min, y_min, x_max, y_max):
+        "Indices of the points inside the box, edges included, in ascending order"
+
+        candidates = self._get_candidates(x_min, y_min, x_max, y_max)
+
+        x, y = self._x[candidates], self._y[candidates]
+        inside = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+        return np.sort(candidates[inside])
+
+    def query_radius(self, x, y, radius):
+        "Indices of the points within radius of (x, y), in ascending order"
+
+        candidates = self._get_candidates(x - radius, y - radius, x + radius, y + radius)
+
+        dx, dy = self._x[candidates] - x, self._y[candidates] - y
+        return np.sort(candidates[dx * dx + dy * dy <= radius * radius])
+
+    def nearest(self, x, y, k=1):
+        """
+        The k points closest to (x, y) as (indices, distances), closest first.
+        Fewer than k are returned when fewer points are indexed.
+        """
+
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # grow a square around (x, y) until it holds k points within its half width,
+        # any closer point would be inside the inscribed circle so inside the square
+        half_width = self.cell_size
+        max_half_width = abs(x - self.x_min) + abs(x - self.x_max)
+        max_half_width += abs(y - self.y_min) + abs(y - self.y_max)
+        while True:
+            candidates = self._get_candidates(
+                x - half_width, y - half_width, x + half_width, y + half_width
+            )
+            dx, dy = self._x[candidates] - x, self._y[candidates] - y
+            distances = np.sqrt(dx * dx + dy * dy)
+
+            within = np.count_nonzero(distances <= half_width)
+            if within >= k or half_width > max_half_width:
+                break
+            half_width *= 2
+
+        closest = np.argsort(distances, kind="stable")[:k]
+        return candidates[closest], distances[closest]
+
+    def query_pairs(self, radius):
+        """
+        Every pair of points within radius of each other as an (n, 2) array of
+        indices with i < j, e.g. for deduplicating nearby points.
+        Runs in one vectorized pass per neighboring cell offset, so memory grows
+        with the number of point pairs in neighboring cells.
+        """
+
+        x, y = self._x[self._order], self._y[self._order]
+        cx, cy = self._get_cells(x, y)
+        span = int(math.ceil(radius / self.cell_size))
+
+        pairs = list()
+        for dx in range(-span, span + 1):
+            for dy in range(-span, span + 1):
+                ncx, ncy = cx + dx, cy + dy
+                in_grid = (ncx >= 0) & (ncx < self._nx) & (ncy >= 0) & (ncy < self._ny)
+
+                rows = np.flatnonzero(in_grid)
+                keys = ncx[rows] * self._ny + ncy[rows]
+                starts = np.searchsorted(self._keys, keys, side="left")
+                ends = np.searchsorted(self._keys, keys, side="right")
+
+                counts = ends - starts
+                i = np.repeat(rows, counts)
+                j = _expand_ranges(starts, counts)
+
+                ddx, ddy = x[i] - x[j], y[i] - y[j]
+                close = (ddx * ddx + ddy * ddy <= radius * radius) & (
+                    self._order[i] < self._order[j]
+                )
+                pairs.append(
+                    np.stack([self._order[i[close]], self._order[j[close]]], axis=1)
+                )
+
+        pairs = np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    def _get_cells(self, x, y):
+        cx = ((x - self.x_min) // self.cell_size).astype(np.int64)
+        cy = ((y - self.y_min) // self.cell_size).astype(np.int64)
+        return cx, cy
+
+    def _get_keys(self, x, y):
+        "Cell keys, cells of the same column are consecutive"
+
+        cx, cy = self._get_cells(x, y)
+        return cx * self._ny + cy
+
+    def _get_candidates(self, x_min, y_min, x_max, y_max):
+        "Indices of the points in every cell overlapping the box"
+
+        if not len(self) or x_max < self.x_min or y_max < self.y_min:
+            return np.empty(0, dtype=np.int64)
+        if x_min > self.x_max or y_min > self.y_max:
+            return np.empty(0, dtype=np.int64)
+
+        cx0 = max(int((x_min - self.x_min) // self.cell_size), 0)
+        cy0 = max(int((y_min - self.y_min) // self.cell_size), 0)
+        cx1 = min(int((x_max - self.x_min) // self.cell_size), self._nx - 1)
+        cy1 = min(int((y_max - self.y_min) // self.cell_size), self._ny - 1)
+
+        # the box covers one contiguous key range per grid column
+        columns = np.arange(cx0, cx1 + 1, dtype=np.int64) * self._ny
+        starts = np.searchsorted(self._keys, columns + cy0, side="left")
+        ends = np.searchsorted(self._keys, columns + cy1, side="right")
+
+        return self._order[_expand_ranges(starts, ends - starts)]
+
+    @staticmethod
+    def _get_default_cell_size(width, height, n):
+
+        if n <= 1 or (width <= 0 and height <= 0):
+            return 1.0
+        if width <= 0 or height <= 0:
+            return max(width, height) * DEFAULT_POINTS_PER_CELL / n
+
+        return math.sqrt(width * height * DEFAULT_POINTS_PER_CELL / n)
+
+
+def _expand_ranges(starts, counts):
+    "Concatenation of range(start, start + count) for every start and count"
+
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+
+    # shift each run of a plain arange so it begins at its start
+    run_starts = np.cumsum(counts) - counts
+    return np.repeat(starts - run_starts, counts) + np.arange(total, dtype=np.int64)
@@ -0,0 +1,171 @@
+import codecs
+import re
+
+from .. import codec
+
+
+_HEADER, _FEATURES, _TRAILER = range(3)
+
+_SPECIAL = re.compile(r'["{}\[\]]')
+_OBJECT_BODY = re.compile(r'(?:[^"{}]+|"(?:[^"\\]|\\.)*")*', re.DOTALL)
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_ARRAY_START = re.compile(r"\s*:\s*\[")
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class FeatureStreamParser(object):
+    """
+    Incremental parser for query responses.
+    feed() takes text as it arrives and returns the elements of the top-level
+    "features" array completed so far, so only one partial feature is buffered.
+    envelope holds the keys before "features" as soon as the array starts,
+    close() adds the keys after it and returns the complete envelope.
+    Responses without a features array (e.g. errors) are parsed whole by close().
+    """
+
+    def __init__(self):
+        self.envelope = None
+        self._buf = ""
+        self._pos = 0
+        self._state = _HEADER
+        self._depth = 0
+        self._feature_start = None
+
+    def feed(self, text):
+        self._buf += text
+        features = list()
+
+        if self._state == _HEADER:
+            self._scan_header()
+        if self._state == _FEATURES:
+            self._scan_features(features)
+
+        return features
+
+    def close(self):
+        if self._state == _HEADER:
+            self.envelope = codec.loads(self._buf) if self._buf.strip() else dict()
+        elif self._state == _FEATURES:
+            raise ValueError("truncated response, features array not closed")
+        else:
+            trailer = codec.loads('{"features":[]' + self._buf)
+            trailer.pop("features")
+            self.envelope.update(trailer)
+
+        self._buf = ""
+        return self.envelope
+
+    def _scan_header(self):
+        "Find the top-level features key, keeping everything before it"
+
+        buf, pos = self._buf, self._pos
+        while True:
+            match = _SPECIAL.search(buf, pos)
+            if match is None:
+                self._pos = len(buf)
+                return
+
+            char, start = match.group(), match.start()
+
+            if char == '"':
+                string = _STRING.match(buf, start)
+                if string is None:  # string continues in the next chunk
+                    self._pos = start
+                    return
+
+                if self._depth == 1 and string.group() == '"features"':
+                    array_start = _ARRAY_START.match(buf, string.end())
+                    if array_start is not None:
+                        self.envelope = codec.loads(buf[:start] + '"features":[]}')
+                        self.envelope.pop("features")
+                        self._buf, self._pos = buf[array_start.end() :], 0
+                        self._state = _FEATURES
+                        return
+
+                    if buf[string.end() :].strip() in ["", ":"]:
+                        self._pos = start  # wait for the rest of the separator
+                        return
+
+                pos = string.end()
+            elif char in "{[":
+                self._depth += 1
+                pos = start + 1
+            else:
+                self._depth -= 1
+                pos = start + 1
+
+    def _scan_features(self, features):
+        "Decode every complete feature object, keeping a partial one for the next feed"
+
+        buf, pos = self._buf, self._pos
+        first = None  # start of the first feature completed by this feed
+
+        while True:
+            if self._feature_start is None:
+                pos = _SEPARATORS.match(buf, pos).end()
+                if pos >= len(buf):
+                    break
+
+                if buf[pos] == "]":
+                    self._state = _TRAILER
+                    break
+
+                if buf[pos] != "{":
+                    raise ValueError("features must be JSON objects")
+
+                self._feature_start = pos
+                self._depth = 0
+
+            # skip to the next brace outside of a string
+            pos = _OBJECT_BODY.match(buf, pos).end()
+            if pos >= len(buf) or buf[pos] == '"':  # string continues in the next chunk
+                break
+
+            self._depth += 1 if buf[pos] == "{" else -1
+            pos += 1
+
+            if self._depth == 0:
+                if first is None:
+                    first = self._feature_start
+                last = pos
+                self._feature_start = None
+
+        # the completed features are consecutive array elements, decode them at once
+        if first is not None:
+            features.extend(codec.loads("[" + buf[first:last] + "]"))
+
+        if self._state == _TRAILER:
+            self._buf, self._pos = buf[pos + 1 :], 0
+            return
+
+        # drop everything before the partial feature
+        keep = self._feature_start if self._feature_start is not None else pos
+        self._buf, self._pos = buf[keep:], pos - keep
+        if self._feature_start is not None:
+            self._feature_start = 0
+
+
+class FeatureStream(object):
+    """
+    Iterates over the features of a query response given as byte chunks.
+    envelope holds the other top-level keys (geometryType, fields, ...) once
+    iteration has reached the first feature, and all of them (including
+    exceededTransferLimit or error) once iteration is complete.
+    """
+
+    def __init__(self, chunks):
+        self.envelope = dict()
+        self._chunks = chunks
+
+    def __iter__(self):
+        parser = FeatureStreamParser()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+
+        for chunk in self._chunks:
+            features = parser.feed(decoder.decode(chunk))
+            if parser.envelope is not None and not self.envelope:
+                self.envelope.update(parser.envelope)
+            yield from features
+
+        yield from parser.feed(decoder.decode(b"", final=True))
+        self.envelope.update(parser.close())
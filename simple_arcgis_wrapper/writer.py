@@ -0,0 +1,244 @@
+"""
+Write-behind buffering of feature adds and updates.
+"""
+
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+from . import codec
+from .exceptions import ArcGISException
+from .services_api import DEFAULT_MAX_BATCH_BYTES
+from .utilities.batching import join_encoded
+
+
+# seconds the first buffered edit waits before its batch is sent
+DEFAULT_MAX_LATENCY = 1.0
+
+# edits buffered before add and update block
+DEFAULT_MAX_QUEUE_SIZE = 10000
+
+_ADD, _UPDATE, _FLUSH, _CLOSE = range(4)
+
+
+class FeatureWriter(object):
+    """
+    Buffers adds and updates to a feature layer or table and sends them with
+    applyEdits from a background thread. A batch is sent once it holds
+    batch_size edits (the layer's maxRecordCount by default), max_batch_bytes
+    of JSON, or its first edit has waited max_latency seconds.
+    Every add and update returns a concurrent.futures.Future of the object id,
+    which raises ArcGISException if that edit failed.
+    When max_queue_size edits are waiting, add and update block (or raise
+    queue.Full when block is False) until the background thread catches up.
+
+    with FeatureWriter(api.services, layer.id, service.url) as writer:
+        future = writer.add_point(10.0, 20.0, {"Name": "John Doe"})
+    print(future.result())
+    """
+
+    def __init__(
+        self,
+        services,
+        layer_id,
+        feature_service_url,
+        batch_size=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        max_latency=DEFAULT_MAX_LATENCY,
+        max_queue_size=DEFAULT_MAX_QUEUE_SIZE,
+        rollback_on_failure=False,
+    ):
+        self.services = services
+        self.layer_id = layer_id
+        self.feature_service_url = feature_service_url
+        self.batch_size = batch_size or services._get_max_record_count(
+            layer_id, feature_service_url
+        )
+        self.max_batch_bytes = max_batch_bytes
+        self.max_latency = max_latency
+        self.rollback_on_failure = rollback_on_failure
+
+        self._queue = queue.Queue(max_queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, feature, block=True, timeout=None):
+        "Queue a feature, a dict with attributes and optional geometry, to add"
+        return self._put(_ADD, feature, block, timeout)
+
+    def add_point(self, lon, lat, attributes, block=True, timeout=None):
+        "Queue a point to add, see ServicesAPI.add_point"
+
+        if abs(lon) > 180:
+            raise ValueError("invalid x value")
+
+        if abs(lat) > 90:
+            raise ValueError("invalid y value")
+
+        feature = {
+            "attributes": attributes,
+            "geometry": {"x": round(lon, 8), "y": round(lat, 8)},
+        }
+        return self._put(_ADD, feature, block, timeout)
+
+    def add_table_row(self, attributes, block=True, timeout=None):
+        "Queue a table row to add"
+        return self._put(_ADD, {"attributes": attributes}, block, timeout)
+
+    def update(self, object_id, attributes=None, geometry=None, block=True, timeout=None):
+        "Queue an update of a feature or table row, see ServicesAPI.update_features"
+
+        if attributes is None and geometry is None:
+            raise ValueError("attributes or geometry required")
+
+        feature = {"attributes": {"OBJECTID": object_id, **(attributes or {})}}
+        if geometry is not None:
+            feature["geometry"] = geometry
+
+        return self._put(_UPDATE, feature, block, timeout)
+
+    def flush(self):
+        "Send everything queued so far and wait for the results"
+
+        if self._closed:
+            return
+
+        done = threading.Event()
+        self._queue.put((_FLUSH, done, None))
+        done.wait()
+
+    def close(self):
+        "Send everything queued and stop the background thread"
+
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put((_CLOSE, None, None))
+        self._thread.join()
+
+    def _put(self, kind, feature, block, timeout):
+
+        if self._closed:
+            raise ValueError("FeatureWriter is closed")
+
+        # encode in the caller's thread so the background thread only joins strings
+        encoded = codec.dumps(feature)
+        size = len(encoded) if encoded.isascii() else len(encoded.encode("utf-8"))
+
+        future = Future()
+        self._queue.put((kind, encoded, future, size), block, timeout)
+        return future
+
+    def _run(self):
+
+        carry, closed = None, False
+        while not closed:
+            batch, batch_bytes, flushed = list(), 2, list()
+            deadline = None
+
+            while True:
+                if carry is not None:
+                    item, carry = carry, None
+                else:
+                    timeout = None
+                    if deadline is not None:
+                        timeout = max(0, deadline - time.monotonic())
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break  # max_latency reached
+
+                if item[0] == _FLUSH:
+                    flushed.append(item[1])
+                    break
+
+                if item[0] == _CLOSE:
+                    closed = True
+                    break
+
+                size = item[3] + 1  # separating comma
+                if batch and batch_bytes + size > self.max_batch_bytes:
+                    carry = item
+                    break
+
+                batch.append(item)
+                batch_bytes += size
+
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_latency
+                if len(batch) >= self.batch_size:
+                    break
+
+            try:
+                if batch:
+                    self._send(batch)
+            except Exception as e:
+                # keep the thread alive so later edits and flush waiters are served
+                FeatureWriter._set_exception(batch, e)
+            finally:
+                for done in flushed:
+                    done.set()
+
+    def _send(self, batch):
+        "applyEdits a batch and resolve the futures of its edits"
+
+        # edits cancelled while queued are dropped, the others can't be cancelled anymore
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        adds = [item for item in batch if item[0] == _ADD]
+        updates = [item for item in batch if item[0] == _UPDATE]
+
+        payload = dict()
+        if adds:
+            payload["adds"] = join_encoded([item[1] for item in adds])
+        if updates:
+            payload["updates"] = join_encoded([item[1] for item in updates])
+
+        try:
+            res = self.services._post_edits(
+                self.layer_id,
+                self.feature_service_url,
+                payload,
+                self.rollback_on_failure,
+                "FeatureWriter error",
+            )
+        except Exception as e:
+            FeatureWriter._set_exception(batch, e)
+            return
+
+        FeatureWriter._set_results(adds, res.get("addResults", []))
+        FeatureWriter._set_results(updates, res.get("updateResults", []))
+
+    @staticmethod
+    def _set_results(items, results):
+        "Resolve each item's future with its edit result, results are in request order"
+
+        for i, item in enumerate(items):
+            result = results[i] if i < len(results) else {"success": False}
+
+            if result.get("success", False):
+                item[2].set_result(result.get("objectId"))
+            else:
+                error = result.get("error") or {}
+                item[2].set_exception(
+                    ArcGISException(error.get("description", "edit failed"))
+                )
+
+    @staticmethod
+    def _set_exception(items, exception):
+        "Fail the futures of items that are not resolved or cancelled yet"
+
+        for item in items:
+            if not item[2].done():
+                item[2].set_exception(exception)
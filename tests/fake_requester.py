@@ -0,0 +1,66 @@
+import json
+
+from simple_arcgis_wrapper.utilities.streaming import FeatureStream
+
+
+class FakeRequester(object):
+    """
+    Stands in for Requester in offline tests.
+    handler is called with (method, url, params_or_data) and returns the response dict.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = list()
+
+    def GET(self, url, params=None, f="json"):
+        params = dict(params or {})
+        if f != "json":
+            params["f"] = f
+        self.calls.append(("get", url, params))
+        return self.handler("get", url, params)
+
+    def GET_STREAM(self, url, params=None, chunk_size=7):
+        "Serve the handler's response as a FeatureStream over small chunks"
+        params = dict(params or {})
+        self.calls.append(("get", url, params))
+        body = json.dumps(self.handler("get", url, params)).encode("utf-8")
+        return FeatureStream(
+            body[i : i + chunk_size] for i in range(0, len(body), chunk_size)
+        )
+
+    def POST(self, url, data=None):
+        data = dict(data or {})
+        self.calls.append(("post", url, data))
+        return self.handler("post", url, data)
+
+
+def add_results_handler(max_record_count=1000):
+    "Answer layer definition GETs and echo one addResult per posted feature."
+
+    state = {"next_id": 1}
+
+    def handler(method, url, payload):
+        if method == "get":
+            return {"maxRecordCount": max_record_count}
+
+        features = json.loads(payload["features"])
+        results = list()
+        for _ in features:
+            results.append({"objectId": state["next_id"], "success": True})
+            state["next_id"] += 1
+
+        key = "updateResults" if url.endswith("updateFeatures") else "addResults"
+        return {key: results}
+
+    return handler
+
+
+class AsyncFakeRequester(FakeRequester):
+    "FakeRequester for AsyncServicesAPI"
+
+    async def GET(self, url, params=None, f="json"):
+        return FakeRequester.GET(self, url, params, f)
+
+    async def POST(self, url, data=None):
+        return FakeRequester.POST(self, url, data)
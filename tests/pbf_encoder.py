@@ -0,0 +1,98 @@
+"""
+Minimal protobuf encoder for building FeatureCollectionPBuffer fixtures,
+the inverse of simple_arcgis_wrapper.pbf for the fields it reads.
+"""
+
+import struct
+
+
+def varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def field_varint(number, value):
+    return varint(number << 3) + varint(value)
+
+
+def field_scalar(number, value):
+    "Like field_varint, but leaves zero values out as proto3 does for non-oneof fields."
+    return field_varint(number, value) if value else b""
+
+
+def field_bytes(number, value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def field_double(number, value):
+    return varint(number << 3 | 1) + struct.pack("<d", value)
+
+
+def value_message(value):
+    if value is None:
+        return b""
+    if isinstance(value, str):
+        return field_bytes(1, value)
+    if isinstance(value, float):
+        return field_double(3, value)
+    return field_varint(8, zigzag(value))
+
+
+def feature_collection(
+    fields,
+    rows,
+    coords=None,
+    scale=(1e-6, 1e-6),
+    translate=(0.0, 0.0),
+    origin=0,
+    exceeded=False,
+    geometry_type=0,
+    lengths=None,
+):
+    """
+    fields is a list of (name, esri field type code), rows a list of value lists
+    and coords a list of quantized (x, y) integers per row or None for tables.
+    For polylines (geometry_type 2) and polygons (3) coords are the delta
+    encoded vertices of each row and lengths the vertex count of each part.
+    """
+
+    result = field_bytes(1, "OBJECTID")
+    result += field_scalar(7, geometry_type if coords is not None else 127)
+    result += field_bytes(8, field_varint(1, 4326))
+    if exceeded:
+        result += field_varint(9, 1)
+
+    transform = field_scalar(1, origin)
+    transform += field_bytes(2, field_double(1, scale[0]) + field_double(2, scale[1]))
+    transform += field_bytes(3, field_double(1, translate[0]) + field_double(2, translate[1]))
+    result += field_bytes(12, transform)
+
+    for name, field_type in fields:
+        result += field_bytes(13, field_bytes(1, name) + field_scalar(2, field_type))
+
+    for i, row in enumerate(rows):
+        feature = b"".join(field_bytes(1, value_message(value)) for value in row)
+        if coords is not None:
+            geometry = b""
+            if lengths is not None:
+                geometry += field_bytes(2, b"".join(varint(n) for n in lengths[i]))
+            packed = b"".join(varint(zigzag(c)) for c in coords[i])
+            geometry += field_bytes(3, packed)
+            feature += field_bytes(2, geometry)
+        result += field_bytes(15, feature)
+
+    query_result = field_bytes(1, result)
+    return field_bytes(1, "1.0") + field_bytes(2, query_result)
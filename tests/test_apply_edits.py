@@ -0,0 +1,102 @@
+import json
+import unittest
+
+from simple_arcgis_wrapper.exceptions import ArcGISException
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+
+def apply_edits_handler(method, url, data):
+    "Echo one successful result per edit, with new ids for adds starting at 100"
+
+    def get_results(adds, updates, deletes):
+        return {
+            "addResults": [
+                {"objectId": 100 + i, "success": True} for i in range(len(adds))
+            ],
+            "updateResults": [
+                {"objectId": u["attributes"]["OBJECTID"], "success": True}
+                for u in updates
+            ],
+            "deleteResults": [{"objectId": _id, "success": True} for _id in deletes],
+        }
+
+    if url == f"{FEATURE_SERVICE_URL}/applyEdits":
+        results = list()
+        for edit in json.loads(data["edits"]):
+            adds, updates = edit.get("adds", []), edit.get("updates", [])
+            results.append({"id": edit["id"], **get_results(adds, updates, edit.get("deletes", []))})
+        return results
+
+    adds = json.loads(data.get("adds", "[]"))
+    updates = json.loads(data.get("updates", "[]"))
+    deletes = [int(_id) for _id in data["deletes"].split(",")] if "deletes" in data else []
+    return get_results(adds, updates, deletes)
+
+
+class TestApplyEdits(unittest.TestCase):
+    def test_layer_edits(self):
+
+        requester = FakeRequester(apply_edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        res = services.apply_edits(
+            0,
+            FEATURE_SERVICE_URL,
+            adds=[{"attributes": {"Name": "a"}, "geometry": {"x": 1, "y": 2}}],
+            updates=[{"attributes": {"OBJECTID": 5, "Name": "b"}}],
+            deletes=[7, 8],
+        )
+
+        self.assertEqual(
+            res,
+            {"adds": {100: True}, "updates": {5: True}, "deletes": {7: True, 8: True}},
+        )
+        self.assertEqual(len(requester.calls), 1)
+
+        _, url, data = requester.calls[0]
+        self.assertEqual(url, f"{FEATURE_SERVICE_URL}/0/applyEdits")
+        self.assertEqual(data["rollbackOnFailure"], "true")
+        self.assertEqual(data["deletes"], "7,8")
+
+    def test_no_edits(self):
+
+        requester = FakeRequester(apply_edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        res = services.apply_edits(0, FEATURE_SERVICE_URL)
+
+        self.assertEqual(res, {"adds": {}, "updates": {}, "deletes": {}})
+        self.assertEqual(len(requester.calls), 0)
+
+    def test_service_edits(self):
+
+        requester = FakeRequester(apply_edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        res = services.apply_service_edits(
+            {
+                0: {"adds": [{"attributes": {"Name": "a"}}]},
+                1: {"deletes": [3]},
+                2: {},
+            },
+            FEATURE_SERVICE_URL,
+            rollback_on_failure=False,
+        )
+
+        self.assertEqual(res[0]["adds"], {100: True})
+        self.assertEqual(res[1]["deletes"], {3: True})
+        self.assertEqual(res[2], {"adds": {}, "updates": {}, "deletes": {}})
+        self.assertEqual(requester.calls[0][2]["rollbackOnFailure"], "false")
+
+    def test_service_edits_error(self):
+
+        requester = FakeRequester(
+            lambda method, url, data: {"error": {"code": 400, "message": "Bad edits"}}
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with self.assertRaises(ArcGISException):
+            services.apply_service_edits({0: {"deletes": [1]}}, FEATURE_SERVICE_URL)
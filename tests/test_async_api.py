@@ -0,0 +1,217 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from simple_arcgis_wrapper import async_api
+from simple_arcgis_wrapper.async_api import AsyncRequester, AsyncServicesAPI
+from tests.fake_requester import AsyncFakeRequester, add_results_handler
+from tests.test_extract import range_handler
+from tests.test_iter_features import query_handler
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+
+class FakeResponse(object):
+    def __init__(self, body):
+        self.status = 200
+        self.body = json.dumps(body).encode("utf-8")
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode("utf-8")
+
+
+class FakeRequest(object):
+    "Async context manager awaiting the session's handler on enter"
+
+    def __init__(self, session, method, url, payload):
+        self.session = session
+        self.call = (method, url, dict(payload or {}))
+
+    async def __aenter__(self):
+        self.session.calls.append(self.call)
+        return FakeResponse(await self.session.handler(*self.call))
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeSession(object):
+    """
+    Stands in for aiohttp.ClientSession. handler is a coroutine function called
+    with (method, url, params_or_data) that returns the response body.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = list()
+
+    def request(self, method, url, params=None, data=None):
+        return FakeRequest(self, method, url, params if method == "get" else data)
+
+    def post(self, url, data=None):
+        return self.request("post", url, data=data)
+
+    async def close(self):
+        pass
+
+
+def run_with_session(handler, coro_function, **kwargs):
+    """
+    Run coro_function(requester) with an AsyncRequester whose aiohttp session
+    is a FakeSession, return its result and the session.
+    """
+
+    session = FakeSession(handler)
+    requester = AsyncRequester("old", "refresh", "client", "https://example.com", **kwargs)
+
+    with mock.patch.object(async_api.aiohttp, "TCPConnector", lambda limit: None):
+        with mock.patch.object(
+            async_api.aiohttp, "ClientSession", lambda connector: session
+        ):
+            return asyncio.run(coro_function(requester)), session
+
+
+def token_handler(refreshes, code=498):
+    "Tokens other than the refreshed ones are expired, each refresh takes a moment."
+
+    async def handler(method, url, payload):
+        if url.endswith("/oauth2/token"):
+            await asyncio.sleep(0.01)
+            refreshes.append(payload)
+            return {"access_token": f"new{len(refreshes)}"}
+
+        if not payload["token"].startswith("new"):
+            return {"error": {"code": code, "message": "Invalid token"}}
+        return {"token": payload["token"]}
+
+    return handler
+
+
+class TestAsyncRequester(unittest.TestCase):
+    def test_reactive_refresh(self):
+
+        for code in [498, 499]:
+            refreshes = list()
+            res, session = run_with_session(
+                token_handler(refreshes, code),
+                lambda requester: requester.GET("https://example.com/query"),
+            )
+
+            self.assertEqual(res, {"token": "new1"})
+            self.assertEqual(len(refreshes), 1)
+            self.assertEqual(refreshes[0]["refresh_token"], "refresh")
+            tokens = [c[2]["token"] for c in session.calls if c[1].endswith("/query")]
+            self.assertEqual(tokens, ["old", "new1"])
+
+    def test_single_flight_refresh(self):
+
+        refreshes = list()
+
+        async def get_all(requester):
+            return await asyncio.gather(
+                *[requester.GET("https://example.com/query") for _ in range(5)]
+            )
+
+        res, _ = run_with_session(token_handler(refreshes), get_all)
+
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(res, [{"token": "new1"}] * 5)
+
+    def test_max_concurrency(self):
+
+        state = {"in_flight": 0, "max_in_flight": 0}
+
+        async def handler(method, url, payload):
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            await asyncio.sleep(0.01)
+            state["in_flight"] -= 1
+            return {"success": True}
+
+        async def post_all(requester):
+            return await asyncio.gather(
+                *[requester.POST("https://example.com/addFeatures") for _ in range(6)]
+            )
+
+        res, session = run_with_session(handler, post_all, max_concurrency=2)
+
+        self.assertEqual(len(res), 6)
+        self.assertEqual(len(session.calls), 6)
+        self.assertEqual(state["max_in_flight"], 2)
+
+    def test_none_params_dropped(self):
+
+        async def handler(method, url, payload):
+            return {"success": True}
+
+        _, session = run_with_session(
+            handler,
+            lambda requester: requester.GET(
+                "https://example.com/query", {"where": "1=1", "outFields": None}
+            ),
+        )
+
+        self.assertEqual(
+            session.calls[0][2], {"where": "1=1", "f": "json", "token": "old"}
+        )
+
+
+class TestAsyncServicesAPI(unittest.TestCase):
+    def test_add_points(self):
+
+        requester = AsyncFakeRequester(add_results_handler(max_record_count=2))
+        services = AsyncServicesAPI("https://example.com", requester, "user")
+
+        points = [{"lon": 10.0, "lat": 20.0, "Name": str(i)} for i in range(5)]
+        adds = asyncio.run(services.add_points(points, 0, FEATURE_SERVICE_URL))
+
+        posts = [c for c in requester.calls if c[0] == "post"]
+        self.assertEqual(len(posts), 3)
+        self.assertEqual(len(adds), 5)
+
+    def test_batch_result_maps_inputs(self):
+
+        requester = AsyncFakeRequester(add_results_handler(max_record_count=2))
+        services = AsyncServicesAPI("https://example.com", requester, "user")
+
+        points = [{"lon": 10.0, "lat": 20.0, "Name": str(i)} for i in range(4)]
+        del points[1]["lat"]
+        adds = asyncio.run(services.add_points(points, 0, FEATURE_SERVICE_URL))
+
+        self.assertEqual([r.index for r in adds.failed], [1])
+        self.assertEqual([r.object_id for r in adds.results], [1, None, 2, 3])
+
+        updates = [(5, {"Name": "a"}, None), (6, None, None), (7, None, {"x": 1, "y": 2})]
+        res = asyncio.run(services.update_features(updates, 0, FEATURE_SERVICE_URL))
+
+        self.assertEqual([r.index for r in res.failed], [1])
+        self.assertEqual(res.results[2].object_id, 5)
+
+        rows = [(8, None), (9, {"Name": "b"})]
+        res = asyncio.run(services.update_table_rows(rows, 0, FEATURE_SERVICE_URL))
+        self.assertEqual([r.index for r in res.failed], [0])
+        self.assertEqual(len(res.results), 2)
+
+    def test_iter_features(self):
+
+        requester = AsyncFakeRequester(query_handler(25, 10, True))
+        services = AsyncServicesAPI("https://example.com", requester, "user")
+
+        async def collect():
+            return [f async for f in services.iter_features("1=1", 0, FEATURE_SERVICE_URL)]
+
+        features = asyncio.run(collect())
+        self.assertEqual([f.id for f in features], list(range(1, 26)))
+
+    def test_extract_features(self):
+
+        handler, _ = range_handler(list(range(1, 26)), 10)
+        requester = AsyncFakeRequester(handler)
+        services = AsyncServicesAPI("https://example.com", requester, "user")
+
+        features = asyncio.run(services.extract_features("1=1", 0, FEATURE_SERVICE_URL))
+        self.assertEqual([f.id for f in features], list(range(1, 26)))
@@ -0,0 +1,223 @@
+import json
+import unittest
+
+from simple_arcgis_wrapper.exceptions import ArcGISException
+from simple_arcgis_wrapper.models import BatchResult, EditResult, PointFeature
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+
+def flaky_handler(fail_first, fail_requests=0):
+    """
+    Add features using their n attribute as objectId. Features whose n is in
+    fail_first are rejected the first time they are sent, and the first
+    fail_requests requests fail as a whole.
+    """
+
+    state = {"seen": set(), "requests": 0}
+
+    def handler(method, url, payload):
+        if method == "get":
+            return {"maxRecordCount": 1000}
+
+        state["requests"] += 1
+        if state["requests"] <= fail_requests:
+            return {"error": {"code": 503, "message": "Service unavailable"}}
+
+        results = list()
+        for f in json.loads(payload["features"]):
+            n = f["attributes"]["n"]
+            if n in fail_first and n not in state["seen"]:
+                state["seen"].add(n)
+                error = {"code": 1000, "description": "Transient failure"}
+                results.append({"success": False, "error": error})
+            else:
+                results.append({"objectId": n, "success": True})
+        return {"addResults": results}
+
+    return handler
+
+
+class TestBatchResult(unittest.TestCase):
+    def test_fromresults(self):
+
+        res = BatchResult.fromresults(
+            [
+                {"objectId": 1, "success": True},
+                {"success": False, "error": {"code": 1000, "description": "bad"}},
+                {"objectId": 3, "success": False, "error": {"code": 1019}},
+            ]
+        )
+
+        self.assertEqual(res, {1: True, 3: False})
+        self.assertEqual([r.index for r in res.failed], [1, 2])
+        self.assertEqual(res.failed[0].error_description, "bad")
+        self.assertIsNone(res.failed[0].object_id)
+        self.assertEqual(res.failed[1].error_code, 1019)
+        self.assertEqual([r.object_id for r in res.succeeded], [1])
+
+    def test_add_points_maps_inputs(self):
+
+        requester = FakeRequester(flaky_handler({2}))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        points = [{"lon": 1.0, "lat": 2.0, "n": i} for i in range(4)]
+        del points[1]["lat"]
+        res = services.add_points(points, 0, FEATURE_SERVICE_URL)
+
+        self.assertEqual(res, {0: True, 3: True})
+        self.assertEqual([r.index for r in res.failed], [1, 2])
+        self.assertEqual(res.failed[1].error_description, "Transient failure")
+        self.assertEqual(res.results[3].object_id, 3)
+        self.assertIn("lon", points[0])
+
+    def test_retries_resend_failed_items(self):
+
+        requester = FakeRequester(flaky_handler({2, 5}))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        rows = [{"n": i} for i in range(10)]
+        res = services.add_table_rows(
+            rows, 0, FEATURE_SERVICE_URL, batch_size=4, retries=1
+        )
+
+        self.assertFalse(res.failed)
+        self.assertEqual(sorted(res), list(range(10)))
+
+        posts = [json.loads(c[2]["features"]) for c in requester.calls if c[0] == "post"]
+        self.assertEqual(len(posts), 4)
+        self.assertEqual([f["attributes"]["n"] for f in posts[-1]], [2, 5])
+
+    def test_retries_lazy_input(self):
+
+        requester = FakeRequester(flaky_handler({1}))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        polylines = ({"paths": [[[0, 0], [1, i]]], "n": i} for i in range(3))
+        res = services.add_polylines(
+            polylines, 0, FEATURE_SERVICE_URL, batch_size=2, retries=1
+        )
+
+        self.assertFalse(res.failed)
+        posts = [json.loads(c[2]["features"]) for c in requester.calls if c[0] == "post"]
+        self.assertEqual(posts[-1][0]["geometry"]["paths"], [[[0, 0], [1, 1]]])
+
+    def test_retries_failed_request(self):
+
+        requester = FakeRequester(flaky_handler(set(), fail_requests=1))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        rows = [{"n": i} for i in range(6)]
+        res = services.add_table_rows(
+            rows, 0, FEATURE_SERVICE_URL, batch_size=3, retries=2
+        )
+
+        self.assertEqual(sorted(res), list(range(6)))
+
+        # without retries a failed request raises as before
+        requester = FakeRequester(flaky_handler(set(), fail_requests=1))
+        services = ServicesAPI("https://example.com", requester, "user")
+        with self.assertRaises(ArcGISException):
+            services.add_table_rows(rows, 0, FEATURE_SERVICE_URL)
+
+    def test_no_retry_after_read_timeout(self):
+
+        applied = list()
+
+        def handler(method, url, payload):
+            if method == "get":
+                return {"maxRecordCount": 1000}
+            # the server applies the edits but the response never arrives
+            applied.extend(json.loads(payload["features"]))
+            raise ArcGISException("Read timed out")
+
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+
+        points = [{"lon": 1.0, "lat": 2.0, "n": i} for i in range(3)]
+        res = services.add_points(points, 0, FEATURE_SERVICE_URL, retries=1)
+
+        self.assertEqual(len(applied), 3)
+        self.assertEqual(len(res.failed), 3)
+        self.assertIn("not retried", res.failed[0].error_description)
+
+    def test_no_retry_programming_error(self):
+
+        def handler(method, url, payload):
+            if method == "get":
+                return {"maxRecordCount": 1000}
+            raise KeyError("bug")
+
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+
+        with self.assertRaises(KeyError):
+            services.add_table_rows([{"n": 0}], 0, FEATURE_SERVICE_URL, retries=1)
+
+    def test_retries_exhausted(self):
+
+        requester = FakeRequester(flaky_handler(set(), fail_requests=10))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        res = services.add_table_rows([{"n": 0}], 0, FEATURE_SERVICE_URL, retries=2)
+
+        self.assertEqual(len(res.failed), 1)
+        self.assertEqual(res.failed[0].error_description, "Service unavailable")
+        self.assertEqual(len([c for c in requester.calls if c[0] == "post"]), 3)
+
+    def test_update_features_skipped_input(self):
+
+        requester = FakeRequester(
+            lambda method, url, payload: {
+                "updateResults": [
+                    {"objectId": f["attributes"]["OBJECTID"], "success": True}
+                    for f in json.loads(payload["features"])
+                ]
+            }
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        updates = [(5, {"Name": "a"}, None), (6, None, None)]
+        res = services.update_features(updates, 0, FEATURE_SERVICE_URL, batch_size=10)
+
+        self.assertEqual(res, {5: True})
+        self.assertEqual([r.index for r in res.failed], [1])
+
+    def test_add_point_returns_feature(self):
+
+        requester = FakeRequester(
+            lambda method, url, payload: {
+                "addResults": [{"objectId": 42, "success": True}]
+            }
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        point = services.add_point(10.0, 20.0, {"Name": "a"}, 0, FEATURE_SERVICE_URL)
+
+        self.assertTrue(isinstance(point, PointFeature))
+        self.assertEqual((point.id, point.x, point.y), (42, 10.0, 20.0))
+        self.assertEqual(point["Name"], "a")
+
+    def test_apply_edits_failure_without_object_id(self):
+
+        requester = FakeRequester(
+            lambda method, url, payload: {
+                "addResults": [{"success": False, "error": {"code": 1000}}],
+                "updateResults": [],
+                "deleteResults": [],
+            }
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        res = services.apply_edits(0, FEATURE_SERVICE_URL, adds=[{"attributes": {}}])
+
+        self.assertEqual(res["adds"], {})
+        self.assertEqual(res["adds"].failed[0].error_code, 1000)
+
+    def test_edit_result_repr(self):
+
+        self.assertIn("bad", repr(EditResult(0, None, False, 1000, "bad")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import json
+import unittest
+
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from simple_arcgis_wrapper.utilities.batching import chunk_features, join_encoded
+from tests.fake_requester import FakeRequester, add_results_handler
+
+
+class TestChunkFeatures(unittest.TestCase):
+    def test_max_count(self):
+
+        features = [{"attributes": {"n": i}} for i in range(10)]
+        batches = list(chunk_features(features, 4, 1024 * 1024))
+
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual(json.loads(join_encoded(batches[2]))[1]["attributes"]["n"], 9)
+
+    def test_max_bytes(self):
+
+        features = [{"attributes": {"Name": "x" * 100}} for i in range(10)]
+        batches = list(chunk_features(features, 1000, 350))
+
+        for batch in batches:
+            self.assertLessEqual(len(join_encoded(batch)), 350)
+        self.assertEqual(sum(len(b) for b in batches), 10)
+
+    def test_oversized_feature(self):
+
+        features = [{"attributes": {"Name": "x" * 500}}, {"attributes": {}}]
+        batches = list(chunk_features(features, 1000, 100))
+
+        self.assertEqual([len(b) for b in batches], [1, 1])
+
+
+class TestBatchedWrites(unittest.TestCase):
+    def test_add_points_uses_max_record_count(self):
+
+        requester = FakeRequester(add_results_handler(max_record_count=2))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        points = [{"lon": 10.0, "lat": 20.0, "Name": str(i)} for i in range(5)]
+        adds = services.add_points(points, 0, "https://example.com/FeatureServer")
+
+        posts = [c for c in requester.calls if c[0] == "post"]
+        self.assertEqual(len(posts), 3)
+        self.assertEqual(len(adds), 5)
+        self.assertTrue(all(adds.values()))
+
+    def test_update_table_rows_batch_size(self):
+
+        requester = FakeRequester(add_results_handler())
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        updates = [(i, {"Name": "John Doe"}) for i in range(7)]
+        res = services.update_table_rows(
+            updates, 1, "https://example.com/FeatureServer", batch_size=3
+        )
+
+        self.assertEqual(len(requester.calls), 3)
+        self.assertEqual(len(res), 7)
+
+
+class TestParallelWrites(unittest.TestCase):
+    @staticmethod
+    def echo_handler(method, url, payload):
+        "Use each feature's n attribute as its objectId."
+
+        if method == "get":
+            return {"maxRecordCount": 1000}
+
+        if url.endswith("deleteFeatures"):
+            ids = [int(_id) for _id in payload["objectIds"].split(",")]
+            return {"deleteResults": [{"objectId": i, "success": True} for i in ids]}
+
+        features = json.loads(payload["features"])
+        return {
+            "addResults": [
+                {"objectId": f["attributes"]["n"], "success": True} for f in features
+            ]
+        }
+
+    def test_add_table_rows_max_workers(self):
+
+        requester = FakeRequester(TestParallelWrites.echo_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        rows = [{"n": i} for i in range(100)]
+        adds = services.add_table_rows(
+            rows, 0, "https://example.com/FeatureServer", batch_size=7, max_workers=4
+        )
+
+        self.assertEqual(list(adds.keys()), list(range(100)))
+
+    def test_delete_features_batches(self):
+
+        requester = FakeRequester(TestParallelWrites.echo_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        deletes = services.delete_features(
+            0,
+            "https://example.com/FeatureServer",
+            object_ids=range(25),
+            batch_size=10,
+            max_workers=3,
+        )
+
+        posts = [c for c in requester.calls if c[0] == "post"]
+        self.assertEqual(len(posts), 3)
+        self.assertEqual(list(deletes.keys()), list(range(25)))
+
+    def test_truncate_layer(self):
+
+        requester = FakeRequester(lambda method, url, payload: {"success": True})
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        url = "https://example.com/arcgis/rest/services/Test/FeatureServer"
+        self.assertTrue(services.truncate_layer(0, url))
+
+        self.assertEqual(len(requester.calls), 1)
+        self.assertEqual(
+            requester.calls[0][1],
+            "https://example.com/arcgis/rest/admin/services/Test/FeatureServer/0/truncate",
+        )
+
+    def test_truncate_layer_fallback(self):
+
+        def handler(method, url, payload):
+            if url.endswith("truncate"):
+                return {"error": {"code": 400, "message": "Truncate not supported"}}
+            if url.endswith("query"):
+                return {"objectIds": list(range(25))}
+            return TestParallelWrites.echo_handler(method, url, payload)
+
+        requester = FakeRequester(handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        url = "https://example.com/arcgis/rest/services/Test/FeatureServer"
+        self.assertTrue(services.truncate_layer(0, url, max_workers=2))
+
+        deletes = [c for c in requester.calls if c[1].endswith("deleteFeatures")]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(deletes[0][2]["objectIds"].count(","), 24)
@@ -0,0 +1,78 @@
+import time
+import unittest
+
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from simple_arcgis_wrapper.utilities.cache import TTLCache
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+
+def service_handler(method, url, payload):
+    if method == "post":
+        return {"success": True, "layers": [{"id": 2, "name": "New"}]}
+
+    return {
+        "layers": [{"id": 0, "name": "Points"}, {"id": 1, "name": "More Points"}],
+        "tables": [{"id": 5, "name": "Rows"}],
+    }
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_expiry(self):
+
+        cache = TTLCache(10, 0.05)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+
+    def test_lru(self):
+
+        cache = TTLCache(2, 60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+
+
+class TestDefinitionCache(unittest.TestCase):
+    def test_lookups_hit_cache(self):
+
+        requester = FakeRequester(service_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        layer = services.get_feature_layer(FEATURE_SERVICE_URL, layer_id=1)
+        by_name = services.get_feature_layer(FEATURE_SERVICE_URL, layer_name="Points")
+        table = services.get_table(FEATURE_SERVICE_URL, table_name="Rows")
+
+        self.assertEqual(layer.name, "More Points")
+        self.assertEqual(by_name.id, 0)
+        self.assertEqual(table.id, 5)
+        self.assertEqual(len(requester.calls), 1)
+
+    def test_invalidated_by_delete(self):
+
+        requester = FakeRequester(service_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        services.get_feature_layer(FEATURE_SERVICE_URL, layer_id=0)
+        services.delete_feature_layers([0], FEATURE_SERVICE_URL)
+        services.get_feature_layer(FEATURE_SERVICE_URL, layer_id=0)
+
+        gets = [c for c in requester.calls if c[0] == "get"]
+        self.assertEqual(len(gets), 2)
+
+    def test_disabled(self):
+
+        requester = FakeRequester(service_handler)
+        services = ServicesAPI("https://example.com", requester, "user", cache_ttl=0)
+
+        services.get_feature_layer(FEATURE_SERVICE_URL, layer_id=0)
+        services.get_feature_layer(FEATURE_SERVICE_URL, layer_id=0)
+
+        self.assertEqual(len(requester.calls), 2)
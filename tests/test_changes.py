@@ -0,0 +1,176 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+
+from simple_arcgis_wrapper.exceptions import ArcGISException
+from simple_arcgis_wrapper.models import PointFeature, TableRow
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from simple_arcgis_wrapper.utilities.checkpoints import CheckpointStore
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+RANGE = re.compile(r"OBJECTID >= (\d+) AND OBJECTID <= (\d+)")
+
+
+def get_feature(_id, created, edited):
+    return {
+        "attributes": {"OBJECTID": _id, "CreationDate": created, "EditDate": edited},
+        "geometry": {"x": 1.0, "y": 2.0},
+    }
+
+
+def change_tracking_handler(features, server_gen, changes):
+    "A service with change tracking answering extractChanges with changes"
+
+    def handler(method, url, payload):
+        if url == FEATURE_SERVICE_URL:
+            return {
+                "capabilities": "Query,Editing,ChangeTracking",
+                "changeTrackingInfo": {
+                    "layerServerGens": [{"id": 0, "minServerGen": 1, "serverGen": server_gen}]
+                },
+            }
+        if url.endswith("/extractChanges"):
+            layer_server_gens = json.loads(payload["layerServerGens"])
+            assert layer_server_gens == [{"id": 0, "serverGen": server_gen}]
+            return {
+                "layerServerGens": [{"id": 0, "serverGen": server_gen + 5}],
+                "edits": [{"id": 0, "features": changes}],
+            }
+        if url.endswith("/0"):
+            return {"geometryType": "esriGeometryPoint", "maxRecordCount": 10}
+        if payload.get("returnIdsOnly"):
+            return {"objectIds": [f["attributes"]["OBJECTID"] for f in features]}
+
+        first, last = [int(v) for v in RANGE.search(payload["where"]).groups()]
+        return {
+            "features": [f for f in features if first <= f["attributes"]["OBJECTID"] <= last]
+        }
+
+    return handler
+
+
+def edit_date_handler(features):
+    "A table without change tracking, queried by EditDate"
+
+    def handler(method, url, params):
+        if url == FEATURE_SERVICE_URL:
+            return {"capabilities": "Query,Editing"}
+        if url.endswith("/0"):
+            return {
+                "maxRecordCount": 10,
+                "objectIdField": "OBJECTID",
+                "advancedQueryCapabilities": {"supportsPagination": True},
+                "editFieldsInfo": {
+                    "creationDateField": "CreationDate",
+                    "editDateField": "EditDate",
+                },
+            }
+        if params.get("returnIdsOnly"):
+            return {"objectIds": [f["attributes"]["OBJECTID"] for f in features]}
+
+        match = RANGE.search(params["where"])
+        if match:
+            first, last = [int(v) for v in match.groups()]
+            return {
+                "features": [
+                    f for f in features if first <= f["attributes"]["OBJECTID"] <= last
+                ]
+            }
+
+        # EditDate >= TIMESTAMP '2020-09-13 12:26:40', compared in whole seconds
+        timestamp = re.search(r"TIMESTAMP '([^']+)'", params["where"]).group(1)
+        seconds = {"2020-09-13 12:26:40": 1600000000}[timestamp]
+        matched = [
+            f for f in features if f["attributes"]["EditDate"] >= seconds * 1000
+        ]
+        return {"features": matched[params["resultOffset"] :]}
+
+    return handler
+
+
+class TestGetChanges(unittest.TestCase):
+    def test_extract_changes(self):
+
+        features = [get_feature(i, 0, 0) for i in range(1, 16)]
+        changes = {
+            "adds": [get_feature(16, 1, 1)],
+            "updates": [get_feature(3, 0, 1)],
+            "deleteIds": [4, 5],
+        }
+        requester = FakeRequester(change_tracking_handler(features, 10, changes))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        initial = services.get_changes(0, FEATURE_SERVICE_URL)
+        self.assertEqual(len(initial.inserts), 15)
+        self.assertTrue(isinstance(initial.inserts[0], PointFeature))
+        self.assertEqual(initial.checkpoint, {"serverGen": 10})
+
+        changes = services.get_changes(0, FEATURE_SERVICE_URL, initial.checkpoint)
+        self.assertEqual([f.id for f in changes.inserts], [16])
+        self.assertEqual([f.id for f in changes.updates], [3])
+        self.assertEqual(changes.deletes, [4, 5])
+        self.assertEqual(changes.checkpoint, {"serverGen": 15})
+        self.assertEqual(len(changes), 4)
+
+    def test_edit_date_fallback(self):
+
+        base = 1600000000 * 1000
+        features = [
+            get_feature(1, base - 5000, base - 5000),
+            get_feature(2, base - 5000, base + 200),  # boundary second, already seen
+            get_feature(3, base - 5000, base + 700),  # updated
+            get_feature(4, base + 900, base + 900),  # inserted
+        ]
+        requester = FakeRequester(edit_date_handler(features))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        changes = services.get_changes(0, FEATURE_SERVICE_URL, {"editDate": base + 200})
+
+        self.assertEqual([r.id for r in changes.inserts], [4])
+        self.assertEqual([r.id for r in changes.updates], [3])
+        self.assertTrue(isinstance(changes.updates[0], TableRow))
+        self.assertEqual(changes.deletes, [])
+        self.assertEqual(changes.checkpoint, {"editDate": base + 900})
+
+    def test_edit_date_initial(self):
+
+        features = [get_feature(i, 0, i * 1000) for i in range(1, 4)]
+        requester = FakeRequester(edit_date_handler(features))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        initial = services.get_changes(0, FEATURE_SERVICE_URL, out_fields=["Name"])
+
+        self.assertEqual(len(initial.inserts), 3)
+        self.assertEqual(initial.checkpoint, {"editDate": 3000})
+
+    def test_no_tracking(self):
+
+        def handler(method, url, params):
+            if url == FEATURE_SERVICE_URL:
+                return {"capabilities": "Query"}
+            return {"maxRecordCount": 10}
+
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+
+        with self.assertRaises(ArcGISException):
+            services.get_changes(0, FEATURE_SERVICE_URL)
+
+
+class TestCheckpointStore(unittest.TestCase):
+    def test_persist(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoints.json")
+
+            store = CheckpointStore(path)
+            self.assertIsNone(store.get("layer"))
+            store.set("layer", {"serverGen": 10})
+
+            self.assertEqual(CheckpointStore(path).get("layer"), {"serverGen": 10})
+
+            store.delete("layer")
+            self.assertIsNone(CheckpointStore(path).get("layer"))
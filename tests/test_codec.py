@@ -0,0 +1,70 @@
+import datetime
+import decimal
+import json
+import unittest
+
+from simple_arcgis_wrapper import codec
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestCodec(unittest.TestCase):
+    def setUp(self):
+        self.backend = codec.get_backend()
+
+    def tearDown(self):
+        codec.set_backend(self.backend)
+
+    def test_backends_agree(self):
+
+        value = {
+            "attributes": {
+                "Date": datetime.datetime(2020, 1, 1, 15, 30, 45),
+                "Day": datetime.date(2020, 1, 1),
+                "Altitude": decimal.Decimal("12.5"),
+                "Name": "Jöhn Doe",
+            },
+            "geometry": {"x": 10.0, "y": 20.0},
+        }
+        expected = {
+            "attributes": {
+                "Date": 1577892645000,
+                "Day": 1577836800000,
+                "Altitude": 12.5,
+                "Name": "Jöhn Doe",
+            },
+            "geometry": {"x": 10.0, "y": 20.0},
+        }
+
+        for backend in codec._BACKENDS:
+            codec.set_backend(backend)
+            encoded = codec.dumps(value)
+            self.assertTrue(isinstance(encoded, str))
+            self.assertEqual(json.loads(encoded), expected, backend)
+            self.assertEqual(codec.loads(encoded.encode("utf-8")), expected, backend)
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_numpy(self):
+
+        value = {"n": np.int64(3), "x": np.float32(1.5), "a": np.arange(3)}
+
+        for backend in codec._BACKENDS:
+            codec.set_backend(backend)
+            self.assertEqual(
+                json.loads(codec.dumps(value)), {"n": 3, "x": 1.5, "a": [0, 1, 2]}
+            )
+
+    def test_invalid(self):
+
+        with self.assertRaises(ValueError):
+            codec.set_backend("simplejson")
+
+        for backend in codec._BACKENDS:
+            codec.set_backend(backend)
+            with self.assertRaises(ValueError):
+                codec.loads(b"<html>")
+            with self.assertRaises(TypeError):
+                codec.dumps({"a": object()})
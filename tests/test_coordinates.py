@@ -0,0 +1,62 @@
+import array
+import random
+import unittest
+
+from simple_arcgis_wrapper.utilities import coordinates
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestCoordinateArrays(unittest.TestCase):
+    def test_matches_scalar(self):
+
+        random.seed(3141592)
+        lons = [random.uniform(-180, 180) for _ in range(100)]
+        lats = [random.uniform(-85, 85) for _ in range(100)]
+
+        eastings, northings = coordinates.get_decimal_degrees_to_webmerc_array(
+            lons, lats
+        )
+
+        for i in range(100):
+            e, n = coordinates.get_decimal_degrees_to_webmerc(lons[i], lats[i])
+            self.assertAlmostEqual(eastings[i], e, places=4)
+            self.assertAlmostEqual(northings[i], n, places=4)
+
+    def test_round_trip_buffers(self):
+
+        lons = array.array("d", [-120.5, 0.0, 10.0, 179.9])
+        lats = array.array("d", [-60.0, 0.0, 20.0, 84.0])
+
+        eastings, northings = coordinates.get_decimal_degrees_to_webmerc_array(
+            memoryview(lons), lats.tobytes()
+        )
+        out_lons, out_lats = coordinates.get_webmerc_to_decimal_degrees_array(
+            eastings, northings
+        )
+
+        np.testing.assert_allclose(out_lons, lons, atol=1e-9)
+        np.testing.assert_allclose(out_lats, lats, atol=1e-9)
+
+    def test_scalar_inverse(self):
+
+        e, n = coordinates.get_decimal_degrees_to_webmerc(10.0, 20.0)
+        lon, lat = coordinates.get_webmerc_to_decimal_degrees(e, n)
+
+        self.assertAlmostEqual(lon, 10.0)
+        self.assertAlmostEqual(lat, 20.0)
+
+    def test_invalid_values(self):
+
+        with self.assertRaises(ValueError):
+            coordinates.get_decimal_degrees_to_webmerc_array([0, 181], [0, 0])
+
+        with self.assertRaises(ValueError):
+            coordinates.get_decimal_degrees_to_webmerc_array([0, 0], [0, -91])
+
+        with self.assertRaises(ValueError):
+            coordinates.get_webmerc_to_decimal_degrees_array([3e7], [0])
@@ -0,0 +1,97 @@
+import re
+import threading
+import time
+import unittest
+
+from simple_arcgis_wrapper.models import PointFeature, TableRow
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+RANGE = re.compile(r"OBJECTID >= (\d+) AND OBJECTID <= (\d+)")
+
+
+def range_handler(object_ids, max_record_count, delay=0):
+    "Serve point features with the given ids, answering id and range queries"
+
+    state = {"in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    def handler(method, url, params):
+        if not url.endswith("/query"):
+            return {"maxRecordCount": max_record_count, "objectIdField": "OBJECTID"}
+
+        if params.get("returnIdsOnly"):
+            return {"objectIdFieldName": "OBJECTID", "objectIds": list(reversed(object_ids))}
+
+        with lock:
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        time.sleep(delay)
+
+        first, last = [int(v) for v in RANGE.search(params["where"]).groups()]
+        matched = [_id for _id in object_ids if first <= _id <= last]
+        assert len(matched) <= max_record_count
+
+        with lock:
+            state["in_flight"] -= 1
+
+        return {
+            "geometryType": "esriGeometryPoint",
+            "features": [
+                {"attributes": {"OBJECTID": _id}, "geometry": {"x": float(_id), "y": 0.0}}
+                for _id in matched
+            ],
+        }
+
+    return handler, state
+
+
+class TestExtractFeatures(unittest.TestCase):
+    def test_ranges_in_order(self):
+
+        object_ids = [i * 3 + 1 for i in range(95)]  # sparse ids
+        handler, state = range_handler(object_ids, 10, delay=0.01)
+        requester = FakeRequester(handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = services.extract_features(
+            "1=1", 0, FEATURE_SERVICE_URL, max_workers=4
+        )
+
+        self.assertTrue(isinstance(features[0], PointFeature))
+        self.assertEqual([f.id for f in features], object_ids)
+        queries = [c for c in requester.calls if c[1].endswith("/query")]
+        self.assertEqual(len(queries), 11)  # ids + 10 ranges
+        self.assertGreater(state["max_in_flight"], 1)
+        self.assertLessEqual(state["max_in_flight"], 4)
+
+    def test_no_matches(self):
+
+        handler, _ = range_handler([], 10)
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+
+        self.assertEqual(services.extract_features("1=0", 0, FEATURE_SERVICE_URL), [])
+
+    def test_table_rows(self):
+
+        handler, _ = range_handler(list(range(1, 26)), 10)
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+
+        rows = services.extract_table_rows("1=1", 0, FEATURE_SERVICE_URL, max_workers=2)
+
+        self.assertTrue(isinstance(rows[0], TableRow))
+        self.assertEqual([r.id for r in rows], list(range(1, 26)))
+
+    def test_as_batch(self):
+
+        handler, _ = range_handler(list(range(1, 26)), 10)
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+
+        batch = services.extract_features(
+            "1=1", 0, FEATURE_SERVICE_URL, as_batch=True
+        )
+
+        self.assertEqual(batch.ids.tolist(), list(range(1, 26)))
+        self.assertEqual(batch.x[24], 25.0)
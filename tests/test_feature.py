@@ -46,7 +46,9 @@ class TestFeature(unittest.TestCase):
             lon=10.0, lat=20.0, attributes=attributes,
             layer_id=fl.id, feature_service_url=feature_service.url
         )
-        self.assertTrue(add)
+        self.assertTrue(add.id)
+        self.assertEqual((add.x, add.y), (10.0, 20.0))
+        self.assertEqual(add["DeviceId"], "abc123")
 
     def test_add_points(self):
 
@@ -0,0 +1,115 @@
+import unittest
+
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import FakeRequester
+
+try:
+    import numpy as np
+    from simple_arcgis_wrapper.models import FeatureBatch
+except ImportError:
+    np = None
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+QUERY_RESULT = {
+    "objectIdFieldName": "OBJECTID",
+    "geometryType": "esriGeometryPoint",
+    "fields": [
+        {"name": "OBJECTID", "type": "esriFieldTypeOID"},
+        {"name": "Name", "type": "esriFieldTypeString"},
+        {"name": "Altitude", "type": "esriFieldTypeDouble"},
+        {"name": "Count", "type": "esriFieldTypeInteger"},
+    ],
+    "features": [
+        {
+            "attributes": {"OBJECTID": 1, "Name": "a", "Altitude": 1.5, "Count": 3},
+            "geometry": {"x": 10.0, "y": 20.0},
+        },
+        {
+            "attributes": {"OBJECTID": 2, "Name": None, "Altitude": None, "Count": 4},
+            "geometry": {"x": 10.5, "y": 20.5},
+        },
+    ],
+}
+
+POLYGON_RESULT = {
+    "geometryType": "esriGeometryPolygon",
+    "fields": [{"name": "OBJECTID", "type": "esriFieldTypeOID"}],
+    "features": [
+        {
+            "attributes": {"OBJECTID": 1},
+            "geometry": {
+                "rings": [
+                    [[0, 0], [0, 4], [4, 4], [4, 0], [0, 0]],
+                    [[1, 1], [2, 1], [2, 2], [1, 1]],
+                ]
+            },
+        },
+        {"attributes": {"OBJECTID": 2}, "geometry": None},
+        {
+            "attributes": {"OBJECTID": 3},
+            "geometry": {"rings": [[[5, 5], [5, 6], [6, 6], [5, 5]]]},
+        },
+    ],
+}
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestFeatureBatch(unittest.TestCase):
+    def test_columns(self):
+
+        batch = FeatureBatch.fromqueryresult(QUERY_RESULT)
+
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.ids.dtype, np.int64)
+        np.testing.assert_array_equal(batch.x, [10.0, 10.5])
+        self.assertEqual(batch.column("Count").dtype, np.int64)
+        self.assertTrue(np.isnan(batch.column("Altitude")[1]))
+        self.assertNotIn("OBJECTID", batch.columns)
+
+    def test_rows(self):
+
+        batch = FeatureBatch.fromqueryresult(QUERY_RESULT)
+        row = batch[-1]
+
+        self.assertEqual(row.id, 2)
+        self.assertEqual(row.y, 20.5)
+        self.assertIsNone(row["Name"])
+        self.assertEqual(row.attributes["Count"], 4)
+        self.assertEqual([r.id for r in batch], [1, 2])
+
+    def test_concat(self):
+
+        batch = FeatureBatch.fromqueryresult(QUERY_RESULT)
+        joined = FeatureBatch.concat([batch, batch])
+
+        self.assertEqual(len(joined), 4)
+        self.assertEqual(list(joined.column("Name")), ["a", None, "a", None])
+
+    def test_polygons(self):
+
+        batch = FeatureBatch.fromqueryresult(POLYGON_RESULT)
+
+        self.assertIsNone(batch.x)
+        self.assertEqual(batch.coords.shape, (13, 2))
+        self.assertEqual(batch.part_offsets.tolist(), [0, 5, 9, 13])
+        self.assertEqual(batch.feature_offsets.tolist(), [0, 2, 2, 3])
+        self.assertEqual(len(batch[0].parts), 2)
+        self.assertEqual(batch[1].parts, [])
+        np.testing.assert_array_equal(batch[2].parts[0][1], [5, 6])
+
+        joined = FeatureBatch.concat([batch, batch])
+        self.assertEqual(joined.part_offsets.tolist(), [0, 5, 9, 13, 18, 22, 26])
+        self.assertEqual(joined.feature_offsets.tolist(), [0, 2, 2, 3, 5, 5, 6])
+        np.testing.assert_array_equal(joined.get_parts(5)[0], batch.get_parts(2)[0])
+
+    def test_get_features_as_batch(self):
+
+        requester = FakeRequester(lambda method, url, params: QUERY_RESULT)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        batch = services.get_features(
+            "1=1", 0, FEATURE_SERVICE_URL, out_fields=["Name"], as_batch=True
+        )
+        self.assertTrue(isinstance(batch, FeatureBatch))
+        self.assertEqual(batch[0]["Name"], "a")
@@ -0,0 +1,88 @@
+import json
+import unittest
+
+from simple_arcgis_wrapper.models import PolygonFeature, PolylineFeature
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from simple_arcgis_wrapper.utilities.geometry import flatten_parts, get_extent, nest_parts
+from tests.fake_requester import FakeRequester, add_results_handler
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+PATHS = [[[0.0, 0.0], [1.0, 1.0, 5.0]], [[2.0, 2.0], [3.0, 2.0], [4.0, 1.0]]]
+
+
+class TestGeometry(unittest.TestCase):
+    def test_flatten_parts(self):
+
+        coords, offsets = flatten_parts(PATHS)
+
+        self.assertEqual(list(coords), [0, 0, 1, 1, 2, 2, 3, 2, 4, 1])  # z dropped
+        self.assertEqual(list(offsets), [0, 2, 5])
+        self.assertEqual(nest_parts(coords, offsets)[1], PATHS[1])
+        self.assertEqual(get_extent(coords), (0, 0, 4, 2))
+        self.assertIsNone(get_extent(flatten_parts([])[0]))
+
+    def test_polyline_feature(self):
+
+        coords, offsets = flatten_parts(PATHS)
+        line = PolylineFeature(1, coords, offsets, {"Name": "route"})
+
+        self.assertEqual(line.num_parts, 2)
+        self.assertEqual(line.get_part(0), [(0.0, 0.0), (1.0, 1.0)])
+        self.assertEqual(line.paths[0], [[0.0, 0.0], [1.0, 1.0]])
+        self.assertEqual(line["Name"], "route")
+        self.assertFalse(hasattr(line, "__dict__"))
+
+    def test_get_esri_type(self):
+
+        self.assertEqual(ServicesAPI.get_esri_type("line"), "esriGeometryPolyline")
+        self.assertEqual(ServicesAPI.get_esri_type("polygon"), "esriGeometryPolygon")
+        with self.assertRaises(NotImplementedError):
+            ServicesAPI.get_esri_type("multipatch")
+
+    def test_get_polygons(self):
+
+        res = {
+            "geometryType": "esriGeometryPolygon",
+            "features": [
+                {
+                    "attributes": {"OBJECTID": 1},
+                    "geometry": {"rings": [[[0, 0], [0, 1], [1, 1], [0, 0]]]},
+                }
+            ],
+        }
+        requester = FakeRequester(lambda method, url, params: res)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        polygon = services.get_features("1=1", 0, FEATURE_SERVICE_URL)[0]
+
+        self.assertTrue(isinstance(polygon, PolygonFeature))
+        self.assertEqual(polygon.extent, (0, 0, 1, 1))
+        self.assertEqual(polygon.rings, res["features"][0]["geometry"]["rings"])
+
+    def test_add_polylines(self):
+
+        requester = FakeRequester(add_results_handler())
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        coords, offsets = flatten_parts(PATHS)
+        adds = services.add_polylines(
+            [
+                {"paths": PATHS, "Name": "nested"},
+                {"coords": coords, "offsets": offsets, "Name": "flat"},
+            ],
+            0,
+            FEATURE_SERVICE_URL,
+        )
+
+        self.assertEqual(len(adds), 2)
+        features = json.loads(requester.calls[-1][2]["features"])
+        self.assertEqual(features[0]["attributes"], {"Name": "nested"})
+        self.assertEqual(features[1]["geometry"]["paths"][1], PATHS[1])
+
+    def test_add_polygons_requires_rings(self):
+
+        services = ServicesAPI("https://example.com", FakeRequester(add_results_handler()), "user")
+
+        with self.assertRaises(ValueError):
+            services.add_polygons([{"Name": "no geometry"}], 0, FEATURE_SERVICE_URL)
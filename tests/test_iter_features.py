@@ -0,0 +1,106 @@
+import unittest
+
+from simple_arcgis_wrapper.models import PointFeature, TableRow
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+
+def query_handler(n_features, max_record_count, supports_pagination):
+    "Serve a point layer of n_features truncated at max_record_count per query."
+
+    features = [
+        {"attributes": {"OBJECTID": i + 1}, "geometry": {"x": float(i), "y": 1.0}}
+        for i in range(n_features)
+    ]
+
+    def handler(method, url, params):
+        if not url.endswith("/query"):
+            return {
+                "maxRecordCount": max_record_count,
+                "objectIdField": "OBJECTID",
+                "advancedQueryCapabilities": {
+                    "supportsPagination": supports_pagination
+                },
+            }
+
+        if supports_pagination:
+            start = params["resultOffset"]
+            count = min(params["resultRecordCount"], max_record_count)
+            matched = features[start:]
+        else:
+            last_oid = int(params["where"].rsplit(">", 1)[1])
+            matched = [f for f in features if f["attributes"]["OBJECTID"] > last_oid]
+            count = max_record_count
+
+        return {
+            "geometryType": "esriGeometryPoint",
+            "features": matched[:count],
+            "exceededTransferLimit": len(matched) > count,
+        }
+
+    return handler
+
+
+class TestIterFeatures(unittest.TestCase):
+    def test_offset_paging(self):
+
+        requester = FakeRequester(query_handler(25, 10, True))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = list(services.iter_features("1=1", 0, FEATURE_SERVICE_URL))
+
+        self.assertEqual(len(features), 25)
+        self.assertTrue(isinstance(features[0], PointFeature))
+        self.assertEqual([f.id for f in features], list(range(1, 26)))
+
+    def test_keyset_paging(self):
+
+        requester = FakeRequester(query_handler(25, 10, False))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = list(services.iter_features("1=1", 0, FEATURE_SERVICE_URL))
+
+        self.assertEqual([f.id for f in features], list(range(1, 26)))
+        queries = [c for c in requester.calls if c[1].endswith("/query")]
+        self.assertEqual(len(queries), 3)
+
+    def test_page_size(self):
+
+        requester = FakeRequester(query_handler(25, 10, True))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        rows = list(
+            services.iter_table_rows("1=1", 0, FEATURE_SERVICE_URL, page_size=5)
+        )
+
+        self.assertEqual(len(rows), 25)
+        self.assertTrue(isinstance(rows[0], TableRow))
+        queries = [c for c in requester.calls if c[1].endswith("/query")]
+        self.assertEqual(len(queries), 5)
+
+    def test_stream(self):
+
+        requester = FakeRequester(query_handler(25, 10, True))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = list(
+            services.iter_features("1=1", 0, FEATURE_SERVICE_URL, stream=True)
+        )
+
+        self.assertEqual([f.id for f in features], list(range(1, 26)))
+        self.assertEqual(features[3].x, 3.0)
+        queries = [c for c in requester.calls if c[1].endswith("/query")]
+        self.assertEqual([q[2]["resultOffset"] for q in queries], [0, 10, 20])
+
+    def test_stream_table_rows(self):
+
+        requester = FakeRequester(query_handler(25, 10, False))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        rows = list(
+            services.iter_table_rows("1=1", 0, FEATURE_SERVICE_URL, stream=True)
+        )
+
+        self.assertEqual([r.id for r in rows], list(range(1, 26)))
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import unittest
+
+from simple_arcgis_wrapper.mirror import LayerMirror
+from simple_arcgis_wrapper.models import (
+    ChangeSet,
+    PointFeature,
+    PolygonFeature,
+    TableRow,
+)
+from simple_arcgis_wrapper.utilities.geometry import flatten_parts
+
+
+FIELDS = [
+    {"name": "OBJECTID", "type": "esriFieldTypeOID"},
+    {"name": "DeviceId", "type": "esriFieldTypeString"},
+    {"name": "Altitude", "type": "esriFieldTypeDouble"},
+]
+
+
+class FakeServices(object):
+    "Serves a layer definition, a queue of ChangeSets and the layer's object ids"
+
+    def __init__(self, change_sets, geometry_type="esriGeometryPoint", object_ids=[]):
+        self.change_sets = list(change_sets)
+        self.checkpoints = list()
+        self.object_ids = object_ids
+        self.definition = {"geometryType": geometry_type, "fields": FIELDS}
+
+    def _get_layer_definition(self, layer_id, feature_service_url):
+        return self.definition
+
+    def get_changes(self, layer_id, feature_service_url, checkpoint, out_fields):
+        self.checkpoints.append(checkpoint)
+        return self.change_sets.pop(0)
+
+    def get_object_ids(self, where, layer_id, feature_service_url):
+        return self.object_ids
+
+
+def get_point(_id, device_id, altitude):
+    return PointFeature(
+        _id, float(_id), 2.0, {"OBJECTID": _id, "DeviceId": device_id, "Altitude": altitude}
+    )
+
+
+class TestLayerMirror(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "layer.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_refresh_and_query(self):
+
+        services = FakeServices(
+            [
+                ChangeSet(
+                    [get_point(i, f"d{i % 3}", i * 10.0) for i in range(1, 10)],
+                    [],
+                    [],
+                    {"serverGen": 1},
+                ),
+                ChangeSet(
+                    [get_point(10, "d1", 100.0)],
+                    [get_point(2, "d0", 25.0)],
+                    [3, 4],
+                    {"serverGen": 2},
+                ),
+            ]
+        )
+
+        with LayerMirror(services, 0, "url", self.path, indexes=["DeviceId"]) as mirror:
+            mirror.refresh()
+            self.assertEqual(mirror.count(), 9)
+            self.assertEqual(mirror.checkpoint, {"serverGen": 1})
+
+            mirror.refresh()
+            self.assertEqual(services.checkpoints, [None, {"serverGen": 1}])
+            self.assertEqual(mirror.count(), 8)
+
+            points = mirror.get_features("DeviceId = ?", ["Altitude"], params=["d1"])
+            self.assertTrue(isinstance(points[0], PointFeature))
+            self.assertEqual([p.id for p in points], [1, 7, 10])
+            self.assertEqual(points[2].attributes, {"OBJECTID": 10, "Altitude": 100.0})
+            self.assertEqual(points[2].x, 10.0)
+
+            updated = mirror.get_features("OBJECTID = 2", ["*"])[0]
+            self.assertEqual(updated["DeviceId"], "d0")
+            self.assertEqual(updated["Altitude"], 25.0)
+
+        # the checkpoint survives reopening
+        with LayerMirror(services, 0, "url", self.path) as mirror:
+            self.assertEqual(mirror.checkpoint, {"serverGen": 2})
+            self.assertEqual(mirror.count("Altitude > ?", [50]), 5)
+
+    def test_edit_date_deletes(self):
+
+        services = FakeServices(
+            [
+                ChangeSet(
+                    [get_point(i, "d", 1.0) for i in range(1, 6)], [], [], {"editDate": 10}
+                ),
+                ChangeSet([get_point(6, "d", 2.0)], [], [], {"editDate": 20}),
+            ],
+            object_ids=[1, 3, 5, 6],
+        )
+
+        with LayerMirror(services, 0, "url", self.path) as mirror:
+            mirror.refresh()
+            self.assertEqual(mirror.count(), 5)
+
+            changes = mirror.refresh()
+            self.assertEqual(changes.deletes, [2, 4])
+            self.assertEqual([p.id for p in mirror.get_features()], [1, 3, 5, 6])
+            self.assertEqual(mirror.checkpoint, {"editDate": 20})
+
+    def test_table(self):
+
+        services = FakeServices(
+            [ChangeSet([TableRow(1, {"OBJECTID": 1, "DeviceId": "a"})], [], [], {})],
+            geometry_type=None,
+        )
+
+        with LayerMirror(services, 0, "url", self.path) as mirror:
+            mirror.refresh()
+            rows = mirror.get_features(out_fields=["DeviceId"])
+
+        self.assertTrue(isinstance(rows[0], TableRow))
+        self.assertEqual(rows[0]["DeviceId"], "a")
+
+    def test_polygons(self):
+
+        coords, offsets = flatten_parts([[[0, 0], [0, 1], [1, 1], [0, 0]]])
+        services = FakeServices(
+            [ChangeSet([PolygonFeature(1, coords, offsets)], [], [], {})],
+            geometry_type="esriGeometryPolygon",
+        )
+
+        with LayerMirror(services, 0, "url", self.path) as mirror:
+            mirror.refresh()
+            polygon = mirror.get_features()[0]
+
+        self.assertTrue(isinstance(polygon, PolygonFeature))
+        self.assertEqual(polygon.coords, coords)
+        self.assertEqual(polygon.offsets, offsets)
+
+    def test_unknown_field(self):
+
+        with LayerMirror(FakeServices([]), 0, "url", self.path) as mirror:
+            with self.assertRaises(ValueError):
+                mirror.get_features(out_fields=["Missing"])
@@ -0,0 +1,59 @@
+import unittest
+
+from simple_arcgis_wrapper.models import (
+    AttributeSchema,
+    FeatureLayer,
+    PointFeature,
+    TableRow,
+)
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import FakeRequester
+
+
+class TestModels(unittest.TestCase):
+    def test_slots(self):
+
+        layer = FeatureLayer(0, "Points", "https://example.com/FeatureServer/0")
+        point = PointFeature(1, 10.0, 20.0)
+
+        for model in [layer, point, TableRow(1)]:
+            self.assertFalse(hasattr(model, "__dict__"))
+
+    def test_attributes(self):
+
+        point = PointFeature(1, 10.0, 20.0, {"Name": "John Doe", "Altitude": 12.5})
+
+        self.assertEqual(point["Name"], "John Doe")
+        self.assertEqual(point.attributes, {"Name": "John Doe", "Altitude": 12.5})
+        self.assertIsNone(point.get("DeviceId"))
+        self.assertEqual(PointFeature(2, 0, 0).attributes, {})
+
+    def test_shared_schema(self):
+
+        res = {
+            "geometryType": "esriGeometryPoint",
+            "fields": [{"name": "OBJECTID"}, {"name": "Name"}],
+            "features": [
+                {"attributes": {"OBJECTID": 1, "Name": "a"}, "geometry": {"x": 1, "y": 2}},
+                {"attributes": {"OBJECTID": 2, "Name": "b"}, "geometry": {"x": 3, "y": 4}},
+            ],
+        }
+        requester = FakeRequester(lambda method, url, params: res)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = services.get_features("1=1", 0, "https://example.com/FeatureServer")
+
+        self.assertEqual([f["Name"] for f in features], ["a", "b"])
+        self.assertIs(features[0]._schema, features[1]._schema)
+
+        rows = services.get_table_rows("1=1", 0, "https://example.com/FeatureServer")
+        self.assertEqual(rows[1].attributes, {"OBJECTID": 2, "Name": "b"})
+
+    def test_schema(self):
+
+        schema = AttributeSchema(["a", "b"])
+        row = TableRow.fromschema(1, schema, [1, 2])
+
+        self.assertEqual(row["b"], 2)
+        self.assertIn("a", schema)
+        self.assertEqual(len(schema), 2)
@@ -0,0 +1,118 @@
+import unittest
+
+from simple_arcgis_wrapper import pbf
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests import pbf_encoder
+from tests.fake_requester import FakeRequester
+
+try:
+    import numpy as np
+    from simple_arcgis_wrapper.models import FeatureBatch
+except ImportError:
+    np = None
+
+FIELDS = [("OBJECTID", 6), ("Name", 4), ("Altitude", 3)]
+ROWS = [[1, "John Doe", 12.5], [2, None, None], [3, "Jöhn", -1.25]]
+
+# upperLeft origin at (10, 21) with 1e-6 degree resolution
+COORDS = [(0, 1000000), (500000, 500000), (1000000, 0)]
+PAYLOAD = pbf_encoder.feature_collection(
+    FIELDS, ROWS, COORDS, translate=(10.0, 21.0), exceeded=True
+)
+
+
+class TestPbf(unittest.TestCase):
+    def test_decode_points(self):
+
+        result = pbf.decode_feature_collection(PAYLOAD)
+
+        self.assertEqual(result["geometryType"], "esriGeometryPoint")
+        self.assertEqual(result["spatialReference"], {"wkid": 4326})
+        self.assertTrue(result["exceededTransferLimit"])
+        self.assertEqual(result["objectIds"], [1, 2, 3])
+        self.assertEqual(result["attributes"]["Name"], ["John Doe", None, "Jöhn"])
+        self.assertEqual(result["attributes"]["Altitude"][2], -1.25)
+        self.assertEqual(result["fields"][0]["type"], "esriFieldTypeOID")
+
+        for i, (x, y) in enumerate([(10.0, 20.0), (10.5, 20.5), (11.0, 21.0)]):
+            self.assertAlmostEqual(result["x"][i], x)
+            self.assertAlmostEqual(result["y"][i], y)
+
+    def test_decode_lower_left(self):
+
+        payload = pbf_encoder.feature_collection(
+            FIELDS[:1], [[1]], [(2, 3)], scale=(0.5, 0.5), translate=(1.0, 1.0), origin=1
+        )
+        result = pbf.decode_feature_collection(payload)
+
+        self.assertEqual((result["x"][0], result["y"][0]), (2.0, 2.5))
+
+    def test_decode_polylines(self):
+
+        # two features, the first with two parts, deltas from (0, 0) at 0.5 resolution
+        payload = pbf_encoder.feature_collection(
+            FIELDS[:1],
+            [[1], [2]],
+            [[2, 2, 2, 0, 0, 2, 2, 0], [4, 4, -2, -2]],
+            scale=(0.5, 0.5),
+            origin=1,
+            geometry_type=2,
+            lengths=[[2, 2], [2]],
+        )
+        result = pbf.decode_feature_collection(payload)
+
+        self.assertEqual(result["geometryType"], "esriGeometryPolyline")
+        self.assertIsNone(result["x"])
+        self.assertEqual(list(result["coords"]), [1, 1, 2, 1, 2, 2, 3, 2, 2, 2, 1, 1])
+        self.assertEqual(result["part_offsets"], [0, 2, 4, 6])
+        self.assertEqual(result["feature_offsets"], [0, 2, 3])
+
+        if np is not None:
+            batch = FeatureBatch.frompbfresult(result)
+            self.assertEqual(len(batch.get_parts(0)), 2)
+            np.testing.assert_array_equal(batch[1].parts[0], [[2, 2], [1, 1]])
+
+    def test_decode_table(self):
+
+        result = pbf.decode_feature_collection(
+            pbf_encoder.feature_collection(FIELDS, ROWS)
+        )
+
+        self.assertIsNone(result["geometryType"])
+        self.assertIsNone(result["x"])
+        self.assertEqual(result["objectIds"], [1, 2, 3])
+
+    def test_decode_zero_enums(self):
+
+        # point geometries and small integer fields are encoded by leaving the enum out
+        payload = pbf_encoder.feature_collection([("Count", 0)], [[3]], [(0, 0)])
+        self.assertNotIn(pbf_encoder.field_varint(7, 0), payload)
+
+        result = pbf.decode_feature_collection(payload)
+
+        self.assertEqual(result["geometryType"], "esriGeometryPoint")
+        self.assertEqual(result["fields"][0]["type"], "esriFieldTypeSmallInteger")
+        self.assertEqual(result["attributes"]["Count"], [3])
+
+    def test_decode_count(self):
+
+        count_result = pbf_encoder.field_bytes(2, pbf_encoder.field_varint(1, 42))
+        payload = pbf_encoder.field_bytes(2, count_result)
+
+        self.assertEqual(pbf.decode_feature_collection(payload), {"count": 42})
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_get_features_pbf(self):
+
+        requester = FakeRequester(lambda method, url, params: PAYLOAD)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        batch = services.get_features(
+            "1=1", 0, "https://example.com/FeatureServer", response_format="pbf"
+        )
+
+        self.assertTrue(isinstance(batch, FeatureBatch))
+        self.assertEqual(requester.calls[0][2]["f"], "pbf")
+        np.testing.assert_allclose(batch.x, [10.0, 10.5, 11.0])
+        self.assertEqual(batch[0]["Name"], "John Doe")
+        self.assertTrue(np.isnan(batch.column("Altitude")[1]))
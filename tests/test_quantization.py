@@ -0,0 +1,144 @@
+import json
+import unittest
+
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from simple_arcgis_wrapper.utilities.quantization import (
+    dequantize_features,
+    get_quantization_parameters,
+)
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+TRANSFORM = {"originPosition": "upperLeft", "scale": [0.5, 0.5], "translate": [100, 50]}
+
+
+def quantized_handler(geometry_type, geometry):
+    "Serve a one feature layer whose geometry is quantized with TRANSFORM"
+
+    def handler(method, url, params):
+        if not url.endswith("/query"):
+            return {"maxRecordCount": 1000, "objectIdField": "OBJECTID"}
+
+        return {
+            "geometryType": geometry_type,
+            "transform": TRANSFORM,
+            "features": [{"attributes": {"OBJECTID": 1}, "geometry": dict(geometry)}],
+        }
+
+    return handler
+
+
+class TestQuantization(unittest.TestCase):
+    def test_dequantize_points(self):
+
+        res = {
+            "transform": TRANSFORM,
+            "features": [
+                {"attributes": {}, "geometry": {"x": 4, "y": 2}},
+                {"attributes": {}, "geometry": None},
+            ],
+        }
+
+        dequantize_features(res)
+
+        self.assertEqual(res["features"][0]["geometry"], {"x": 102.0, "y": 49.0})
+        self.assertNotIn("transform", res)
+
+        lower_left = {**TRANSFORM, "originPosition": "lowerLeft"}
+        res = {"transform": lower_left, "features": [{"geometry": {"x": 4, "y": 2}}]}
+        self.assertEqual(
+            dequantize_features(res)["features"][0]["geometry"], {"x": 102.0, "y": 51.0}
+        )
+
+    def test_dequantize_paths(self):
+
+        # the first vertex of each path is absolute, the others deltas
+        res = {
+            "transform": TRANSFORM,
+            "features": [
+                {"geometry": {"paths": [[[2, 2], [2, 0], [0, -2]], [[10, 10], [-2, 0]]]}}
+            ],
+        }
+
+        paths = dequantize_features(res)["features"][0]["geometry"]["paths"]
+
+        self.assertEqual(paths[0], [[101.0, 49.0], [102.0, 49.0], [102.0, 50.0]])
+        self.assertEqual(paths[1], [[105.0, 45.0], [104.0, 45.0]])
+
+    def test_unquantized_response_unchanged(self):
+
+        res = {"features": [{"geometry": {"x": 4, "y": 2}}]}
+        self.assertEqual(dequantize_features(res)["features"][0]["geometry"]["x"], 4)
+
+    def test_get_quantization_parameters(self):
+
+        params = get_quantization_parameters((0, 0, 10, 20), 0.5)
+
+        self.assertEqual(params["tolerance"], 0.5)
+        self.assertEqual(params["extent"], {"xmin": 0, "ymin": 0, "xmax": 10, "ymax": 20})
+        with self.assertRaises(ValueError):
+            get_quantization_parameters((0, 0, 10, 20), 0)
+
+    def test_get_features_geometry_options(self):
+
+        requester = FakeRequester(
+            quantized_handler("esriGeometryPolyline", {"paths": [[[2, 2], [2, 0]]]})
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = services.get_features(
+            "1=1",
+            0,
+            FEATURE_SERVICE_URL,
+            out_sr=3857,
+            max_allowable_offset=10,
+            geometry_precision=2,
+            quantization_parameters=get_quantization_parameters((0, 0, 10, 20), 0.5),
+        )
+
+        self.assertEqual(features[0].paths, [[[101.0, 49.0], [102.0, 49.0]]])
+
+        params = requester.calls[-1][2]
+        self.assertEqual(params["outSR"], 3857)
+        self.assertEqual(params["maxAllowableOffset"], 10)
+        self.assertEqual(params["geometryPrecision"], 2)
+        self.assertEqual(json.loads(params["quantizationParameters"])["tolerance"], 0.5)
+        self.assertNotIn("returnGeometry", params)
+
+    def test_return_geometry_false(self):
+
+        requester = FakeRequester(
+            lambda method, url, params: {
+                "geometryType": "esriGeometryPoint",
+                "features": [{"attributes": {"OBJECTID": 1}}],
+            }
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = services.get_features("1=1", 0, FEATURE_SERVICE_URL, return_geometry=False)
+
+        self.assertEqual(requester.calls[-1][2]["returnGeometry"], "false")
+        self.assertIsNone(features[0].x)
+
+    def test_iter_features_stream_dequantizes(self):
+
+        requester = FakeRequester(quantized_handler("esriGeometryPoint", {"x": 4, "y": 2}))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        features = list(
+            services.iter_features(
+                "1=1",
+                0,
+                FEATURE_SERVICE_URL,
+                stream=True,
+                quantization_parameters=get_quantization_parameters((0, 0, 10, 20), 0.5),
+            )
+        )
+
+        self.assertEqual((features[0].x, features[0].y), (102.0, 49.0))
+        self.assertIn("quantizationParameters", requester.calls[-1][2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,321 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from simple_arcgis_wrapper.arcgis_api import ArcgisAPI, Requester
+from simple_arcgis_wrapper.exceptions import ArcGISException, ArcGISUnavailableError
+from simple_arcgis_wrapper.services_api import ServicesAPI
+
+
+class SequenceAdapter(requests.adapters.BaseAdapter):
+    """
+    Answer requests with (status, headers, body) tuples in order. None raises
+    ConnectionError and an exception instance is raised as is.
+    """
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.requests = list()
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        item = self.responses.pop(0)
+        if item is None:
+            raise requests.exceptions.ConnectionError("connection reset")
+        if isinstance(item, Exception):
+            raise item
+
+        status, headers, body = item
+        response = requests.models.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        response._content_consumed = True  # lets iter_content serve _content
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def get_requester(responses, **kwargs):
+    requester = Requester("token", None, None, "https://example.com", **kwargs)
+    adapter = SequenceAdapter(responses)
+    requester.session.mount("https://", adapter)
+    return requester, adapter
+
+
+class TestRequesterRetry(unittest.TestCase):
+    def test_retry_status(self):
+
+        requester, adapter = get_requester(
+            [
+                (503, {"Retry-After": "0"}, {}),
+                (429, {"Retry-After": "0"}, {}),
+                (200, {}, {"success": True}),
+            ]
+        )
+
+        res = requester.GET("https://example.com/query", dict())
+        self.assertTrue(res["success"])
+        self.assertEqual(len(adapter.requests), 3)
+
+    def test_retry_connection_error(self):
+
+        requester, adapter = get_requester(
+            [None, (200, {}, {"success": True})], backoff_factor=0
+        )
+
+        res = requester.POST("https://example.com/addFeatures", dict())
+        self.assertTrue(res["success"])
+
+    def test_post_not_retried_after_read_timeout(self):
+
+        requester, adapter = get_requester(
+            [requests.exceptions.ReadTimeout("read timed out"), (200, {}, {})],
+            backoff_factor=0,
+        )
+
+        with self.assertRaises(ArcGISException):
+            requester.POST("https://example.com/addFeatures", dict())
+        self.assertEqual(len(adapter.requests), 1)
+
+        # reads are still retried, and POSTs on connect timeouts
+        requester, _ = get_requester(
+            [
+                requests.exceptions.ReadTimeout("read timed out"),
+                (200, {}, {"success": True}),
+                requests.exceptions.ConnectTimeout("connect timed out"),
+                (200, {}, {"success": True}),
+            ],
+            backoff_factor=0,
+        )
+
+        self.assertTrue(requester.GET("https://example.com/query", dict())["success"])
+        self.assertTrue(requester.POST("https://example.com/addFeatures", dict())["success"])
+
+    def test_post_retry_statuses(self):
+
+        requester, adapter = get_requester(
+            [(503, {"Retry-After": "0"}, {}), (502, {}, {})], backoff_factor=0
+        )
+
+        with self.assertRaises(ArcGISException):
+            requester.POST("https://example.com/addFeatures", dict())
+        self.assertEqual(len(adapter.requests), 2)
+
+    def test_unavailable_errors(self):
+
+        requester, _ = get_requester(
+            [None, (503, {"Retry-After": "0"}, {}), (502, {}, {})], max_retries=0
+        )
+
+        with self.assertRaises(ArcGISUnavailableError):
+            requester.POST("https://example.com/addFeatures", dict())
+        with self.assertRaises(ArcGISUnavailableError):
+            requester.POST("https://example.com/addFeatures", dict())
+        with self.assertRaises(ArcGISException) as context:
+            requester.POST("https://example.com/addFeatures", dict())
+        self.assertFalse(isinstance(context.exception, ArcGISUnavailableError))
+
+    def test_retries_exhausted(self):
+
+        requester, adapter = get_requester(
+            [(502, {"Retry-After": "0"}, {})] * 3, max_retries=2
+        )
+
+        with self.assertRaises(ArcGISException):
+            requester.GET("https://example.com/query", dict())
+        self.assertEqual(len(adapter.requests), 3)
+
+    def test_backoff_bounds(self):
+
+        requester, _ = get_requester([], backoff_factor=1, backoff_max=4)
+
+        for attempt in range(6):
+            backoff = requester._get_backoff(attempt)
+            self.assertGreaterEqual(backoff, 0)
+            self.assertLessEqual(backoff, min(4, 2 ** attempt))
+
+    def test_backoff_retry_after(self):
+
+        requester, _ = get_requester([], backoff_factor=1, backoff_max=4)
+
+        def backoff(retry_after):
+            response = requests.models.Response()
+            response.headers["Retry-After"] = retry_after
+            return requester._get_backoff(1, response)
+
+        self.assertEqual(backoff("2"), 2)
+        self.assertEqual(backoff("3600"), 4)
+        self.assertEqual(backoff("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+        # unparseable values fall back to the jittered backoff
+        for retry_after in ["soon", "Wed, 99 Foo"]:
+            self.assertLessEqual(backoff(retry_after), 2)
+
+
+class TestPrewarm(unittest.TestCase):
+    def test_prewarm_urls(self):
+
+        service_url = "https://services.example.com/FeatureServer"
+        requester, adapter = get_requester([(200, {}, {})] * 2)
+
+        requester.prewarm(2, urls=[service_url])
+
+        self.assertEqual([r.method for r in adapter.requests], ["HEAD", "HEAD"])
+        self.assertEqual({r.url for r in adapter.requests}, {service_url})
+
+    def test_api_prewarm_urls(self):
+
+        urls = ["https://services.example.com/FeatureServer"]
+        with mock.patch.object(Requester, "prewarm") as prewarm:
+            api = ArcgisAPI(
+                access_token="token",
+                username="user",
+                prewarm_connections=2,
+                prewarm_urls=urls,
+            )
+            api.close()
+
+        prewarm.assert_called_once_with(2, urls)
+
+
+class TestTokenRefresh(unittest.TestCase):
+    def test_proactive_refresh(self):
+
+        requester, adapter = get_requester(
+            [
+                (200, {}, {"access_token": "new", "expires_in": 1800}),
+                (200, {}, {"success": True}),
+            ]
+        )
+        requester.refresh_token = "refresh"
+        requester.token_expires_at = 0  # already expired
+
+        requester.GET("https://example.com/query", dict())
+        requester.close()
+
+        self.assertTrue(adapter.requests[0].url.endswith("/oauth2/token"))
+        self.assertIn("token=new", adapter.requests[1].url)
+        self.assertGreater(requester.token_expires_at, 1000)
+
+    def test_single_flight(self):
+
+        requester, adapter = get_requester(
+            [(200, {}, {"access_token": "new", "expires_in": 1800})]
+        )
+        requester.refresh_token = "refresh"
+
+        requester._refresh_access_token("token")
+        # a second caller that saw the old token does not refresh again
+        requester._refresh_access_token("token")
+        requester.close()
+
+        self.assertEqual(len(adapter.requests), 1)
+        self.assertEqual(requester.access_token, "new")
+
+    def test_reactive_refresh(self):
+
+        requester, adapter = get_requester(
+            [
+                (200, {}, {"error": {"code": 498, "message": "Invalid token."}}),
+                (200, {}, {"access_token": "new"}),
+                (200, {}, {"success": True}),
+            ]
+        )
+        requester.refresh_token = "refresh"
+
+        res = requester.POST("https://example.com/addFeatures", dict())
+
+        self.assertTrue(res["success"])
+        self.assertIn("token=new", adapter.requests[2].body)
+
+
+class TestRawResponses(unittest.TestCase):
+    def test_pbf_bytes(self):
+
+        requester, adapter = get_requester([(200, {}, b"\x0a\x031.0")])
+
+        res = requester.GET("https://example.com/query", dict(), f="pbf")
+        self.assertEqual(res, b"\x0a\x031.0")
+        self.assertIn("f=pbf", adapter.requests[0].url)
+
+    def test_pbf_error_is_json(self):
+
+        requester, _ = get_requester(
+            [(200, {}, {"error": {"code": 400, "message": "Invalid query"}})]
+        )
+
+        res = requester.GET("https://example.com/query", dict(), f="pbf")
+        self.assertEqual(res["error"]["code"], 400)
+
+
+class TestListResponses(unittest.TestCase):
+    def test_apply_service_edits(self):
+
+        body = [
+            {
+                "id": 0,
+                "addResults": [{"objectId": 7, "success": True}],
+                "updateResults": [],
+                "deleteResults": [],
+            }
+        ]
+        requester, adapter = get_requester([(200, {}, body)])
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        res = services.apply_service_edits(
+            {0: {"adds": [{"attributes": {}}]}}, "https://example.com/FeatureServer"
+        )
+
+        self.assertEqual(res[0]["adds"], {7: True})
+        self.assertEqual(len(adapter.requests), 1)
+
+
+class TestStreamedResponses(unittest.TestCase):
+    def test_stream_features(self):
+
+        body = {
+            "geometryType": "esriGeometryPoint",
+            "features": [{"attributes": {"OBJECTID": i}} for i in range(3)],
+            "exceededTransferLimit": True,
+        }
+        requester, adapter = get_requester([(200, {}, body)])
+
+        stream = requester.GET_STREAM("https://example.com/query", dict())
+        self.assertEqual(len(adapter.requests), 0)  # lazy until iterated
+
+        self.assertEqual([f["attributes"]["OBJECTID"] for f in stream], [0, 1, 2])
+        self.assertTrue(stream.envelope["exceededTransferLimit"])
+        self.assertIn("gzip", adapter.requests[0].headers["Accept-Encoding"])
+
+    def test_stream_refresh(self):
+
+        requester, adapter = get_requester(
+            [
+                (200, {}, {"error": {"code": 498, "message": "Invalid token."}}),
+                (200, {}, {"access_token": "new"}),
+                (200, {}, {"features": [{"attributes": {"OBJECTID": 1}}]}),
+            ]
+        )
+        requester.refresh_token = "refresh"
+
+        features = list(requester.GET_STREAM("https://example.com/query", dict()))
+
+        self.assertEqual(len(features), 1)
+        self.assertIn("token=new", adapter.requests[2].url)
+
+    def test_stream_error(self):
+
+        requester, _ = get_requester(
+            [(200, {}, {"error": {"code": 400, "message": "Invalid query"}})]
+        )
+
+        stream = requester.GET_STREAM("https://example.com/query", dict())
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.envelope["error"]["code"], 400)
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+
+from simple_arcgis_wrapper.models import FeatureBatch, PointFeature
+from simple_arcgis_wrapper.utilities.spatial_index import GridIndex
+
+
+class TestGridIndex(unittest.TestCase):
+    def setUp(self):
+
+        rng = np.random.default_rng(1)
+        self.x = rng.uniform(-100, 100, 2000)
+        self.y = rng.uniform(0, 50, 2000)
+        self.x[7] = np.nan  # features without geometry are skipped
+        self.index = GridIndex(self.x, self.y)
+
+    def brute_radius(self, x, y, radius):
+        with np.errstate(invalid="ignore"):
+            distances = np.hypot(self.x - x, self.y - y)
+            return np.flatnonzero(distances <= radius)
+
+    def test_query_bbox(self):
+
+        found = self.index.query_bbox(-10, 10, 25, 20)
+
+        with np.errstate(invalid="ignore"):
+            expected = np.flatnonzero(
+                (self.x >= -10) & (self.x <= 25) & (self.y >= 10) & (self.y <= 20)
+            )
+        self.assertEqual(found.tolist(), expected.tolist())
+        self.assertEqual(len(self.index), 1999)
+        self.assertEqual(len(self.index.query_bbox(200, 200, 300, 300)), 0)
+
+    def test_query_radius(self):
+
+        for x, y, radius in [(0, 25, 5), (-100, 0, 12.5), (99, 49, 0.1), (500, 0, 10)]:
+            found = self.index.query_radius(x, y, radius)
+            self.assertEqual(found.tolist(), self.brute_radius(x, y, radius).tolist())
+
+    def test_nearest(self):
+
+        for x, y in [(0, 25), (-150, -40), (33.3, 12.1)]:
+            indices, distances = self.index.nearest(x, y, k=5)
+
+            with np.errstate(invalid="ignore"):
+                all_distances = np.hypot(self.x - x, self.y - y)
+            expected = np.argsort(np.nan_to_num(all_distances, nan=np.inf))[:5]
+
+            self.assertEqual(indices.tolist(), expected.tolist())
+            np.testing.assert_allclose(distances, all_distances[expected])
+
+        self.assertEqual(len(GridIndex([1.0], [1.0]).nearest(0, 0, k=3)[0]), 1)
+
+    def test_query_pairs(self):
+
+        for cell_size in [None, 0.5]:
+            index = GridIndex(self.x, self.y, cell_size)
+            pairs = index.query_pairs(1.5)
+
+            expected = [
+                [i, j]
+                for i in range(len(self.x))
+                for j in self.brute_radius(self.x[i], self.y[i], 1.5).tolist()
+                if i < j
+            ]
+            self.assertEqual(pairs.tolist(), expected)
+
+    def test_duplicate_points(self):
+
+        index = GridIndex([1.0, 1.0, 1.0, 5.0], [2.0, 2.0, 2.0, 5.0])
+
+        self.assertEqual(index.query_pairs(0).tolist(), [[0, 1], [0, 2], [1, 2]])
+        self.assertEqual(index.query_radius(1, 2, 0).tolist(), [0, 1, 2])
+
+    def test_invalid_cell_size(self):
+
+        with self.assertRaises(ValueError):
+            GridIndex([0.0], [0.0], cell_size=0)
+
+    def test_build_index(self):
+
+        batch = FeatureBatch(
+            np.array([10, 11, 12]), np.array([0.0, 5.0, 10.0]), np.array([0.0, 0.0, 0.0])
+        )
+        index = batch.build_index()
+
+        self.assertEqual([batch[i].id for i in index.query_radius(4, 0, 2)], [11])
+
+        with self.assertRaises(ValueError):
+            FeatureBatch(np.array([1])).build_index()
+
+    def test_fromfeatures(self):
+
+        points = [PointFeature(1, 0.0, 0.0), PointFeature(2, 3.0, 4.0)]
+        index = GridIndex.fromfeatures(points)
+
+        indices, distances = index.nearest(3, 3)
+        self.assertEqual(points[indices[0]].id, 2)
+        self.assertEqual(distances.tolist(), [1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import unittest
+
+from simple_arcgis_wrapper.async_api import AsyncServicesAPI
+from simple_arcgis_wrapper.exceptions import ArcGISException
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import AsyncFakeRequester, FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+ROWS = [
+    {"DeviceId": "a", "Altitude": 10.0},
+    {"DeviceId": "b", "Altitude": 20.0},
+    {"DeviceId": "a", "Altitude": 30.0},
+    {"DeviceId": "c", "Altitude": 40.0},
+]
+
+
+def statistics_handler(method, url, params, supports_pagination=True, paged=True):
+    """
+    Answer count, statistics and distinct value queries over ROWS, 2 records per
+    page. Without paged the server ignores resultOffset.
+    """
+
+    if not url.endswith("/query"):
+        capabilities = {"supportsPagination": supports_pagination}
+        return {"advancedQueryCapabilities": capabilities}
+
+    if params.get("returnCountOnly"):
+        return {"count": len(ROWS)}
+
+    if params.get("returnDistinctValues"):
+        values = sorted(set(row[params["outFields"]] for row in ROWS))
+        offset = params.get("resultOffset", 0) if paged else 0
+        return {
+            "features": [
+                {"attributes": {params["outFields"]: v}} for v in values[offset : offset + 2]
+            ],
+            "exceededTransferLimit": offset + 2 < len(values),
+        }
+
+    statistic = json.loads(params["outStatistics"])[0]
+    field, name = statistic["onStatisticField"], statistic["outStatisticFieldName"]
+
+    groups = dict()
+    for row in ROWS:
+        key = row["DeviceId"] if "groupByFieldsForStatistics" in params else None
+        groups.setdefault(key, []).append(row[field])
+
+    features = list()
+    for key, values in sorted(groups.items(), key=lambda item: str(item[0])):
+        attributes = {name: sum(values)}
+        if key is not None:
+            attributes["DeviceId"] = key
+        features.append({"attributes": attributes})
+    return {"features": features}
+
+
+class TestStatistics(unittest.TestCase):
+    def setUp(self):
+        self.requester = FakeRequester(statistics_handler)
+        self.services = ServicesAPI("https://example.com", self.requester, "user")
+
+    def test_count(self):
+        self.assertEqual(self.services.get_count("1=1", 0, FEATURE_SERVICE_URL), 4)
+
+    def test_statistics(self):
+
+        res = self.services.get_statistics(
+            "1=1", [("sum", "Altitude")], 0, FEATURE_SERVICE_URL
+        )
+        self.assertEqual(res, [{"sum_Altitude": 100.0}])
+
+    def test_grouped_statistics(self):
+
+        res = self.services.get_statistics(
+            "1=1",
+            [("sum", "Altitude", "total")],
+            0,
+            FEATURE_SERVICE_URL,
+            group_by=["DeviceId"],
+        )
+
+        self.assertEqual(res[0], {"total": 40.0, "DeviceId": "a"})
+        self.assertEqual(len(res), 3)
+        params = self.requester.calls[0][2]
+        self.assertEqual(params["groupByFieldsForStatistics"], "DeviceId")
+
+    def test_distinct_values(self):
+
+        values = self.services.get_distinct_values(
+            "1=1", "DeviceId", 0, FEATURE_SERVICE_URL
+        )
+
+        self.assertEqual(values, ["a", "b", "c"])
+        queries = [c for c in self.requester.calls if c[1].endswith("/query")]
+        self.assertEqual(len(queries), 2)
+
+    def test_distinct_values_without_pagination(self):
+
+        requester = FakeRequester(
+            lambda method, url, params: statistics_handler(
+                method, url, params, supports_pagination=False
+            )
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with self.assertRaises(ArcGISException):
+            services.get_distinct_values("1=1", "DeviceId", 0, FEATURE_SERVICE_URL)
+
+    def test_distinct_values_offset_ignored(self):
+
+        requester = FakeRequester(
+            lambda method, url, params: statistics_handler(method, url, params, paged=False)
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        values = services.get_distinct_values("1=1", "DeviceId", 0, FEATURE_SERVICE_URL)
+
+        self.assertEqual(values, ["a", "b"])
+        self.assertEqual(len([c for c in requester.calls if c[1].endswith("/query")]), 2)
+
+    def test_async(self):
+
+        services = AsyncServicesAPI(
+            "https://example.com", AsyncFakeRequester(statistics_handler), "user"
+        )
+
+        async def run():
+            return (
+                await services.get_count("1=1", 0, FEATURE_SERVICE_URL),
+                await services.get_distinct_values("1=1", "DeviceId", 0, FEATURE_SERVICE_URL),
+            )
+
+        self.assertEqual(asyncio.run(run()), (4, ["a", "b", "c"]))
@@ -0,0 +1,90 @@
+import json
+import unittest
+
+from simple_arcgis_wrapper.utilities.streaming import (
+    FeatureStream,
+    FeatureStreamParser,
+)
+
+
+RESPONSE = {
+    "objectIdFieldName": "OBJECTID",
+    "geometryType": "esriGeometryPoint",
+    "fields": [{"name": "OBJECTID"}, {"name": "name"}],
+    "features": [
+        {"attributes": {"OBJECTID": 1, "name": 'brace } and "quote"'}, "geometry": {"x": 1, "y": 2}},
+        {"attributes": {"OBJECTID": 2, "name": "[\"features\": ["}, "geometry": None},
+        {"attributes": {"OBJECTID": 3, "name": "café ☃"}, "geometry": {"x": 3, "y": 4}},
+    ],
+    "exceededTransferLimit": True,
+}
+
+
+def get_chunks(body, size):
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+class TestFeatureStreamParser(unittest.TestCase):
+    def test_whole(self):
+
+        parser = FeatureStreamParser()
+        features = parser.feed(json.dumps(RESPONSE))
+        envelope = parser.close()
+
+        self.assertEqual(features, RESPONSE["features"])
+        self.assertEqual(envelope["geometryType"], "esriGeometryPoint")
+        self.assertTrue(envelope["exceededTransferLimit"])
+        self.assertNotIn("features", envelope)
+
+    def test_every_split(self):
+
+        text = json.dumps(RESPONSE, indent=1)
+        for size in range(1, 40):
+            parser = FeatureStreamParser()
+            features = list()
+            for chunk in get_chunks(text, size):
+                features.extend(parser.feed(chunk))
+
+            self.assertEqual(features, RESPONSE["features"])
+            self.assertTrue(parser.close()["exceededTransferLimit"])
+
+    def test_envelope_before_features(self):
+
+        text = json.dumps(RESPONSE)
+        parser = FeatureStreamParser()
+
+        features = parser.feed(text[: text.index('"OBJECTID": 2')])
+
+        self.assertEqual(len(features), 1)
+        self.assertEqual(parser.envelope["objectIdFieldName"], "OBJECTID")
+
+    def test_nested_features_key(self):
+
+        response = {"fields": [{"features": [1]}], "features": [{"a": 1}]}
+
+        parser = FeatureStreamParser()
+        self.assertEqual(parser.feed(json.dumps(response)), [{"a": 1}])
+        self.assertEqual(parser.close()["fields"], [{"features": [1]}])
+
+    def test_no_features(self):
+
+        parser = FeatureStreamParser()
+        parser.feed('{"error": {"code": 400, "message": "Invalid query"}}')
+        self.assertEqual(parser.close()["error"]["code"], 400)
+
+    def test_truncated(self):
+
+        parser = FeatureStreamParser()
+        parser.feed('{"features": [{"a": 1}, {"a"')
+        with self.assertRaises(ValueError):
+            parser.close()
+
+
+class TestFeatureStream(unittest.TestCase):
+    def test_multibyte_split(self):
+
+        body = json.dumps(RESPONSE, ensure_ascii=False).encode("utf-8")
+        stream = FeatureStream(get_chunks(body, 1))
+
+        self.assertEqual(list(stream), RESPONSE["features"])
+        self.assertEqual(stream.envelope["fields"], RESPONSE["fields"])
@@ -0,0 +1,148 @@
+import json
+import re
+import unittest
+
+from simple_arcgis_wrapper.exceptions import ArcGISException
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+
+def keyed_layer_handler(existing, max_record_count=1000):
+    """
+    Serve a layer whose features are existing, a dict of DeviceId to OBJECTID.
+    Answers IN queries on DeviceId and applies applyEdits adds to existing.
+    """
+
+    state = {"next_id": 1000}
+
+    def handler(method, url, data):
+        if method == "get":
+            return {"maxRecordCount": max_record_count, "objectIdField": "OBJECTID"}
+
+        if url.endswith("/query"):
+            keys = re.findall(r"'((?:[^']|'')*)'", data["where"])
+            keys = [key.replace("''", "'") for key in keys]
+            features = [
+                {"attributes": {"DeviceId": key, "OBJECTID": existing[key]}}
+                for key in keys
+                if key in existing
+            ]
+            return {"features": features}
+
+        res = dict()
+        if "adds" in data:
+            res["addResults"] = list()
+            for feature in json.loads(data["adds"]):
+                existing[feature["attributes"]["DeviceId"]] = state["next_id"]
+                result = {"objectId": state["next_id"], "success": True}
+                res["addResults"].append(result)
+                state["next_id"] += 1
+        if "updates" in data:
+            res["updateResults"] = [
+                {"objectId": feature["attributes"]["OBJECTID"], "success": True}
+                for feature in json.loads(data["updates"])
+            ]
+        return res
+
+    return handler
+
+
+class TestUpsert(unittest.TestCase):
+    def test_upsert_points(self):
+
+        requester = FakeRequester(keyed_layer_handler({"a": 1, "b'quote": 2}))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        points = [
+            {"lon": 1.0, "lat": 2.0, "DeviceId": "a", "Name": "old"},
+            {"lon": 1.0, "lat": 2.0, "DeviceId": "a", "Name": "new"},
+            {"lon": 3.0, "lat": 4.0, "DeviceId": "b'quote"},
+            {"lon": 5.0, "lat": 6.0, "DeviceId": "c"},
+        ]
+        key_index = dict()
+        res = services.upsert_points(
+            points, "DeviceId", 0, FEATURE_SERVICE_URL, key_index=key_index
+        )
+
+        self.assertEqual(res, {"adds": {1000: True}, "updates": {1: True, 2: True}})
+        self.assertEqual(key_index, {"a": 1, "b'quote": 2, "c": 1000})
+        self.assertIn("lon", points[0])  # inputs are not modified
+
+        posts = [call[2] for call in requester.calls if call[0] == "post"]
+        self.assertIn("DeviceId IN ('a','b''quote','c')", posts[0]["where"])
+        updates = json.loads(posts[2]["updates"])
+        self.assertEqual(
+            updates[0]["attributes"], {"DeviceId": "a", "Name": "new", "OBJECTID": 1}
+        )
+        self.assertEqual(updates[0]["geometry"], {"x": 1.0, "y": 2.0})
+
+        # known keys are not looked up again
+        requester.calls.clear()
+        services.upsert_points(
+            [{"lon": 0.0, "lat": 0.0, "DeviceId": "c"}],
+            "DeviceId",
+            0,
+            FEATURE_SERVICE_URL,
+            key_index=key_index,
+        )
+        self.assertEqual(
+            [call[1].rsplit("/", 1)[1] for call in requester.calls if call[0] == "post"],
+            ["applyEdits"],
+        )
+
+    def test_chunked_lookups(self):
+
+        existing = {str(i): i + 1 for i in range(25)}
+        requester = FakeRequester(keyed_layer_handler(existing, max_record_count=10))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        rows = [{"DeviceId": str(i), "Value": i} for i in range(30)]
+        res = services.upsert_table_rows(
+            rows, "DeviceId", 0, FEATURE_SERVICE_URL, max_workers=4
+        )
+
+        self.assertEqual(len(res["updates"]), 25)
+        self.assertEqual(len(res["adds"]), 5)
+
+        urls = [call[1].rsplit("/", 1)[1] for call in requester.calls if call[0] == "post"]
+        self.assertEqual(urls.count("query"), 3)
+        self.assertEqual(urls.count("applyEdits"), 4)
+
+    def test_missing_key(self):
+
+        requester = FakeRequester(keyed_layer_handler({}))
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with self.assertRaises(ValueError):
+            services.upsert_table_rows([{"Name": "a"}], "DeviceId", 0, FEATURE_SERVICE_URL)
+
+    def test_duplicate_layer_keys(self):
+
+        def handler(method, url, data):
+            if method == "get":
+                return {"maxRecordCount": 1000}
+            return {
+                "features": [
+                    {"attributes": {"DeviceId": "a", "OBJECTID": 1}},
+                    {"attributes": {"DeviceId": "a", "OBJECTID": 2}},
+                ]
+            }
+
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+
+        with self.assertRaises(ArcGISException):
+            services.upsert_table_rows(
+                [{"DeviceId": "a"}], "DeviceId", 0, FEATURE_SERVICE_URL
+            )
+
+    def test_get_in_clause(self):
+
+        self.assertEqual(ServicesAPI._get_in_clause("Id", [1, 2.5]), "Id IN (1,2.5)")
+        with self.assertRaises(ValueError):
+            ServicesAPI._get_in_clause("Id", [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import json
+import queue
+import threading
+import unittest
+
+from simple_arcgis_wrapper.exceptions import ArcGISException
+from simple_arcgis_wrapper.services_api import ServicesAPI
+from simple_arcgis_wrapper.writer import FeatureWriter
+from tests.fake_requester import FakeRequester
+
+FEATURE_SERVICE_URL = "https://example.com/FeatureServer"
+
+
+def edits_handler(method, url, data):
+    "Add results count up from 1, updates of negative OBJECTIDs fail"
+
+    if method == "get":
+        return {"maxRecordCount": 1000}
+
+    adds = json.loads(data.get("adds", "[]"))
+    updates = json.loads(data.get("updates", "[]"))
+
+    update_results = list()
+    for u in updates:
+        _id = u["attributes"]["OBJECTID"]
+        if _id < 0:
+            update_results.append(
+                {"objectId": _id, "success": False, "error": {"description": "not found"}}
+            )
+        else:
+            update_results.append({"objectId": _id, "success": True})
+
+    return {
+        "addResults": [{"objectId": i + 1, "success": True} for i in range(len(adds))],
+        "updateResults": update_results,
+    }
+
+
+def get_posts(requester):
+    return [c for c in requester.calls if c[0] == "post"]
+
+
+class TestFeatureWriter(unittest.TestCase):
+    def test_batches_by_size(self):
+
+        requester = FakeRequester(edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with FeatureWriter(services, 0, FEATURE_SERVICE_URL, batch_size=4) as writer:
+            futures = [writer.add_point(10.0, 20.0, {"n": i}) for i in range(10)]
+
+        self.assertEqual([f.result() for f in futures], [1, 2, 3, 4, 1, 2, 3, 4, 1, 2])
+        self.assertEqual(len(get_posts(requester)), 3)
+        self.assertTrue(get_posts(requester)[0][1].endswith("/0/applyEdits"))
+
+    def test_batches_by_bytes(self):
+
+        requester = FakeRequester(edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        writer = FeatureWriter(services, 0, FEATURE_SERVICE_URL, max_batch_bytes=200)
+        for i in range(6):
+            writer.add_table_row({"Name": "x" * 50})
+        writer.close()
+
+        posts = get_posts(requester)
+        self.assertGreater(len(posts), 1)
+        for _, _, data in posts:
+            self.assertLessEqual(len(data["adds"]), 200)
+
+    def test_max_latency(self):
+
+        requester = FakeRequester(edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with FeatureWriter(services, 0, FEATURE_SERVICE_URL, max_latency=0.01) as writer:
+            future = writer.add_table_row({"Name": "a"})
+            self.assertEqual(future.result(timeout=5), 1)
+
+    def test_flush_and_update_failure(self):
+
+        requester = FakeRequester(edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with FeatureWriter(services, 0, FEATURE_SERVICE_URL, max_latency=60) as writer:
+            ok = writer.update(5, {"Name": "b"})
+            failed = writer.update(-1, geometry={"x": 1, "y": 2})
+            writer.flush()
+
+            self.assertTrue(ok.done() and failed.done())
+            self.assertEqual(ok.result(), 5)
+            with self.assertRaises(ArcGISException):
+                failed.result()
+
+    def test_request_error(self):
+
+        requester = FakeRequester(
+            lambda method, url, data: {"maxRecordCount": 10}
+            if method == "get"
+            else {"error": {"message": "service unavailable"}}
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with FeatureWriter(services, 0, FEATURE_SERVICE_URL) as writer:
+            future = writer.add_table_row({"Name": "a"})
+
+        with self.assertRaises(ArcGISException):
+            future.result()
+
+    def test_cancelled_edit(self):
+
+        requester = FakeRequester(edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with FeatureWriter(services, 0, FEATURE_SERVICE_URL, max_latency=60) as writer:
+            cancelled = writer.add_table_row({"Name": "a"})
+            kept = writer.add_table_row({"Name": "b"})
+            self.assertTrue(cancelled.cancel())
+            writer.flush()
+
+            self.assertEqual(kept.result(), 1)
+            adds = json.loads(get_posts(requester)[0][2]["adds"])
+            self.assertEqual(adds, [{"attributes": {"Name": "b"}}])
+
+    def test_unexpected_error(self):
+
+        requester = FakeRequester(
+            lambda method, url, data: {"maxRecordCount": 10}
+            if method == "get"
+            else {"addResults": None}
+        )
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        with FeatureWriter(services, 0, FEATURE_SERVICE_URL, max_latency=60) as writer:
+            first = writer.add_table_row({"Name": "a"})
+            writer.flush()
+            second = writer.add_table_row({"Name": "b"})
+            writer.flush()
+
+        self.assertTrue(first.exception(timeout=5) is not None)
+        self.assertTrue(second.exception(timeout=5) is not None)
+
+    def test_backpressure(self):
+
+        sending, release = threading.Event(), threading.Event()
+
+        def handler(method, url, data):
+            if method == "post":
+                sending.set()
+                release.wait(5)
+            return edits_handler(method, url, data)
+
+        services = ServicesAPI("https://example.com", FakeRequester(handler), "user")
+        writer = FeatureWriter(
+            services, 0, FEATURE_SERVICE_URL, batch_size=1, max_queue_size=1
+        )
+
+        first = writer.add_table_row({"Name": "a"})
+        self.assertTrue(sending.wait(5))  # the background thread is busy sending
+
+        second = writer.add_table_row({"Name": "b"}, block=False)
+        with self.assertRaises(queue.Full):
+            writer.add_table_row({"Name": "c"}, block=False)
+
+        release.set()
+        writer.close()
+        self.assertEqual((first.result(), second.result()), (1, 1))
+
+    def test_closed(self):
+
+        requester = FakeRequester(edits_handler)
+        services = ServicesAPI("https://example.com", requester, "user")
+
+        writer = FeatureWriter(services, 0, FEATURE_SERVICE_URL)
+        writer.close()
+
+        with self.assertRaises(ValueError):
+            writer.add_table_row({"Name": "a"})